@@ -14,9 +14,10 @@ from common.protocol import *
 class AudioSender:
     """Captures audio and sends it to server via UDP"""
     
-    def __init__(self, server_host, server_udp_port):
+    def __init__(self, server_host, server_udp_port, client_handle=0):
         self.server_host = server_host
         self.server_udp_port = server_udp_port
+        self.client_handle = client_handle  # Tags every packet's sender field for the relay
         
         # Audio settings
         self.sample_rate = AUDIO_SAMPLE_RATE
@@ -109,13 +110,14 @@ class AudioSender:
         """Send an audio packet"""
         try:
             # Create packet header
-            timestamp = int(time.time() * 1000000)  # microseconds
+            timestamp = time.monotonic_ns()
             header = pack_audio_header(
                 self.audio_id,
                 timestamp,
                 self.sample_rate,
                 self.channels,
-                len(audio_data)
+                len(audio_data),
+                self.client_handle
             )
             
             # Send packet
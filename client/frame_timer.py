@@ -0,0 +1,106 @@
+"""
+Frame Timer - Precise waits for frame pacing
+Sleeps until an absolute time.monotonic_ns() deadline using an OS timer:
+timerfd on Linux, a high-resolution waitable timer on Windows, time.sleep elsewhere
+"""
+import ctypes
+import ctypes.util
+import os
+import sys
+import time
+
+# Linux timerfd constants
+CLOCK_MONOTONIC = 1
+TFD_CLOEXEC = 0o2000000
+TFD_TIMER_ABSTIME = 1
+
+# Windows waitable timer constants
+CREATE_WAITABLE_TIMER_HIGH_RESOLUTION = 0x2
+TIMER_ALL_ACCESS = 0x1F0003
+INFINITE = 0xFFFFFFFF
+
+class _TimeSpec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long),
+                ('tv_nsec', ctypes.c_long)]
+
+class _ITimerSpec(ctypes.Structure):
+    _fields_ = [('it_interval', _TimeSpec),
+                ('it_value', _TimeSpec)]
+
+class FrameTimer:
+    """Waits until absolute monotonic deadlines with better than time.sleep granularity"""
+
+    def __init__(self):
+        self.timer_fd = None
+        self.timer_handle = None
+        self.period_raised = False
+
+        try:
+            if sys.platform.startswith('linux'):
+                self._open_timerfd()
+            elif sys.platform == 'win32':
+                self._open_waitable_timer()
+        except (OSError, AttributeError) as e:
+            print(f"[FrameTimer] OS timer not available, using time.sleep: {e}")
+            self.timer_fd = None
+            self.timer_handle = None
+
+    def _open_timerfd(self):
+        """Create a CLOCK_MONOTONIC timerfd (same clock as time.monotonic_ns on Linux)"""
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._timerfd_settime = libc.timerfd_settime
+        self._timerfd_settime.argtypes = [ctypes.c_int, ctypes.c_int,
+                                          ctypes.POINTER(_ITimerSpec), ctypes.c_void_p]
+
+        fd = libc.timerfd_create(CLOCK_MONOTONIC, TFD_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'timerfd_create failed')
+        self.timer_fd = fd
+        self.timer_spec = _ITimerSpec()
+
+    def _open_waitable_timer(self):
+        """Create a high-resolution waitable timer, or raise the system timer resolution to 1 ms"""
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.CreateWaitableTimerExW(None, None, CREATE_WAITABLE_TIMER_HIGH_RESOLUTION, TIMER_ALL_ACCESS)
+        if not handle:
+            # High-resolution timers need Windows 10 1803+; fall back to a 1 ms tick
+            handle = kernel32.CreateWaitableTimerW(None, True, None)
+            ctypes.windll.winmm.timeBeginPeriod(1)
+            self.period_raised = True
+        if not handle:
+            raise OSError('CreateWaitableTimer failed')
+        self.timer_handle = handle
+
+    def sleep_until(self, deadline_ns):
+        """Block until time.monotonic_ns() reaches deadline_ns"""
+        remaining_ns = deadline_ns - time.monotonic_ns()
+        if remaining_ns <= 0:
+            return
+
+        if self.timer_fd is not None:
+            self.timer_spec.it_value.tv_sec = deadline_ns // 1000000000
+            self.timer_spec.it_value.tv_nsec = deadline_ns % 1000000000
+            if self._timerfd_settime(self.timer_fd, TFD_TIMER_ABSTIME, ctypes.byref(self.timer_spec), None) == 0:
+                os.read(self.timer_fd, 8)  # Expiration count, blocks until the deadline
+                return
+        elif self.timer_handle is not None:
+            # Negative due time = relative, in 100 ns units
+            due = ctypes.c_longlong(-max(1, remaining_ns // 100))
+            kernel32 = ctypes.windll.kernel32
+            if kernel32.SetWaitableTimer(self.timer_handle, ctypes.byref(due), 0, None, None, False):
+                kernel32.WaitForSingleObject(self.timer_handle, INFINITE)
+                return
+
+        time.sleep(remaining_ns / 1e9)
+
+    def close(self):
+        """Release the OS timer"""
+        if self.timer_fd is not None:
+            os.close(self.timer_fd)
+            self.timer_fd = None
+        if self.timer_handle is not None:
+            ctypes.windll.kernel32.CloseHandle(self.timer_handle)
+            self.timer_handle = None
+        if self.period_raised:
+            ctypes.windll.winmm.timeEndPeriod(1)
+            self.period_raised = False
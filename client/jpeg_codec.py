@@ -0,0 +1,68 @@
+"""
+JPEG Codec - JPEG encode/decode for video frames
+Uses libjpeg-turbo (PyTurboJPEG) when installed, OpenCV otherwise
+"""
+import inspect
+import cv2
+import numpy as np
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+except ImportError:
+    TurboJPEG = None
+
+def _load_turbojpeg():
+    """Create the TurboJPEG handle, or None if PyTurboJPEG / libturbojpeg is missing"""
+    if TurboJPEG is None:
+        return None
+    try:
+        return TurboJPEG()
+    except Exception as e:
+        print(f"[JpegCodec] libturbojpeg not available, using OpenCV: {e}")
+        return None
+
+_turbo = _load_turbojpeg()
+
+# PyTurboJPEG 2.0+ can compress straight into a caller-owned buffer
+_turbo_dst = _turbo is not None and 'dst' in inspect.signature(_turbo.encode).parameters
+
+# cv2.imencode parameter lists, built once per quality level
+_imencode_params = {}
+
+def new_jpeg_buffer(frame):
+    """Allocate an output buffer big enough for any JPEG of frames this size, or None if unsupported"""
+    if not _turbo_dst:
+        return None
+    return bytearray(_turbo.buffer_size(frame, TJSAMP_420))
+
+def encode_jpeg(frame, quality, dst=None):
+    """Encode a BGR frame to JPEG; returns bytes or a writable buffer. With a dst from
+    new_jpeg_buffer the result is a view into it, valid until the next encode into it"""
+    if _turbo:
+        # 4:2:0 to match OpenCV's default subsampling
+        if dst is None:
+            return _turbo.encode(frame, quality=quality, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+        result, size = _turbo.encode(frame, quality=quality, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420,
+                                     dst=dst)
+        return memoryview(result)[:size]
+    
+    params = _imencode_params.get(quality)
+    if params is None:
+        # Single-pass baseline encode: no Huffman optimization pass, no progressive scans
+        params = _imencode_params[quality] = [cv2.IMWRITE_JPEG_QUALITY, quality,
+                                              cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+                                              cv2.IMWRITE_JPEG_PROGRESSIVE, 0,
+                                              cv2.IMWRITE_JPEG_RST_INTERVAL, 0]
+    _, encoded_frame = cv2.imencode('.jpg', frame, params)
+    # Hand out the encoder's array as a flat buffer rather than copying it to bytes
+    return memoryview(encoded_frame.reshape(-1))
+
+def decode_jpeg(payload):
+    """Decode JPEG bytes to a BGR frame; returns None if the payload is corrupt"""
+    if _turbo:
+        try:
+            return _turbo.decode(payload, pixel_format=TJPF_BGR)
+        except Exception:
+            return None
+    
+    return cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
@@ -3,10 +3,11 @@ Main Client Application - Integrates all components
 """
 import sys
 import os
+import threading
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from PyQt5.QtWidgets import QApplication, QStackedWidget, QMessageBox
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 
 from ui_home import HomeScreen
 from ui_waiting_room import WaitingRoomScreen
@@ -26,24 +27,28 @@ class ClientApplication(QStackedWidget):
     """Main client application"""
     
     # Signal for thread-safe join request handling
-    join_request_signal = pyqtSignal(str)  # client_name
+    join_request_signal = pyqtSignal(str, object)  # client_name, client_handle (None from older servers)
     participant_joined_signal = pyqtSignal(str, bool)  # participant_name, is_host
     
     # File transfer signals
     file_start_signal = pyqtSignal(str, int)  # filename, filesize
-    file_chunk_signal = pyqtSignal(int, str, str)  # chunk_id, data_b64, sender_name
+    file_chunk_signal = pyqtSignal(int, bytes, str)  # chunk_id, data, sender_name
     file_end_signal = pyqtSignal(str)  # checksum
     chat_signal = pyqtSignal(str, str, bool)  # sender, message, is_private
     camera_status_signal = pyqtSignal(str, bool)  # participant_name, camera_enabled
     quality_changed_signal = pyqtSignal(str) # quality_text
+    video_frames_ready_signal = pyqtSignal()  # new frames waiting in _pending_frames
     
-    def __init__(self, server_host='127.0.0.1', server_tcp_port=5000, server_udp_port=5001, simulated_loss_rate=0.0):
+    def __init__(self, server_host='127.0.0.1', server_tcp_port=5000, server_udp_port=5001, simulated_loss_rate=0.0,
+                 use_gl_video=False, video_codec='jpeg'):
         super().__init__()
         
         self.server_host = server_host
         self.server_tcp_port = server_tcp_port
         self.server_udp_port = server_udp_port
         self.simulated_loss_rate = simulated_loss_rate
+        self.use_gl_video = use_gl_video
+        self.video_codec = video_codec
         
         # Session
         self.session = None
@@ -63,12 +68,18 @@ class ClientApplication(QStackedWidget):
         self.audio_receiver = None
         self.stats_collector = None
         
+        # Newest undisplayed frame per participant: {participant_id: (seq, frame)}
+        # Filled by sender/receiver threads, drained by update_video_frames on the UI thread
+        self._pending_frames = {}
+        self._pending_frames_lock = threading.Lock()
+        
         # Connect signals to main-thread handlers
         self.join_request_signal.connect(self._handle_join_request_ui)
         self.participant_joined_signal.connect(self._handle_participant_joined_ui)
         self.chat_signal.connect(self._handle_chat_ui)
         self.camera_status_signal.connect(self._handle_camera_status_ui)
         self.quality_changed_signal.connect(self._handle_quality_change_ui)
+        self.video_frames_ready_signal.connect(self.update_video_frames, Qt.QueuedConnection)
         self.file_transfer = None
         self.file_receiver = None
         
@@ -190,31 +201,38 @@ class ClientApplication(QStackedWidget):
         """Handle new join request notification (called from TCP thread)"""
         client_name = msg.get('client_name')
         # Emit signal to handle in main thread
-        self.join_request_signal.emit(client_name)
+        self.join_request_signal.emit(client_name, msg.get('client_handle'))
     
-    def _handle_join_request_ui(self, client_name):
+    def _handle_join_request_ui(self, client_name, client_handle):
         """Handle join request in main Qt thread"""
         if not self.is_host:
             return
         
-        # Show dialog to approve/deny
-        from PyQt5.QtWidgets import QMessageBox
-        reply = QMessageBox.question(
-            self,
+        # Show a non-modal approve/deny dialog so the event loop keeps running
+        # (and several requests can be pending at once)
+        box = QMessageBox(
+            QMessageBox.Question,
             "Join Request",
             f"{client_name} wants to join the meeting.\nAllow them to join?",
             QMessageBox.Yes | QMessageBox.No,
-            QMessageBox.Yes
+            self
         )
-        
+        box.setDefaultButton(QMessageBox.Yes)
+        box.setWindowModality(Qt.NonModal)
+        box.setAttribute(Qt.WA_DeleteOnClose)
+        box.finished.connect(lambda reply: self._on_join_request_answered(client_name, client_handle, reply))
+        box.show()
+    
+    def _on_join_request_answered(self, client_name, client_handle, reply):
+        """Send the host's answer to a join request"""
         if reply == QMessageBox.Yes:
             print(f"[Client] Approving join request from {client_name}")
             if self.session:
-                self.session.allow_participant(client_name)
+                self.session.allow_participant(client_name, client_handle)
         else:
             print(f"[Client] Denying join request from {client_name}")
             if self.session:
-                self.session.deny_participant(client_name)
+                self.session.deny_participant(client_name, client_handle)
     
     def on_allow_participant(self, participant_name):
         """Allow a participant"""
@@ -230,7 +248,7 @@ class ClientApplication(QStackedWidget):
     def on_enter_meeting(self):
         """Enter the meeting room"""
         # Create meeting screen
-        self.meeting_screen = MeetingScreen()
+        self.meeting_screen = MeetingScreen(use_gl_video=self.use_gl_video)
         self.meeting_screen.set_mic_state(self.mic_enabled)
         self.meeting_screen.set_camera_state(self.camera_enabled)
         
@@ -243,11 +261,6 @@ class ClientApplication(QStackedWidget):
         self.meeting_screen.leave_meeting_signal.connect(self.on_leave_meeting)
         self.meeting_screen.show_stats_signal.connect(self.on_show_stats)
         
-        # Connect frame update to timer
-        self.meeting_screen.timer.timeout.disconnect()  # Disconnect old connection
-        self.meeting_screen.timer.timeout.connect(self.update_video_frames)  # Connect to our method
-        
-        
         # Add self video and update info
         self.meeting_screen.set_meeting_info(getattr(self, 'meeting_code', 'Unknown'), self.client_name)
         self.meeting_screen.add_video_stream('self', self.client_name)
@@ -262,12 +275,13 @@ class ClientApplication(QStackedWidget):
             print(f"[Client] Adding {len(self.pending_participants)} buffered participants")
             for p in self.pending_participants:
                 name = p['name']
-                is_host = p.get('is_host', False)
                 self.meeting_screen.add_video_stream(name, name)
-                self.meeting_screen.add_participant_to_list(name, is_host)
                 # Initialize camera status for buffered participant
                 self.participant_camera_status[name] = True
                 print(f"[Client] Initialized buffered participant {name} camera status: ON")
+            self.meeting_screen.bulk_add_participants(
+                [(p['name'], p.get('is_host', False)) for p in self.pending_participants]
+            )
             self.pending_participants = []
             
         self.session.tcp_control.register_handler(MSG_CHAT_BROADCAST, self.on_chat_received)
@@ -296,8 +310,11 @@ class ClientApplication(QStackedWidget):
             self.server_udp_port, 
             client_name=self.client_name,
             camera_index=camera_index,
-            simulated_loss_rate=self.simulated_loss_rate
+            simulated_loss_rate=self.simulated_loss_rate,
+            video_codec=self.video_codec,
+            client_handle=self.session.client_handle
         )
+        self.video_sender.frame_callback = self._on_local_frame
         if self.camera_enabled:
             self.video_sender.start()
         else:
@@ -309,12 +326,17 @@ class ClientApplication(QStackedWidget):
         
         # Video receiver (use port 0 to let OS assign a free port)
         self.video_receiver = VideoReceiver(0, simulated_loss_rate=self.simulated_loss_rate)
-
+        # Decoded BGR frames: everything for GL tiles (uploaded as textures),
+        # H.264 streams for QLabel tiles
+        self.video_receiver.frame_callback = self._on_remote_frame
+        if not self.use_gl_video:
+            # QLabel tiles decode JPEG payloads themselves with Qt
+            self.video_receiver.jpeg_callback = self._on_remote_jpeg
         self.video_receiver.start()
         print(f"[Client] Video receiver listening on port {self.video_receiver.local_udp_port}")
         
         # Audio sender
-        self.audio_sender = AudioSender(self.server_host, self.server_udp_port)
+        self.audio_sender = AudioSender(self.server_host, self.server_udp_port, client_handle=self.session.client_handle)
         self.audio_sender.start()
         self.audio_sender.set_enabled(self.mic_enabled)
         
@@ -373,43 +395,50 @@ class ClientApplication(QStackedWidget):
         
         print("[Client] Streaming initialized")
     
+    def _on_local_frame(self, seq, frame):
+        """Called from the video sender thread for each captured frame"""
+        self._queue_video_frame('self', seq, frame)
+    
+    def _on_remote_frame(self, source_id, seq, frame):
+        """Called from the video receiver thread for each decoded frame"""
+        self._queue_video_frame(source_id, seq, frame)
+    
+    def _on_remote_jpeg(self, source_id, seq, jpeg_bytes):
+        """Called from the video receiver thread for each undecoded JPEG frame"""
+        self._queue_video_frame(source_id, seq, jpeg_bytes, is_jpeg=True)
+    
+    def _queue_video_frame(self, participant_id, seq, frame, is_jpeg=False):
+        """Store the newest frame and wake the UI thread if it is not already scheduled"""
+        with self._pending_frames_lock:
+            schedule = not self._pending_frames
+            self._pending_frames[participant_id] = (seq, frame, is_jpeg)
+        
+        # Frames arriving before the UI thread drains the dict just replace older ones
+        if schedule:
+            self.video_frames_ready_signal.emit()
+    
     def update_video_frames(self):
-        """Update video frames in meeting screen"""
-        if not self.meeting_screen:
-            return
+        """Push pending video frames to the meeting screen (runs on the UI thread)"""
+        with self._pending_frames_lock:
+            pending = self._pending_frames
+            self._pending_frames = {}
         
-        # Update own video from video sender's latest frame (only if camera is enabled OR screen sharing)
-        if self.video_sender and (self.camera_enabled or self.video_sender.is_screen_sharing):
-            frame = self.video_sender.get_latest_frame()
-            if frame is not None:
-                self.meeting_screen.update_video_frame('self', frame)
+        if not self.meeting_screen or not pending:
+            return
         
-        # Update received video streams for other participants
-        if self.video_receiver:
-            sender_frames = self.video_receiver.get_all_sender_frames()
-            
-            # Get list of other participants (not self) who have camera ON
-            all_other_participants = [pid for pid in self.meeting_screen.video_widgets.keys() if pid != 'self']
-            participants_with_camera_on = [
-                pid for pid in all_other_participants
-                if self.participant_camera_status.get(pid, True)  # Default to True (camera ON)
-            ]
+        updates = []
+        for participant_id, (seq, frame, is_jpeg) in pending.items():
+            if participant_id == 'self':
+                # Own video only if camera is enabled OR screen sharing
+                if not (self.video_sender and (self.camera_enabled or self.video_sender.is_screen_sharing)):
+                    continue
+            elif not self.participant_camera_status.get(participant_id, True):  # Default to True (camera ON)
+                continue
             
-            # Debug logging (only every 60 frames to avoid spam)
-            if not hasattr(self, '_frame_update_count'):
-                self._frame_update_count = 0
-            self._frame_update_count += 1
-            if self._frame_update_count % 60 == 0:
-                print(f"[Client] update_video_frames: all_participants={all_other_participants}, "
-                      f"camera_on={participants_with_camera_on}, "
-                      f"camera_status={self.participant_camera_status}")
-            
-            # Assign received frames to participant boxes
-            # Now we can match directly because frames are keyed by source_id (participant_name)
-            for participant_id in participants_with_camera_on:
-                if participant_id in sender_frames:
-                    frame = sender_frames[participant_id]
-                    self.meeting_screen.update_video_frame(participant_id, frame)
+            # Frames are keyed by source_id (participant_name), matching the video widgets
+            updates.append((participant_id, frame, seq, is_jpeg))
+        
+        self.meeting_screen.update_video_frames(updates)
     
     def on_send_chat(self, message_data):
         """Send chat message"""
@@ -635,11 +664,6 @@ class ClientApplication(QStackedWidget):
         """Leave meeting"""
         print("[Client] Leaving meeting...")
         
-        # Stop the video update timer
-        if self.meeting_screen and hasattr(self.meeting_screen, 'timer'):
-            self.meeting_screen.timer.stop()
-            print("[Client] Timer stopped")
-        
         # Stop streaming
         if self.video_sender:
             self.video_sender.stop()
@@ -652,6 +676,10 @@ class ClientApplication(QStackedWidget):
         if self.stats_collector:
             self.stats_collector.stop()
         
+        # Drop frames that arrived after the last UI update
+        with self._pending_frames_lock:
+            self._pending_frames.clear()
+        
         # Disconnect session
         if self.session:
             self.session.disconnect()
@@ -700,10 +728,10 @@ class ClientApplication(QStackedWidget):
             if self.meeting_screen:
                 self.meeting_screen.add_chat_message("System", f"Receiving file: {filename} ({filesize} bytes)...")
 
-    def _handle_file_chunk_ui(self, chunk_id, data_b64, sender_name):
+    def _handle_file_chunk_ui(self, chunk_id, data, sender_name):
         """Handle file chunk in main thread"""
         if self.file_receiver:
-            self.file_receiver.receive_chunk(chunk_id, data_b64)
+            self.file_receiver.receive_chunk(chunk_id, data)
             # Send ACK back to sender
             if self.session:
                 self.session.send_file_ack(chunk_id, sender_name)
@@ -725,6 +753,9 @@ def main():
     parser.add_argument('--udp-port', type=int, default=5001, help='Server UDP port (default: 5001)')
     parser.add_argument('--camera', type=int, help='Camera index (e.g., 0 for laptop, 1 for iVCam)')
     parser.add_argument('--drop-rate', type=float, default=0.0, help='Simulated packet loss rate 0-100 (default: 0)')
+    parser.add_argument('--gl-video', action='store_true', help='Render video tiles with OpenGL instead of QLabel pixmaps')
+    parser.add_argument('--video-codec', choices=['jpeg', 'h264'], default='jpeg',
+                        help='Video codec to send: h264 uses the GPU encoder via PyAV, falls back to jpeg (default: jpeg)')
     
     args = parser.parse_args()
     
@@ -738,7 +769,9 @@ def main():
         server_host=args.server,
         server_tcp_port=args.tcp_port,
         server_udp_port=args.udp_port,
-        simulated_loss_rate=args.drop_rate
+        simulated_loss_rate=args.drop_rate,
+        use_gl_video=args.gl_video,
+        video_codec=args.video_codec
     )
     client.show()
     sys.exit(app.exec_())
@@ -76,14 +76,13 @@ class StatsCollector(QObject):
         """Main stats collection loop"""
         while self.running:
             try:
-                self._send_heartbeat()
                 self._collect_stats()
                 self._apply_adaptive_logic()
                 
                 # Emit signal to UI
                 self.stats_updated_signal.emit(self.get_current_stats())
                 
-                self._send_stats_to_server()
+                self._send_to_server()
                 time.sleep(STATS_UPDATE_INTERVAL)
             
             except Exception as e:
@@ -151,19 +150,31 @@ class StatsCollector(QObject):
             rtt=self.current_rtt
         )
     
-    def _send_stats_to_server(self):
-        """Send stats to server (for coordination between peers)"""
-        if self.tcp_control and self.tcp_control.is_connected():
-            try:
-                self.tcp_control.send_message(
-                    MSG_VIDEO_STATS,
-                    loss=round(self.current_packet_loss, 2),
-                    rtt=round(self.current_rtt, 2),
-                    fps_recv=round(self.current_fps_received, 2),
-                    bitrate=round(self.current_bitrate, 2)
-                )
-            except:
-                pass  # Don't crash if sending fails
+    def _send_to_server(self):
+        """Send this round's heartbeat and stats to the server in one write"""
+        if not (self.tcp_control and self.tcp_control.is_connected()):
+            return
+        
+        messages = [self._stats_message()]
+        heartbeat = self._heartbeat_message()
+        if heartbeat:
+            messages.append(heartbeat)
+        
+        try:
+            self.tcp_control.send_messages(messages)
+            if heartbeat:
+                self.last_heartbeat_time = time.time()
+        except Exception as e:
+            print(f"[StatsCollector] Failed to send stats/heartbeat: {e}")
+    
+    def _stats_message(self):
+        """Stats for the server (for coordination between peers)"""
+        return (MSG_VIDEO_STATS, {
+            'loss': round(self.current_packet_loss, 2),
+            'rtt': round(self.current_rtt, 2),
+            'fps_recv': round(self.current_fps_received, 2),
+            'bitrate': round(self.current_bitrate, 2)
+        })
     
     def get_current_stats(self):
         """Get current statistics (thread-safe)"""
@@ -214,27 +225,21 @@ class StatsCollector(QObject):
             recent = list(self.packet_loss_history)[-window:]
             return sum(recent) / len(recent)
     
-    def _send_heartbeat(self):
-        """Send heartbeat to server for RTT measurement"""
-        if self.tcp_control and self.tcp_control.is_connected():
-            current_time = time.time()
-            # Send heartbeat every second
-            if current_time - self.last_heartbeat_time >= 1.0:
-                try:
-                    timestamp = time.time()
-                    self.heartbeat_send_time = timestamp
-                    self.tcp_control.send_message(MSG_HEARTBEAT, timestamp=timestamp)
-                    print(f"[StatsCollector] Heartbeat sent at {timestamp}")
-                    self.last_heartbeat_time = current_time
-                except Exception as e:
-                    print(f"[StatsCollector] Failed to send heartbeat: {e}")
+    def _heartbeat_message(self):
+        """Heartbeat for RTT measurement, or None if one went out less than a second ago"""
+        if time.time() - self.last_heartbeat_time < 1.0:
+            return None
+        # Monotonic integer ns: the server echoes it back untouched
+        timestamp = time.monotonic_ns()
+        self.heartbeat_send_time = timestamp
+        return (MSG_HEARTBEAT, {'timestamp': timestamp})
     
     def _on_heartbeat_ack(self, msg):
         """Handle heartbeat ACK from server"""
         print(f"[StatsCollector] Heartbeat ACK received: {msg}")
         sent_timestamp = msg.get('timestamp', 0)
         if sent_timestamp > 0:
-            rtt_ms = (time.time() - sent_timestamp) * 1000
+            rtt_ms = (time.monotonic_ns() - sent_timestamp) / 1000000
             print(f"[StatsCollector] RTT calculated: {rtt_ms:.2f}ms")
             with self.stats_lock:
                 self.current_rtt = rtt_ms
@@ -5,12 +5,15 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import logging
 import socket
 import threading
 import queue
 import time
 from common.protocol import *
 
+logger = logging.getLogger(__name__)
+
 class TCPControl:
     """Manages TCP control connection to server"""
     
@@ -78,25 +81,30 @@ class TCPControl:
             raise Exception("Not connected to server")
         
         with self.send_lock:  # Thread-safe sending
-            print(f"[TCPControl] Acquired send_lock for {msg_type}")
             message = pack_tcp_message(msg_type, **kwargs)
-            print(f"[TCPControl] Message packed: type={msg_type}, size={len(message)} bytes, content={message[:100]}")
             
             try:
                 sent_bytes = self.socket.send(message)
-                print(f"[TCPControl] socket.send() returned: {sent_bytes} bytes for {msg_type}")
                 if sent_bytes < len(message):
-                    print(f"[TCPControl] WARNING: Only sent {sent_bytes}/{len(message)} bytes!")
                     remaining = message[sent_bytes:]
                     self.socket.sendall(remaining)
-                    print(f"[TCPControl] Sent remaining {len(remaining)} bytes")
-                print(f"[TCPControl] {msg_type}: All {len(message)} bytes sent successfully")
+                logger.debug("[TCPControl] %s: %d bytes sent", msg_type, len(message))
             except Exception as e:
                 print(f"[TCPControl] ERROR sending {msg_type}: {e}")
                 import traceback
                 traceback.print_exc()
                 raise
     
+    def send_messages(self, messages):
+        """Send several messages [(msg_type, kwargs), ...] in one write"""
+        if not self.socket:
+            raise Exception("Not connected to server")
+        
+        data = b''.join(pack_tcp_message(msg_type, **kwargs) for msg_type, kwargs in messages)
+        with self.send_lock:  # Thread-safe sending
+            self.socket.sendall(data)
+        logger.debug("[TCPControl] %d messages: %d bytes sent", len(messages), len(data))
+    
     def register_handler(self, msg_type, handler):
         """
         Register a handler for a specific message type
@@ -114,7 +122,7 @@ class TCPControl:
                     print("[TCPControl] Connection closed by server (msg is None)")
                     break
                 
-                print(f"[TCPControl] Received message: {msg.get('type')}")
+                logger.debug("[TCPControl] Received message: %s", msg.get('type'))
                 # Handle message
                 self._handle_message(msg)
             
@@ -188,6 +196,7 @@ class ClientSession:
         self.meeting_code = None
         self.is_host = False
         self.client_name = None
+        self.client_handle = 0  # Server-assigned, stamped on outgoing UDP packets
         self.participants = []
     
     def connect(self):
@@ -207,6 +216,7 @@ class ClientSession:
         response = self.tcp_control.wait_for_message(MSG_MEETING_CREATED)
         if response:
             self.meeting_code = response.get('meeting_code')
+            self.client_handle = response.get('client_handle', 0)
             self.is_host = True
             print(f"[ClientSession] Meeting created: {self.meeting_code}")
             return self.meeting_code
@@ -236,6 +246,7 @@ class ClientSession:
         response = self.tcp_control.wait_for_message(MSG_JOIN_ACCEPTED, timeout=30)
         
         if response and response.get('type') == MSG_JOIN_ACCEPTED:
+            self.client_handle = response.get('client_handle', 0)
             print(f"[ClientSession] Joined meeting {meeting_code}")
             return True
         elif response:
@@ -246,22 +257,29 @@ class ClientSession:
         print(f"[ClientSession] Failed to join meeting")
         return False
     
-    def allow_participant(self, participant_name):
-        """Allow a waiting participant to join (host only)"""
+    def allow_participant(self, participant_name, client_handle=None):
+        """Allow a waiting participant to join (host only); client_handle comes from NEW_JOIN_REQUEST"""
         if not self.is_host:
             return False
         
-        self.tcp_control.send_message(MSG_ALLOW_JOIN, client_name=participant_name)
+        self.tcp_control.send_message(MSG_ALLOW_JOIN, **self._join_target(participant_name, client_handle))
         return True
     
-    def deny_participant(self, participant_name):
+    def deny_participant(self, participant_name, client_handle=None):
         """Deny a waiting participant (host only)"""
         if not self.is_host:
             return False
         
-        self.tcp_control.send_message(MSG_DENY_JOIN, client_name=participant_name)
+        self.tcp_control.send_message(MSG_DENY_JOIN, **self._join_target(participant_name, client_handle))
         return True
     
+    def _join_target(self, participant_name, client_handle):
+        """Fields naming a waiting participant; the server prefers the handle when there is one"""
+        fields = {'client_name': participant_name}
+        if client_handle is not None:
+            fields['client_handle'] = client_handle
+        return fields
+    
     def send_chat(self, message, target_name="Everyone"):
         """Send a chat message"""
         self.tcp_control.send_message(MSG_CHAT, message=message, target_name=target_name)
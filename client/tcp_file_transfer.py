@@ -4,7 +4,6 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import time
 import hashlib
-import base64
 import threading
 from common.protocol import *
 
@@ -159,13 +158,6 @@ class TCPFileTransfer:
 
     def send_chunk(self, chunk_id, data):
         """Send a file chunk"""
-        try:
-            # Encode data as base64 for JSON transmission
-            data_b64 = base64.b64encode(data).decode('utf-8')
-        except Exception as e:
-            print(f"[FileTransfer] ERROR encoding chunk {chunk_id}: {e}")
-            return
-
         with self.lock:
             # Record send time and state
             self.chunk_send_times[chunk_id] = time.time()
@@ -179,7 +171,7 @@ class TCPFileTransfer:
             self.tcp_control.send_message(
                 MSG_FILE_CHUNK,
                 chunk_id=chunk_id,
-                data=data_b64,
+                data=data,  # Raw bytes: msgpack carries them as bin
                 target_name=self.target
             )
             # print(f"[FileTransfer] SEND CHUNK {chunk_id} (cwnd={self.cwnd}, in_flight={len(self.unacked_chunks)})")
@@ -313,15 +305,11 @@ class FileReceiver:
         
         print(f"[FileReceiver] Receiving file: {filename} ({filesize} bytes)")
     
-    def receive_chunk(self, chunk_id, data_b64):
-        """Receive a file chunk"""
+    def receive_chunk(self, chunk_id, data):
+        """Receive a file chunk (raw bytes)"""
         if not self.receiving or not self.file_handle:
             return
         
-        # Decode base64 data
-        # Decode base64 data
-        data = base64.b64decode(data_b64)
-        
         # Calculate offset and seek (Prevent duplicates/corruption)
         offset = chunk_id * BASE_CHUNK_SIZE
         self.file_handle.seek(offset)
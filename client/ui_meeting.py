@@ -6,15 +6,286 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QLabel, QTextEdit, QLineEdit, QListWidget, 
+                             QLabel, QTextEdit, QLineEdit, QListWidget, QListWidgetItem,
                              QSplitter, QFileDialog, QScrollArea, QGridLayout,
-                             QTabWidget, QComboBox, QFrame)
-from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QSize
-from PyQt5.QtGui import QFont, QImage, QPixmap, QIcon
+                             QTabWidget, QComboBox, QFrame, QOpenGLWidget)
+from PyQt5.QtCore import (Qt, pyqtSignal, QTimer, QSize, QObject, QRunnable, QThreadPool, QEvent,
+                          QBuffer, QByteArray, QIODevice)
+from PyQt5.QtGui import (QFont, QImage, QImageReader, QPixmap, QPixmapCache, QIcon, QColor, QPainter, QVector2D,
+                         QTextCursor, QTextCharFormat, QTextBlockFormat,
+                         QOpenGLShader, QOpenGLShaderProgram, QOpenGLTexture, QOpenGLBuffer,
+                         QOpenGLPixelTransferOptions, QOpenGLVersionProfile)
 from styles import Theme
 import cv2
+import logging
+import math
+import time
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+# Stylesheets are resolved from Theme once at import instead of on every widget construction
+_VIDEO_TILE_STYLE = f"""
+    QLabel {{
+        background-color: #000000;
+        color: white; /* Ensure text is visible */
+        border: 2px solid {Theme.SURFACE_HOVER};
+        border-radius: 8px;
+    }}
+"""
+
+_MEETING_STYLE = f"background-color: {Theme.BACKGROUND}; font-family: 'Segoe UI', sans-serif;"
+
+_LIVE_BADGE_STYLE = f"color: white; background-color: {Theme.ERROR}; border-radius: 4px; font-weight: bold; padding: 2px;"
+
+_QUALITY_LABEL_STYLE = f"color: {Theme.PRIMARY}; margin-right: 20px;"
+
+_CODE_LABEL_STYLE = f"color: {Theme.TEXT_MED}; font-family: monospace; font-size: 14px; background-color: {Theme.SURFACE}; padding: 5px 10px; border-radius: 5px;"
+
+_NOTIFICATION_STYLE = f"""
+    QLabel {{
+        background-color: {Theme.PRIMARY};
+        color: black;
+        font-weight: bold;
+        font-size: 14px;
+        padding: 10px 20px;
+        border-radius: 20px;
+    }}
+"""
+
+_CONTROLS_BAR_STYLE = f"""
+    QFrame {{
+        background-color: {Theme.SURFACE};
+        border-radius: 30px;
+        border: 1px solid {Theme.DIVIDER};
+    }}
+"""
+
+_TOGGLE_BTN_STYLE = f"""
+    QPushButton {{
+        background-color: {Theme.SURFACE_HOVER};
+        border-radius: 30px;
+        font-size: 24px;
+    }}
+    QPushButton:checked {{
+        background-color: {Theme.SURFACE_HOVER}; /* Default styling for ON */
+        border: 2px solid {Theme.SUCCESS};
+    }}
+    QPushButton:!checked {{
+        background-color: {Theme.ERROR};
+        border: 2px solid {Theme.ERROR};
+    }}
+"""
+
+_SCREEN_SHARE_BTN_STYLE = f"""
+    QPushButton {{
+        background-color: {Theme.SURFACE_HOVER};
+        border-radius: 30px;
+        font-size: 24px;
+    }}
+    QPushButton:checked {{
+        background-color: {Theme.SECONDARY}; 
+        border: 2px solid {Theme.SECONDARY};
+        color: black;
+    }}
+    QPushButton:!checked {{
+        background-color: {Theme.SURFACE_HOVER};
+        border: none;
+        color: {Theme.TEXT_HIGH};
+    }}
+    QPushButton:hover {{
+        background-color: {Theme.PRIMARY};
+    }}
+"""
+
+_STATS_BTN_STYLE = f"""
+    QPushButton {{
+        background-color: {Theme.SURFACE_HOVER};
+        border-radius: 25px;
+        font-size: 20px;
+    }}
+    QPushButton:hover {{
+        background-color: {Theme.PRIMARY};
+    }}
+"""
+
+_LEAVE_BTN_STYLE = f"""
+    QPushButton {{
+        background-color: {Theme.ERROR};
+        border-radius: 30px;
+        font-size: 24px;
+    }}
+    QPushButton:hover {{
+        background-color: #B00020;
+    }}
+"""
+
+_SIDEBAR_STYLE = f"background-color: {Theme.SURFACE}; border-left: 1px solid {Theme.DIVIDER};"
+
+_CHAT_DISPLAY_STYLE = f"background-color: {Theme.BACKGROUND}; border: 1px solid {Theme.DIVIDER}; border-radius: 8px; padding: 10px;"
+
+_TARGET_LABEL_STYLE = f"color: {Theme.TEXT_MED};"
+
+_CHAT_TARGET_COMBO_STYLE = f"""
+    QComboBox {{
+        background-color: {Theme.BACKGROUND};
+        color: {Theme.TEXT_HIGH};
+        border: 1px solid {Theme.DIVIDER};
+        padding: 5px;
+        border-radius: 5px;
+    }}
+"""
+
+_SEND_BTN_STYLE = f"""
+    QPushButton {{
+        background-color: {Theme.PRIMARY};
+        color: black;
+        border-radius: 20px;
+        font-weight: bold;
+    }}
+    QPushButton:hover {{
+        background-color: {Theme.PRIMARY_VARIANT};
+    }}
+"""
+
+_FILE_BTN_STYLE = f"""
+    QPushButton {{
+        background-color: transparent;
+        border: 1px solid {Theme.DIVIDER};
+        color: {Theme.TEXT_MED};
+        border-radius: 5px;
+        padding: 8px;
+    }}
+    QPushButton:hover {{
+        background-color: {Theme.SURFACE_HOVER};
+        color: {Theme.TEXT_HIGH};
+    }}
+"""
+
+_PARTICIPANTS_LIST_STYLE = f"""
+    QListWidget {{
+        background-color: {Theme.BACKGROUND};
+        border: 1px solid {Theme.DIVIDER};
+        border-radius: 8px;
+        color: {Theme.TEXT_HIGH};
+        padding: 5px;
+    }}
+    QListWidget::item {{
+        padding: 10px;
+        border-bottom: 1px solid {Theme.DIVIDER};
+    }}
+"""
+
+_SPLITTER_STYLE = f"QSplitter::handle {{ background-color: {Theme.DIVIDER}; }}"
+# Ping label colour bands: good / fair / poor
+_PING_STYLES = [
+    f"color: {color}; margin-left: 10px; font-weight: bold;"
+    for color in (Theme.SUCCESS, "#FFC107", Theme.ERROR)
+]
+
+class FrameProcessorSignals(QObject):
+    """Signals for VideoFrameProcessor (QRunnable cannot emit by itself)"""
+    processed = pyqtSignal(int, QImage)  # generation, image
+    failed = pyqtSignal(str)  # error message
+
+class FrameBuffer:
+    """Pixel buffer and QImage wrapping it, reused across frames of the same size"""
+    
+    def __init__(self):
+        self.array = None
+        self.image = None
+    
+    def get(self, width, height):
+        """Return (array, image) for the given size, reallocating only when it changes"""
+        if self.array is None or self.array.shape[:2] != (height, width):
+            self.array = np.empty((height, width, 3), dtype=np.uint8)
+            # The QImage does not copy: it reads straight from self.array
+            self.image = QImage(self.array.data, width, height, 3 * width, QImage.Format_BGR888)
+        return self.array, self.image
+
+class VideoFrameProcessor(QRunnable):
+    """Scales a BGR frame into a BGR888 QImage on a pool thread"""
+    
+    def __init__(self, frame, target_size, generation, signals, buffer):
+        super().__init__()
+        self.frame = frame
+        self.target_width = target_size.width()
+        self.target_height = target_size.height()
+        self.generation = generation
+        self.signals = signals
+        self.buffer = buffer
+    
+    def run(self):
+        """Resize to fit the target (keeping aspect ratio) and emit the QImage"""
+        try:
+            height, width = self.frame.shape[:2]
+            scale = min(self.target_width / width, self.target_height / height)
+            new_width = max(1, int(width * scale))
+            new_height = max(1, int(height * scale))
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            
+            # Sliced/reversed views would make OpenCV copy anyway; do it once up front
+            frame = self.frame
+            if not frame.flags['C_CONTIGUOUS']:
+                frame = np.ascontiguousarray(frame)
+            
+            # Qt reads BGR natively, so the resize writes straight into the
+            # widget's reusable QImage buffer with no channel swap pass
+            pixels, image = self.buffer.get(new_width, new_height)
+            cv2.resize(frame, (new_width, new_height), dst=pixels, interpolation=interpolation)
+            self.signals.processed.emit(self.generation, image)
+        except Exception as e:
+            # Report back so the widget does not wait on this frame forever
+            self.signals.failed.emit(str(e))
+
+class JpegFrameProcessor(QRunnable):
+    """Decodes a JPEG payload with Qt's image reader at (close to) display size on a pool thread"""
+    
+    def __init__(self, jpeg_bytes, target_size, generation, signals):
+        super().__init__()
+        self.jpeg_bytes = jpeg_bytes
+        self.target_size = target_size
+        self.generation = generation
+        self.signals = signals
+    
+    def run(self):
+        """Decode, fit the target keeping aspect ratio and emit the QImage"""
+        try:
+            buffer = QBuffer()
+            buffer.setData(QByteArray(self.jpeg_bytes))
+            buffer.open(QIODevice.ReadOnly)
+            reader = QImageReader(buffer, b'JPEG')
+            
+            # Asking for the display size up front lets libjpeg decode at 1/2, 1/4 or 1/8
+            # scale in the DCT domain instead of decoding full size and scaling down
+            size = reader.size()
+            if size.isValid():
+                fitted = size.scaled(self.target_size, Qt.KeepAspectRatio)
+                if fitted.width() < size.width():
+                    reader.setScaledSize(fitted)
+            
+            image = reader.read()
+            if image.isNull():
+                raise ValueError(f"could not decode JPEG payload: {reader.errorString()}")
+            if not reader.scaledSize().isValid() or image.size() != reader.scaledSize():
+                # Upscaling (or no size from the header): scale the decoded image
+                image = image.scaled(self.target_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            self.signals.processed.emit(self.generation, image)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+
+class FrameBatchProcessor(QRunnable):
+    """Runs the frame jobs of several tiles back to back in a single pool task"""
+    
+    def __init__(self, jobs):
+        super().__init__()
+        self.jobs = jobs
+    
+    def run(self):
+        """Run each job in order (OpenCV still parallelises inside each resize)"""
+        for job in self.jobs:
+            job.run()
+
 class VideoWidget(QLabel):
     """Widget to display a single video stream"""
     
@@ -22,42 +293,309 @@ class VideoWidget(QLabel):
         super().__init__()
         self.participant_name = participant_name
         self.setMinimumSize(320, 240)
-        self.setStyleSheet(f"""
-            QLabel {{
-                background-color: #000000;
-                color: white; /* Ensure text is visible */
-                border: 2px solid {Theme.SURFACE_HOVER};
-                border-radius: 8px;
-            }}
-        """)
+        self.setStyleSheet(_VIDEO_TILE_STYLE)
         self.setAlignment(Qt.AlignCenter)
-        self.setText(f"{participant_name}\n(No Video)")
         self.setFont(QFont('Segoe UI', 14))
+        
+        # Change detection: skip the convert/scale/paint pipeline when the
+        # producer hands us the same frame again (same seq)
+        self._last_seq = -1
+        
+        # Name shown on the placeholder, None while video is showing
+        self._placeholder_name = None
+        
+        # Frame conversion runs on QThreadPool; at most one frame per widget is in
+        # flight and only the newest waiting frame is kept. The generation is bumped
+        # by show_placeholder so late results from the pool are discarded.
+        # With one frame in flight the pool can safely reuse a single buffer.
+        self._frame_buffer = FrameBuffer()
+        self._frame_signals = FrameProcessorSignals()
+        self._frame_signals.processed.connect(self._on_frame_processed)
+        self._frame_signals.failed.connect(self._on_frame_failed)
+        self._processing = False
+        self._queued_frame = None
+        self._generation = 0
+        self._last_error_time = 0.0  # Errors are logged at most once per second
+        
+        self.show_placeholder()
+    
+    def _placeholder_pixmap(self, name):
+        """'(No Video)' text pre-rendered at the current size, shared through QPixmapCache"""
+        size = self.contentsRect().size()
+        key = f"video_placeholder:{name}:{size.width()}x{size.height()}"
+        pixmap = QPixmapCache.find(key)
+        if pixmap is None:
+            pixmap = QPixmap(size)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setPen(QColor('white'))
+            painter.setFont(self.font())
+            painter.drawText(pixmap.rect(), Qt.AlignCenter, f"{name}\n(No Video)")
+            painter.end()
+            QPixmapCache.insert(key, pixmap)
+        return pixmap
+    
+    def show_placeholder(self, name=None):
+        """Show the '(No Video)' placeholder instead of a frame"""
+        self._last_seq = -1
+        self._queued_frame = None
+        self._generation += 1
+        self._placeholder_name = name or self.participant_name
+        self.setPixmap(self._placeholder_pixmap(self._placeholder_name))
     
-    def update_frame(self, frame):
-        """Update the video frame"""
+    def resizeEvent(self, event):
+        """Re-fetch the placeholder for the new size"""
+        super().resizeEvent(event)
+        if self._placeholder_name is not None:
+            self.setPixmap(self._placeholder_pixmap(self._placeholder_name))
+    
+    def update_frame(self, frame, seq, batch=None):
+        """Update the video frame
+        
+        seq is the producer's frame sequence number; a repeated seq is skipped.
+        If batch is a list the processing job is appended to it instead of
+        being started, so the caller can run several tiles as one pool task.
+        """
         if frame is None:
             return
         
-        try:
-            # Convert frame to Qt format
-            height, width, channel = frame.shape
-            bytes_per_line = 3 * width
-            q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-            q_img = q_img.rgbSwapped()  # BGR to RGB
-            
-            # Scale to widget size
-            pixmap = QPixmap.fromImage(q_img)
-            
-            # Scale properly maintaining aspect ratio
-            scaled_pixmap = pixmap.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            
-            # Clear text and set pixmap
-            self.setText("")  # Clear the "(No Video)" text
-            self.setPixmap(scaled_pixmap)
-            
-        except Exception as e:
-            print(f"[VideoWidget] Error updating frame: {e}")
+        if seq == self._last_seq:
+            return
+        self._last_seq = seq
+        
+        self._submit(frame, False, batch)
+    
+    def update_jpeg(self, jpeg_bytes, seq, batch=None):
+        """Update the video frame from a still-compressed JPEG payload
+        
+        Decoding happens in Qt's JPEG reader on the pool, skipping the
+        cv2.imdecode -> numpy -> QImage round trip.
+        """
+        if not jpeg_bytes:
+            return
+        
+        if seq == self._last_seq:
+            return
+        self._last_seq = seq
+        
+        self._submit(jpeg_bytes, True, batch)
+    
+    def _submit(self, frame, is_jpeg, batch=None):
+        """Start processing now, or park the frame as the newest one if the pool is busy"""
+        if self._processing:
+            # Conversion still running: keep only the newest frame
+            self._queued_frame = (frame, is_jpeg)
+        else:
+            self._start_processing(frame, is_jpeg, batch)
+    
+    def _start_processing(self, frame, is_jpeg=False, batch=None):
+        """Hand a frame to the thread pool for decoding/scaling and colour conversion"""
+        self._processing = True
+        if is_jpeg:
+            processor = JpegFrameProcessor(frame, self.contentsRect().size(), self._generation,
+                                           self._frame_signals)
+        else:
+            processor = VideoFrameProcessor(frame, self.contentsRect().size(), self._generation,
+                                            self._frame_signals, self._frame_buffer)
+        if batch is not None:
+            batch.append(processor)
+        else:
+            QThreadPool.globalInstance().start(processor)
+    
+    def _on_frame_processed(self, generation, image):
+        """Show a converted frame (GUI thread) and start on the next queued one"""
+        self._processing = False
+        
+        if generation == self._generation:
+            # Replace the placeholder with the frame
+            self._placeholder_name = None
+            self.setPixmap(QPixmap.fromImage(image))
+        
+        self._process_queued_frame()
+    
+    def _on_frame_failed(self, error):
+        """Log a conversion error (rate limited) and move on to the next queued frame"""
+        self._processing = False
+        
+        now = time.monotonic()
+        if now - self._last_error_time > 1.0:
+            logger.warning("[VideoWidget] Error updating frame for %s: %s", self.participant_name, error)
+            self._last_error_time = now
+        
+        self._process_queued_frame()
+    
+    def _process_queued_frame(self):
+        """Start converting the newest frame that arrived while the pool was busy"""
+        if self._queued_frame is not None:
+            frame, is_jpeg = self._queued_frame
+            self._queued_frame = None
+            self._start_processing(frame, is_jpeg)
+
+class GLVideoWidget(QOpenGLWidget):
+    """Video tile drawn with OpenGL: one texture upload per new frame, scaling and BGR->RGB on the GPU"""
+    
+    VERTEX_SHADER = """
+        attribute vec2 position;
+        attribute vec2 tex_coord;
+        varying vec2 v_tex_coord;
+        void main() {
+            gl_Position = vec4(position, 0.0, 1.0);
+            v_tex_coord = tex_coord;
+        }
+    """
+    
+    FRAGMENT_SHADER = """
+        #ifdef GL_ES
+        precision mediump float;
+        #endif
+        uniform sampler2D frame;
+        varying vec2 v_tex_coord;
+        void main() {
+            gl_FragColor = texture2D(frame, v_tex_coord);
+        }
+    """
+    
+    # Frame rows go top-down, GL texture coordinates go bottom-up
+    TEX_COORDS = [QVector2D(0, 1), QVector2D(1, 1), QVector2D(0, 0), QVector2D(1, 0)]
+    
+    def __init__(self, participant_name=""):
+        super().__init__()
+        self.participant_name = participant_name
+        self.placeholder_name = participant_name
+        self.setMinimumSize(320, 240)
+        self.setFont(QFont('Segoe UI', 14))
+        
+        self._last_seq = -1
+        self._pending_frame = None  # Frame waiting to be uploaded in paintGL
+        self._frame_size = None  # (width, height) of the allocated texture
+        
+        self._gl = None
+        self._program = None
+        self._texture = None
+        self._pixel_buffer = None
+        self._transfer_options = None
+    
+    def initializeGL(self):
+        """Compile the textured-quad shader"""
+        profile = QOpenGLVersionProfile()
+        profile.setVersion(2, 0)
+        self._gl = self.context().versionFunctions(profile)
+        self._gl.initializeOpenGLFunctions()
+        
+        self._program = QOpenGLShaderProgram(self)
+        self._program.addShaderFromSourceCode(QOpenGLShader.Vertex, self.VERTEX_SHADER)
+        self._program.addShaderFromSourceCode(QOpenGLShader.Fragment, self.FRAGMENT_SHADER)
+        self._program.link()
+        
+        # Frames are tightly packed 3-byte pixels, so rows are not 4-byte aligned
+        self._transfer_options = QOpenGLPixelTransferOptions()
+        self._transfer_options.setAlignment(1)
+        
+        # Frames are staged in a pixel unpack buffer so the driver can DMA them
+        # into the texture asynchronously; upload directly if PBOs are unavailable
+        self._pixel_buffer = QOpenGLBuffer(QOpenGLBuffer.PixelUnpackBuffer)
+        self._pixel_buffer.setUsagePattern(QOpenGLBuffer.StreamDraw)
+        if not self._pixel_buffer.create():
+            self._pixel_buffer = None
+    
+    def _upload_frame(self, frame):
+        """Copy a frame into the texture, through the pixel buffer when there is one"""
+        if self._pixel_buffer is None:
+            self._texture.setData(QOpenGLTexture.BGR, QOpenGLTexture.UInt8,
+                                  frame, self._transfer_options)
+            return
+        
+        self._pixel_buffer.bind()
+        # Re-allocating orphans the previous frame's storage instead of waiting for the GPU to finish with it
+        self._pixel_buffer.allocate(frame.nbytes)
+        self._pixel_buffer.write(0, frame, frame.nbytes)
+        # With a pixel unpack buffer bound, the data pointer is an offset into it
+        self._texture.setData(QOpenGLTexture.BGR, QOpenGLTexture.UInt8,
+                              None, self._transfer_options)
+        self._pixel_buffer.release()
+    
+    def _allocate_texture(self, width, height):
+        """(Re)allocate texture storage for the given frame size"""
+        if self._texture:
+            self._texture.destroy()
+        self._texture = QOpenGLTexture(QOpenGLTexture.Target2D)
+        self._texture.setSize(width, height)
+        self._texture.setFormat(QOpenGLTexture.RGB8_UNorm)
+        self._texture.setMinMagFilters(QOpenGLTexture.Linear, QOpenGLTexture.Linear)
+        self._texture.setWrapMode(QOpenGLTexture.ClampToEdge)
+        self._texture.allocateStorage(QOpenGLTexture.BGR, QOpenGLTexture.UInt8)
+        self._frame_size = (width, height)
+    
+    def _quad_vertices(self):
+        """Quad corners that fit the frame inside the widget keeping its aspect ratio"""
+        frame_w, frame_h = self._frame_size
+        scale_x = scale_y = 1.0
+        if frame_w * self.height() > frame_h * self.width():
+            scale_y = (frame_h * self.width()) / (frame_w * self.height())
+        else:
+            scale_x = (frame_w * self.height()) / (frame_h * self.width())
+        return [QVector2D(-scale_x, -scale_y), QVector2D(scale_x, -scale_y),
+                QVector2D(-scale_x, scale_y), QVector2D(scale_x, scale_y)]
+    
+    def paintGL(self):
+        """Upload the pending frame (if any) and draw it"""
+        if self._frame_size is None and self._pending_frame is None:
+            self._paint_placeholder()
+            return
+        
+        if self._pending_frame is not None:
+            frame = self._pending_frame
+            self._pending_frame = None
+            height, width = frame.shape[:2]
+            if self._frame_size != (width, height):
+                self._allocate_texture(width, height)
+            self._upload_frame(frame)
+        
+        self._gl.glClearColor(0.0, 0.0, 0.0, 1.0)
+        self._gl.glClear(self._gl.GL_COLOR_BUFFER_BIT)
+        
+        self._program.bind()
+        self._texture.bind(0)
+        self._program.setUniformValue('frame', 0)
+        self._program.enableAttributeArray('position')
+        self._program.enableAttributeArray('tex_coord')
+        self._program.setAttributeArray('position', self._quad_vertices())
+        self._program.setAttributeArray('tex_coord', self.TEX_COORDS)
+        self._gl.glDrawArrays(self._gl.GL_TRIANGLE_STRIP, 0, 4)
+        self._program.disableAttributeArray('position')
+        self._program.disableAttributeArray('tex_coord')
+        self._texture.release()
+        self._program.release()
+    
+    def _paint_placeholder(self):
+        """Draw the '(No Video)' text"""
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('#000000'))
+        painter.setPen(QColor('white'))
+        painter.setFont(self.font())
+        painter.drawText(self.rect(), Qt.AlignCenter, f"{self.placeholder_name}\n(No Video)")
+        painter.end()
+    
+    def show_placeholder(self, name=None):
+        """Show the '(No Video)' placeholder instead of a frame"""
+        self._last_seq = -1
+        self._pending_frame = None
+        self._frame_size = None
+        self.placeholder_name = name or self.participant_name
+        self.update()
+    
+    def update_frame(self, frame, seq, batch=None):
+        """Stash the frame for the next paint; same signature as VideoWidget.update_frame (batch is unused)"""
+        if frame is None:
+            return
+        
+        if seq == self._last_seq:
+            return
+        self._last_seq = seq
+        
+        # The texture upload reads straight from the buffer, so it has to be contiguous
+        self._pending_frame = np.ascontiguousarray(frame)
+        self.update()
 
 class MeetingScreen(QWidget):
     """Main meeting screen UI"""
@@ -71,20 +609,19 @@ class MeetingScreen(QWidget):
     leave_meeting_signal = pyqtSignal()
     show_stats_signal = pyqtSignal()
     
-    def __init__(self):
+    def __init__(self, use_gl_video=False):
         super().__init__()
         self.video_widgets = {}  # {participant_id: VideoWidget}
+        self.video_widget_class = GLVideoWidget if use_gl_video else VideoWidget
+        self._grid_cols = 0  # Column count the grid is currently laid out with
+        self._participant_items = {}  # {name: QListWidgetItem} index over participants_list
         self.mic_enabled = True
         self.camera_enabled = True
         self.client_name = ""
         self.meeting_code = ""
         
         self.setup_ui()
-        
-        # Update timer for video frames
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.request_frame_update)
-        self.timer.start(33)  # ~30 FPS
+        self._init_chat_formats()
         
     def set_meeting_info(self, meeting_code, client_name):
         """Set meeting info"""
@@ -98,7 +635,7 @@ class MeetingScreen(QWidget):
         self.setWindowTitle("Meeting")
         self.setGeometry(50, 50, 1400, 900)
         self.setAttribute(Qt.WA_StyledBackground, True) # Force background paint
-        self.setStyleSheet(f"background-color: {Theme.BACKGROUND}; font-family: 'Segoe UI', sans-serif;")
+        self.setStyleSheet(_MEETING_STYLE)
         
         main_layout = QHBoxLayout()
         main_layout.setContentsMargins(0, 0, 0, 0)
@@ -114,13 +651,14 @@ class MeetingScreen(QWidget):
         
         # Live Indicator
         live_badge = QLabel(" ● LIVE ")
-        live_badge.setStyleSheet(f"color: white; background-color: {Theme.ERROR}; border-radius: 4px; font-weight: bold; padding: 2px;")
+        live_badge.setStyleSheet(_LIVE_BADGE_STYLE)
         header_layout.addWidget(live_badge)
         
         # Ping
         self.ping_label = QLabel("Ping: -- ms")
         self.ping_label.setFont(QFont('Segoe UI', 10, QFont.Bold))
-        self.ping_label.setStyleSheet(f"color: {Theme.SUCCESS}; margin-left: 10px;")
+        self.ping_label.setStyleSheet(_PING_STYLES[0])
+        self._ping_level = 0
         header_layout.addWidget(self.ping_label)
         
         header_layout.addStretch()
@@ -128,12 +666,12 @@ class MeetingScreen(QWidget):
         # Quality Label (Persistent)
         self.quality_label = QLabel("Quality: 360p")
         self.quality_label.setFont(QFont('Segoe UI', 12, QFont.Bold))
-        self.quality_label.setStyleSheet(f"color: {Theme.PRIMARY}; margin-right: 20px;")
+        self.quality_label.setStyleSheet(_QUALITY_LABEL_STYLE)
         header_layout.addWidget(self.quality_label)
         
         # Meeting Code (Top Right)
         self.code_label = QLabel("Code: ----")
-        self.code_label.setStyleSheet(f"color: {Theme.TEXT_MED}; font-family: monospace; font-size: 14px; background-color: {Theme.SURFACE}; padding: 5px 10px; border-radius: 5px;")
+        self.code_label.setStyleSheet(_CODE_LABEL_STYLE)
         header_layout.addWidget(self.code_label)
         
         left_layout.addLayout(header_layout)
@@ -142,17 +680,16 @@ class MeetingScreen(QWidget):
         # We will add this to the left_widget directly so it can float over
         self.notification_label = QLabel(left_widget)
         self.notification_label.setVisible(False)
-        self.notification_label.setStyleSheet(f"""
-            QLabel {{
-                background-color: {Theme.PRIMARY};
-                color: black;
-                font-weight: bold;
-                font-size: 14px;
-                padding: 10px 20px;
-                border-radius: 20px;
-            }}
-        """)
-        # We will position it dynamically in show_notification
+        self.notification_label.setStyleSheet(_NOTIFICATION_STYLE)
+        self.notification_label.setAlignment(Qt.AlignCenter)
+        self.notification_label.setFixedSize(360, 44)
+        # Anchored in eventFilter whenever the video area resizes, not on every show
+        left_widget.installEventFilter(self)
+        
+        # One reusable timer for hiding the toast
+        self.notification_timer = QTimer(self)
+        self.notification_timer.setSingleShot(True)
+        self.notification_timer.timeout.connect(self.notification_label.hide)
         
         # 2. Video Grid
         self.video_scroll = QScrollArea()
@@ -167,13 +704,7 @@ class MeetingScreen(QWidget):
         
         # 3. Floating Control Bar
         controls_container = QFrame()
-        controls_container.setStyleSheet(f"""
-            QFrame {{
-                background-color: {Theme.SURFACE};
-                border-radius: 30px;
-                border: 1px solid {Theme.DIVIDER};
-            }}
-        """)
+        controls_container.setStyleSheet(_CONTROLS_BAR_STYLE)
         controls_container.setFixedHeight(80)
         controls_layout = QHBoxLayout()
         controls_layout.setAlignment(Qt.AlignCenter)
@@ -185,21 +716,7 @@ class MeetingScreen(QWidget):
         self.mic_btn.setCheckable(True)
         self.mic_btn.setChecked(True)
         self.mic_btn.setCursor(Qt.PointingHandCursor)
-        self.mic_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {Theme.SURFACE_HOVER};
-                border-radius: 30px;
-                font-size: 24px;
-            }}
-            QPushButton:checked {{
-                background-color: {Theme.SURFACE_HOVER}; /* Default styling for ON */
-                border: 2px solid {Theme.SUCCESS};
-            }}
-            QPushButton:!checked {{
-                background-color: {Theme.ERROR};
-                border: 2px solid {Theme.ERROR};
-            }}
-        """)
+        self.mic_btn.setStyleSheet(_TOGGLE_BTN_STYLE)
         self.mic_btn.clicked.connect(self.on_toggle_mic)
         
         # Camera Button
@@ -208,7 +725,7 @@ class MeetingScreen(QWidget):
         self.camera_btn.setCheckable(True)
         self.camera_btn.setChecked(True)
         self.camera_btn.setCursor(Qt.PointingHandCursor)
-        self.camera_btn.setStyleSheet(self.mic_btn.styleSheet()) # Reuse same style logic
+        self.camera_btn.setStyleSheet(_TOGGLE_BTN_STYLE)
         self.camera_btn.clicked.connect(self.on_toggle_camera)
         
         # Screen Share Button
@@ -217,58 +734,21 @@ class MeetingScreen(QWidget):
         self.screen_share_btn.setCheckable(True)
         self.screen_share_btn.setChecked(False)
         self.screen_share_btn.setCursor(Qt.PointingHandCursor)
-        self.screen_share_btn.setStyleSheet(f"""
-             QPushButton {{
-                background-color: {Theme.SURFACE_HOVER};
-                border-radius: 30px;
-                font-size: 24px;
-            }}
-            QPushButton:checked {{
-                background-color: {Theme.SECONDARY}; 
-                border: 2px solid {Theme.SECONDARY};
-                color: black;
-            }}
-            QPushButton:!checked {{
-                background-color: {Theme.SURFACE_HOVER};
-                border: none;
-                color: {Theme.TEXT_HIGH};
-            }}
-             QPushButton:hover {{
-                background-color: {Theme.PRIMARY};
-            }}
-        """)
+        self.screen_share_btn.setStyleSheet(_SCREEN_SHARE_BTN_STYLE)
         self.screen_share_btn.clicked.connect(self.on_toggle_screen_share)
         
         # Stats Button
         self.stats_btn = QPushButton("📊")
         self.stats_btn.setFixedSize(50, 50)
         self.stats_btn.setCursor(Qt.PointingHandCursor)
-        self.stats_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {Theme.SURFACE_HOVER};
-                border-radius: 25px;
-                font-size: 20px;
-            }}
-             QPushButton:hover {{
-                background-color: {Theme.PRIMARY};
-            }}
-        """)
+        self.stats_btn.setStyleSheet(_STATS_BTN_STYLE)
         self.stats_btn.clicked.connect(self.show_stats_signal.emit)
         
         # Leave Button
         self.leave_btn = QPushButton("❌")
         self.leave_btn.setFixedSize(60, 60)
         self.leave_btn.setCursor(Qt.PointingHandCursor)
-        self.leave_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {Theme.ERROR};
-                border-radius: 30px;
-                font-size: 24px;
-            }}
-            QPushButton:hover {{
-                background-color: #B00020;
-            }}
-        """)
+        self.leave_btn.setStyleSheet(_LEAVE_BTN_STYLE)
         self.leave_btn.clicked.connect(self.leave_meeting_signal.emit)
         
         controls_layout.addWidget(self.mic_btn)
@@ -294,7 +774,7 @@ class MeetingScreen(QWidget):
         # --- RIGHT SIDE: Sidebar (Chat & Participants) ---
         right_widget = QWidget()
         right_widget.setFixedWidth(350)
-        right_widget.setStyleSheet(f"background-color: {Theme.SURFACE}; border-left: 1px solid {Theme.DIVIDER};")
+        right_widget.setStyleSheet(_SIDEBAR_STYLE)
         right_layout = QVBoxLayout()
         right_layout.setContentsMargins(15, 15, 15, 15)
         
@@ -308,25 +788,18 @@ class MeetingScreen(QWidget):
         
         self.chat_display = QTextEdit()
         self.chat_display.setReadOnly(True)
+        self.chat_display.document().setMaximumBlockCount(500)  # Drop oldest messages beyond 500
         self.chat_display.setFont(QFont('Segoe UI', 10))
-        self.chat_display.setStyleSheet(f"background-color: {Theme.BACKGROUND}; border: 1px solid {Theme.DIVIDER}; border-radius: 8px; padding: 10px;")
+        self.chat_display.setStyleSheet(_CHAT_DISPLAY_STYLE)
         chat_layout.addWidget(self.chat_display)
         
         # Target Combo
         target_layout = QHBoxLayout()
         target_label = QLabel("To:")
-        target_label.setStyleSheet(f"color: {Theme.TEXT_MED};")
+        target_label.setStyleSheet(_TARGET_LABEL_STYLE)
         self.chat_target_combo = QComboBox()
         self.chat_target_combo.addItem("Everyone")
-        self.chat_target_combo.setStyleSheet(f"""
-            QComboBox {{
-                background-color: {Theme.BACKGROUND};
-                color: {Theme.TEXT_HIGH};
-                border: 1px solid {Theme.DIVIDER};
-                padding: 5px;
-                border-radius: 5px;
-            }}
-        """)
+        self.chat_target_combo.setStyleSheet(_CHAT_TARGET_COMBO_STYLE)
         target_layout.addWidget(target_label)
         target_layout.addWidget(self.chat_target_combo)
         chat_layout.addLayout(target_layout)
@@ -341,17 +814,7 @@ class MeetingScreen(QWidget):
         self.send_btn = QPushButton("➤")
         self.send_btn.setFixedSize(40, 40)
         self.send_btn.setCursor(Qt.PointingHandCursor)
-        self.send_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {Theme.PRIMARY};
-                color: black;
-                border-radius: 20px;
-                font-weight: bold;
-            }}
-             QPushButton:hover {{
-                background-color: {Theme.PRIMARY_VARIANT};
-            }}
-        """)
+        self.send_btn.setStyleSheet(_SEND_BTN_STYLE)
         self.send_btn.clicked.connect(self.on_send_chat)
         
         input_row.addWidget(self.chat_input)
@@ -361,19 +824,7 @@ class MeetingScreen(QWidget):
         # File Send Button
         self.file_btn = QPushButton("📎 Send File")
         self.file_btn.setCursor(Qt.PointingHandCursor)
-        self.file_btn.setStyleSheet(f"""
-            QPushButton {{
-                background-color: transparent;
-                border: 1px solid {Theme.DIVIDER};
-                color: {Theme.TEXT_MED};
-                border-radius: 5px;
-                padding: 8px;
-            }}
-            QPushButton:hover {{
-                background-color: {Theme.SURFACE_HOVER};
-                color: {Theme.TEXT_HIGH};
-            }}
-        """)
+        self.file_btn.setStyleSheet(_FILE_BTN_STYLE)
         self.file_btn.clicked.connect(self.on_send_file)
         chat_layout.addWidget(self.file_btn)
         
@@ -385,19 +836,7 @@ class MeetingScreen(QWidget):
         
         self.participants_list = QListWidget()
         self.participants_list.setFont(QFont('Segoe UI', 11))
-        self.participants_list.setStyleSheet(f"""
-            QListWidget {{
-                background-color: {Theme.BACKGROUND};
-                border: 1px solid {Theme.DIVIDER};
-                border-radius: 8px;
-                color: {Theme.TEXT_HIGH};
-                padding: 5px;
-            }}
-            QListWidget::item {{
-                padding: 10px;
-                border-bottom: 1px solid {Theme.DIVIDER};
-            }}
-        """)
+        self.participants_list.setStyleSheet(_PARTICIPANTS_LIST_STYLE)
         part_layout.addWidget(self.participants_list)
         part_widget.setLayout(part_layout)
         
@@ -415,7 +854,7 @@ class MeetingScreen(QWidget):
         splitter.setStretchFactor(1, 1)
         splitter.setSizes([900, 350])
         splitter.setHandleWidth(2)
-        splitter.setStyleSheet(f"QSplitter::handle {{ background-color: {Theme.DIVIDER}; }}")
+        splitter.setStyleSheet(_SPLITTER_STYLE)
         
         main_layout.addWidget(splitter)
         self.setLayout(main_layout)
@@ -423,70 +862,132 @@ class MeetingScreen(QWidget):
     def add_video_stream(self, participant_id, participant_name):
         """Add a video stream widget"""
         if participant_id not in self.video_widgets:
-            widget = VideoWidget(participant_name)
+            widget = self.video_widget_class(participant_name)
             self.video_widgets[participant_id] = widget
-            self._rearrange_video_grid()
+            
+            idx = len(self.video_widgets) - 1
+            cols = self._grid_columns(len(self.video_widgets))
+            if cols == self._grid_cols:
+                # Grid shape unchanged: just place the newcomer in the next free cell
+                self.video_grid.addWidget(widget, idx // cols, idx % cols)
+            else:
+                self._rearrange_video_grid()
     
     def remove_video_stream(self, participant_id):
         """Remove a video stream widget"""
         if participant_id in self.video_widgets:
             widget = self.video_widgets[participant_id]
+            was_last = participant_id == next(reversed(self.video_widgets))
             self.video_grid.removeWidget(widget)
             widget.deleteLater()
             del self.video_widgets[participant_id]
-            self._rearrange_video_grid()
+            
+            # Removing the last tile leaves no hole unless the grid shape changes
+            if not was_last or self._grid_columns(len(self.video_widgets)) != self._grid_cols:
+                self._rearrange_video_grid()
+    
+    @staticmethod
+    def _grid_columns(count):
+        """Columns for a near-square grid: ceil(sqrt(count))"""
+        root = math.isqrt(count)
+        return root + 1 if root * root < count else root
     
     def _rearrange_video_grid(self):
         """Rearrange video widgets in grid"""
-        # Clear current layout
-        for i in reversed(range(self.video_grid.count())):
-            item = self.video_grid.itemAt(i)
-            if item.widget():
-                item.widget().setParent(None)
-        
-        count = len(self.video_widgets)
-        if count == 0:
-            return
+        # Detach from the layout only; widgets keep their parent and stay visible
+        for widget in self.video_widgets.values():
+            self.video_grid.removeWidget(widget)
         
-        cols = int(np.ceil(np.sqrt(count)))
-        rows = int(np.ceil(count / cols))
+        cols = self._grid_columns(len(self.video_widgets))
+        self._grid_cols = cols
         
-        for idx, (participant_id, widget) in enumerate(self.video_widgets.items()):
-            row = idx // cols
-            col = idx % cols
-            widget.show()
-            self.video_grid.addWidget(widget, row, col)
+        for idx, widget in enumerate(self.video_widgets.values()):
+            self.video_grid.addWidget(widget, idx // cols, idx % cols)
     
-    def update_video_frame(self, participant_id, frame):
+    def update_video_frame(self, participant_id, frame, seq):
         """Update video frame for a participant"""
         if participant_id in self.video_widgets:
-            self.video_widgets[participant_id].update_frame(frame)
+            self.video_widgets[participant_id].update_frame(frame, seq)
+    
+    def update_video_jpeg(self, participant_id, jpeg_bytes, seq):
+        """Update video frame for a participant from an undecoded JPEG payload"""
+        if participant_id in self.video_widgets:
+            self.video_widgets[participant_id].update_jpeg(jpeg_bytes, seq)
+    
+    def update_video_frames(self, updates):
+        """Apply a batch of (participant_id, frame, seq, is_jpeg) updates
+        
+        The conversion jobs of all tiles are run as a single pool task
+        instead of one task per tile.
+        """
+        batch = []
+        for participant_id, frame, seq, is_jpeg in updates:
+            widget = self.video_widgets.get(participant_id)
+            if widget is None:
+                continue
+            if is_jpeg:
+                widget.update_jpeg(frame, seq, batch)
+            else:
+                widget.update_frame(frame, seq, batch)
+        
+        if batch:
+            QThreadPool.globalInstance().start(FrameBatchProcessor(batch))
     
     def clear_video_frame(self, participant_id):
         """Clear video frame (show placeholder)"""
         if participant_id in self.video_widgets:
-            widget = self.video_widgets[participant_id]
-            widget.clear()
-            widget.setText(f"{widget.participant_name}\n(No Video)")
+            self.video_widgets[participant_id].show_placeholder()
     
     def show_no_video(self, participant_id, participant_name=None):
         """Show 'No Video' placeholder"""
         if participant_id in self.video_widgets:
-            widget = self.video_widgets[participant_id]
-            name = participant_name or widget.participant_name
-            widget.clear()
-            widget.setText(f"{name}\n(No Video)")
-            
-    def request_frame_update(self):
-        pass
+            self.video_widgets[participant_id].show_placeholder(participant_name)
+    
+    def _init_chat_formats(self):
+        """Build the chat text formats once instead of styling every message with HTML"""
+        def char_format(color, bold=False):
+            fmt = QTextCharFormat()
+            fmt.setForeground(QColor(color))
+            if bold:
+                fmt.setFontWeight(QFont.Bold)
+            return fmt
+        
+        self.chat_fmt_self = char_format(Theme.PRIMARY, bold=True)
+        self.chat_fmt_other = char_format(Theme.SECONDARY, bold=True)
+        self.chat_fmt_private = char_format('#FF5252', bold=True)
+        self.chat_fmt_body = char_format(Theme.TEXT_HIGH)
+        self.chat_fmt_private_body = char_format(Theme.TEXT_MED)
+        self.chat_fmt_separator = QTextCharFormat()
+        
+        self.chat_block_format = QTextBlockFormat()
+        self.chat_block_format.setBottomMargin(5)
     
     def add_chat_message(self, sender, message, is_private=False):
         """Add a message to chat"""
-        color = Theme.PRIMARY if sender == self.client_name else Theme.SECONDARY
         if is_private:
-             self.chat_display.append(f"<div style='margin-bottom: 5px;'><span style='color:#FF5252; font-weight:bold;'>(Private) {sender}</span>: <span style='color:{Theme.TEXT_MED};'>{message}</span></div>")
+            sender_text = f"(Private) {sender}"
+            sender_fmt, body_fmt = self.chat_fmt_private, self.chat_fmt_private_body
         else:
-            self.chat_display.append(f"<div style='margin-bottom: 5px;'><span style='color:{color}; font-weight:bold;'>{sender}</span>: <span style='color:{Theme.TEXT_HIGH};'>{message}</span></div>")
+            sender_text = sender
+            sender_fmt = self.chat_fmt_self if sender == self.client_name else self.chat_fmt_other
+            body_fmt = self.chat_fmt_body
+        
+        # Stay pinned to the bottom only if the user has not scrolled up
+        scrollbar = self.chat_display.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        
+        cursor = QTextCursor(self.chat_display.document())
+        cursor.movePosition(QTextCursor.End)
+        if self.chat_display.document().isEmpty():
+            cursor.setBlockFormat(self.chat_block_format)
+        else:
+            cursor.insertBlock(self.chat_block_format)
+        cursor.insertText(sender_text, sender_fmt)
+        cursor.insertText(": ", self.chat_fmt_separator)
+        cursor.insertText(message, body_fmt)
+        
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
     
     def on_send_chat(self):
         """Send chat message"""
@@ -498,15 +999,19 @@ class MeetingScreen(QWidget):
 
     def update_chat_participants(self, participants):
         """Update the combo box with list of participants"""
+        self._set_chat_targets(list(participants))
+    
+    def _set_chat_targets(self, names):
+        """Refill the chat target combo in one pass, keeping the current selection"""
         current = self.chat_target_combo.currentText()
+        self.chat_target_combo.blockSignals(True)
         self.chat_target_combo.clear()
-        self.chat_target_combo.addItem("Everyone")
-        for p in participants:
-            self.chat_target_combo.addItem(p)
+        self.chat_target_combo.addItems(["Everyone"] + names)
         
         index = self.chat_target_combo.findText(current)
         if index >= 0:
             self.chat_target_combo.setCurrentIndex(index)
+        self.chat_target_combo.blockSignals(False)
     
     def on_send_file(self):
         """Open file dialog and send file"""
@@ -549,36 +1054,39 @@ class MeetingScreen(QWidget):
 
     def add_participant_to_list(self, name, is_host=False):
         """Add participant to the list"""
-        display_name = f"{name} (Host)" if is_host else name
-        items = self.participants_list.findItems(display_name, Qt.MatchExactly)
-        if not items:
-            self.participants_list.addItem(display_name)
-            self._update_chat_combo()
+        self.bulk_add_participants([(name, is_host)])
+    
+    def bulk_add_participants(self, participants):
+        """Add several (name, is_host) participants with a single layout pass and combo refresh"""
+        new_participants = {}
+        for name, is_host in participants:
+            if name not in self._participant_items and name not in new_participants:
+                new_participants[name] = is_host
+        
+        if not new_participants:
+            return
+        
+        self.participants_list.setUpdatesEnabled(False)
+        self.participants_list.blockSignals(True)
+        for name, is_host in new_participants.items():
+            item = QListWidgetItem(f"{name} (Host)" if is_host else name)
+            self.participants_list.addItem(item)
+            self._participant_items[name] = item
+        self.participants_list.blockSignals(False)
+        self.participants_list.setUpdatesEnabled(True)
+        self._update_chat_combo()
     
     def remove_participant_from_list(self, name):
         """Remove participant from the list"""
-        for item in self.participants_list.findItems(name, Qt.MatchStartsWith):
-            if item.text() == name or item.text() == f"{name} (Host)":
-                row = self.participants_list.row(item)
-                self.participants_list.takeItem(row)
-                self._update_chat_combo()
-                break
+        item = self._participant_items.pop(name, None)
+        if item is not None:
+            self.participants_list.takeItem(self.participants_list.row(item))
+            self._update_chat_combo()
 
     def _update_chat_combo(self):
         """Update the combo box from participant list"""
-        current = self.chat_target_combo.currentText()
-        self.chat_target_combo.clear()
-        self.chat_target_combo.addItem("Everyone")
-        
-        for i in range(self.participants_list.count()):
-            item_text = self.participants_list.item(i).text()
-            clean_name = item_text.replace(" (Host)", "")
-            if clean_name != self.client_name:
-                self.chat_target_combo.addItem(clean_name)
-        
-        index = self.chat_target_combo.findText(current)
-        if index >= 0:
-            self.chat_target_combo.setCurrentIndex(index)
+        names = [name for name in self._participant_items if name != self.client_name]
+        self._set_chat_targets(names)
         
     def show_meeting_info(self):
         pass # Removed default dialog, replaced with inline code display
@@ -588,13 +1096,16 @@ class MeetingScreen(QWidget):
         self.ping_label.setText(f"Ping: {int(rtt_ms)} ms")
         
         if rtt_ms < 100:
-            color = Theme.SUCCESS
+            level = 0
         elif rtt_ms < 300:
-            color = "#FFC107"
+            level = 1
         else:
-            color = Theme.ERROR
-            
-        self.ping_label.setStyleSheet(f"color: {color}; margin-left: 10px; font-weight: bold;")
+            level = 2
+        
+        # Only re-apply the stylesheet when the colour band changes
+        if level != self._ping_level:
+            self._ping_level = level
+            self.ping_label.setStyleSheet(_PING_STYLES[level])
             
     def update_quality_display(self, quality_text):
         """Update the quality label and show notification"""
@@ -607,18 +1118,16 @@ class MeetingScreen(QWidget):
     def show_notification(self, message):
         """Show a temporary floating notification"""
         self.notification_label.setText(message)
-        self.notification_label.adjustSize()
-        
-        # Position: Top Right relative to the container, with some margin
-        # We use parent's geometry
-        parent_width = self.notification_label.parent().width()
-        
-        x = parent_width - self.notification_label.width() - 30
-        y = 70 # Below header
-        
-        self.notification_label.move(x, y)
         self.notification_label.raise_()
         self.notification_label.show()
         
-        # Hide after 3 seconds
-        QTimer.singleShot(3000, self.notification_label.hide)
+        # Hide after 3 seconds (restarted by each new notification)
+        self.notification_timer.start(3000)
+    
+    def eventFilter(self, obj, event):
+        """Keep the notification overlay anchored to the top right of the video area"""
+        if event.type() == QEvent.Resize and obj is self.notification_label.parent():
+            x = obj.width() - self.notification_label.width() - 30
+            y = 70 # Below header
+            self.notification_label.move(x, y)
+        return super().eventFilter(obj, event)
@@ -6,7 +6,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QLabel, QListWidget, QListWidgetItem, QMessageBox)
+                             QLabel, QListWidget, QListWidgetItem)
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtGui import QFont
 
@@ -21,7 +21,7 @@ class WaitingRoomScreen(QWidget):
     def __init__(self, meeting_code):
         super().__init__()
         self.meeting_code = meeting_code
-        self.pending_participants = []  # List of participant names
+        self.pending_participants = {}  # {participant_name: QListWidgetItem}
         self.setup_ui()
     
     def setup_ui(self):
@@ -126,16 +126,43 @@ class WaitingRoomScreen(QWidget):
         layout.addWidget(self.start_btn)
         
         self.setLayout(layout)
+        
+        # Non-modal toast for join requests
+        self.notification_label = QLabel(self)
+        self.notification_label.setVisible(False)
+        self.notification_label.setStyleSheet("""
+            QLabel {
+                background-color: #4285f4;
+                color: white;
+                font-weight: bold;
+                padding: 10px 20px;
+                border-radius: 5px;
+            }
+        """)
+        self.notification_timer = QTimer(self)
+        self.notification_timer.setSingleShot(True)
+        self.notification_timer.timeout.connect(self.notification_label.hide)
+    
+    def show_notification(self, message):
+        """Show a temporary toast without blocking the event loop"""
+        self.notification_label.setText(message)
+        self.notification_label.adjustSize()
+        self.notification_label.move(self.width() - self.notification_label.width() - 20, 20)
+        self.notification_label.raise_()
+        self.notification_label.show()
+        
+        # Hide after 3 seconds (restarted by each new request)
+        self.notification_timer.start(3000)
     
     def add_pending_participant(self, name):
         """Add a pending participant to the list"""
         if name not in self.pending_participants:
-            self.pending_participants.append(name)
-            self.participants_list.addItem(name)
+            item = QListWidgetItem(name)
+            self.participants_list.addItem(item)
+            self.pending_participants[name] = item
             
             # Show notification
-            QMessageBox.information(self, "Join Request", 
-                                   f"{name} wants to join the meeting")
+            self.show_notification(f"{name} wants to join the meeting")
     
     def on_allow(self):
         """Allow selected participant"""
@@ -148,7 +175,7 @@ class WaitingRoomScreen(QWidget):
             # Remove from list
             row = self.participants_list.row(current_item)
             self.participants_list.takeItem(row)
-            self.pending_participants.remove(name)
+            del self.pending_participants[name]
         else:
             print("[WaitingRoom] No participant selected to allow")
     
@@ -162,7 +189,7 @@ class WaitingRoomScreen(QWidget):
             # Remove from list
             row = self.participants_list.row(current_item)
             self.participants_list.takeItem(row)
-            self.pending_participants.remove(name)
+            del self.pending_participants[name]
     
     def on_start_meeting(self):
         """Start the meeting"""
@@ -0,0 +1,132 @@
+"""
+Video Codec - Frame encoders/decoders selectable per stream
+JPEG (every frame independent) is always available; hardware H.264 is used
+when PyAV is installed and the GPU encoder can be opened
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fractions import Fraction
+from common.protocol import CODEC_JPEG, CODEC_H264
+from jpeg_codec import encode_jpeg, new_jpeg_buffer
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# Hardware H.264 encoders to try, best first: NVIDIA NVENC, then Intel Quick Sync (iGPUs)
+H264_HW_ENCODERS = ['h264_nvenc', 'h264_qsv']
+
+# Low-latency options per encoder: no lookahead, no B-frames, output every frame immediately
+H264_ENCODER_OPTIONS = {
+    'h264_nvenc': {'preset': 'p1', 'tune': 'ull', 'zerolatency': '1', 'delay': '0'},
+    'h264_qsv': {'preset': 'veryfast', 'async_depth': '1', 'look_ahead': '0'},
+}
+
+# Input surface format per encoder. NVENC's native layout is NV12 (and QSV only takes
+# NV12), so swscale writes that directly from the BGR frame instead of planar yuv420p
+H264_ENCODER_PIX_FMT = {
+    'h264_nvenc': 'nv12',
+    'h264_qsv': 'nv12',
+}
+
+class JpegEncoder:
+    """Encodes every frame as a standalone JPEG"""
+    codec = CODEC_JPEG
+    name = 'jpeg'
+
+    def __init__(self, width, height, fps):
+        self.width = width
+        self.height = height
+        # Reused output buffer (libjpeg-turbo only), allocated on the first frame
+        self.buffer = None
+
+    def encode(self, frame, quality):
+        """Encode a BGR frame; returns the payload, which the next encode() overwrites"""
+        if self.buffer is None:
+            self.buffer = new_jpeg_buffer(frame)
+        return encode_jpeg(frame, quality, self.buffer)
+
+    def close(self):
+        pass
+
+class H264Encoder:
+    """Low-latency H.264 through an FFmpeg hardware encoder (PyAV)"""
+    codec = CODEC_H264
+
+    def __init__(self, encoder_name, width, height, fps):
+        self.name = encoder_name
+        self.width = width
+        self.height = height
+
+        self.context = av.CodecContext.create(encoder_name, 'w')
+        self.context.width = width
+        self.context.height = height
+        # PyAV converts each BGR frame to this format on the way in
+        self.context.pix_fmt = H264_ENCODER_PIX_FMT.get(encoder_name, 'yuv420p')
+        self.context.time_base = Fraction(1, fps)
+        self.context.framerate = Fraction(fps, 1)
+        # A keyframe every second bounds how long a lost packet corrupts the picture
+        self.context.gop_size = fps
+        self.context.max_b_frames = 0
+        # ~0.1 bits per pixel: roughly JPEG-quality-60 sharpness at a fraction of the bytes
+        self.context.bit_rate = int(width * height * fps * 0.1)
+        self.context.options = H264_ENCODER_OPTIONS.get(encoder_name, {})
+        self.pts = 0
+
+    def encode(self, frame, quality):
+        """Encode a BGR frame; returns the Annex-B payload, or None if the encoder held it back"""
+        video_frame = av.VideoFrame.from_ndarray(frame, format='bgr24')
+        video_frame.pts = self.pts
+        self.pts += 1
+
+        packets = self.context.encode(video_frame)
+        if not packets:
+            return None
+        return b''.join(bytes(packet) for packet in packets)
+
+    def close(self):
+        self.context = None
+
+def create_encoder(preferred, width, height, fps):
+    """Create the encoder for a stream: hardware H.264 if asked for and working, else JPEG"""
+    if preferred == 'h264':
+        if av is None:
+            print("[VideoCodec] PyAV not installed, using JPEG")
+        else:
+            for encoder_name in H264_HW_ENCODERS:
+                try:
+                    encoder = H264Encoder(encoder_name, width, height, fps)
+                    encoder.context.open()  # Fails here if the GPU/driver can't encode
+                    print(f"[VideoCodec] Using {encoder_name} at {width}x{height}")
+                    return encoder
+                except Exception as e:
+                    print(f"[VideoCodec] {encoder_name} not available: {e}")
+            print("[VideoCodec] No hardware H.264 encoder, using JPEG")
+
+    return JpegEncoder(width, height, fps)
+
+class H264Decoder:
+    """Decodes one sender's H.264 stream; packets must be fed in order"""
+
+    def __init__(self):
+        self.context = av.CodecContext.create('h264', 'r')
+        # Frame threading would hold frames back; decode each one as it arrives
+        self.context.thread_count = 1
+
+    def decode(self, payload):
+        """Decode a payload; returns the newest BGR frame it produced, or None"""
+        try:
+            frames = self.context.decode(av.Packet(bytes(payload)))
+        except av.error.FFmpegError:
+            # Reference missing after a loss: skip until the next keyframe
+            return None
+        if not frames:
+            return None
+        return frames[-1].to_ndarray(format='bgr24')
+
+def h264_decode_available():
+    """True if H.264 streams can be decoded here"""
+    return av is not None
@@ -5,13 +5,43 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import cv2
+import logging
 import numpy as np
 import time
 import socket
 import threading
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from common.protocol import *
+from jpeg_codec import decode_jpeg
+from video_codec import H264Decoder, h264_decode_available
+from common.udp_batch import BatchReceiver, recvmmsg_available
+
+logger = logging.getLogger(__name__)
+
+class SenderState:
+    """Everything the receiver tracks for one sender, so a packet needs one lookup"""
+    __slots__ = ('last_seq', 'last_seen', 'latest', 'clock_origin', 'assembly_frame_id', 'assembly_parts',
+                 'assembly_missing', 'decoding', 'decode_pending', 'h264_decoder')
+    
+    def __init__(self):
+        self.last_seq = -1
+        self.last_seen = 0  # time.time() of the sender's last packet
+        self.latest = None  # (sequence_num, frame), replaced whole so readers don't lock
+        self.clock_origin = None  # Offset between the sender's monotonic clock and ours (ns)
+        
+        # Frame being reassembled from fragments: one slot per fragment, None until
+        # it arrives. A newer frame_id abandons an incomplete frame
+        self.assembly_frame_id = None
+        self.assembly_parts = None
+        self.assembly_missing = 0
+        
+        # Decode hand-off (guarded by VideoReceiver.decode_lock): at most one decode
+        # per sender in flight, plus what waits behind it - the newest JPEG frame only,
+        # or every H.264 frame in order
+        self.decoding = False
+        self.decode_pending = deque()
+        self.h264_decoder = None  # Created by the decode worker on the first H.264 frame
 
 class VideoReceiver:
     """Receives video frames via UDP"""
@@ -19,6 +49,7 @@ class VideoReceiver:
     def __init__(self, local_udp_port, simulated_loss_rate=0.0):
         self.local_udp_port = local_udp_port
         self.simulated_loss_rate = simulated_loss_rate
+        self.loss_rng = np.random.default_rng()
         
         # UDP socket
         self.socket = None
@@ -27,24 +58,34 @@ class VideoReceiver:
         # Frame buffer (for handling out-of-order packets)
         self.frame_buffer = {}  # {frame_id: (frame_data, timestamp)}
         self.latest_frame = None
-        self.latest_frame_lock = threading.Lock()
         
-        # Per-sender frame storage: {sender_addr: latest_frame}
-        self.sender_frames = {}
-        self.sender_frames_lock = threading.Lock()
+        # Per-sender state (sequence tracking, latest frame, clock origin): {source_id: SenderState}
+        # Only ever updated by single reference/item stores, which are atomic,
+        # so readers don't lock. Stored frames are never modified afterwards
+        self.senders = {}
+        
+        # Callback for decoded frames: (source_id, sequence_num, frame)
+        self.frame_callback = None
+        
+        # Callback for undecoded JPEG payloads: (source_id, sequence_num, jpeg_bytes)
+        # When set, frames are handed over still compressed and are not decoded here,
+        # so latest_frame / per-sender frames stay empty
+        self.jpeg_callback = None
         
         # Stats tracking
-        self.frames_received = 0
+        self.frames_received = 0  # Complete frames
+        self.packets_received = 0
         self.bytes_received = 0
-        self.frames_lost = 0
+        self.packets_lost = 0
         self.last_packet_time = 0
         
-        # Per-sender sequence tracking to properly calculate packet loss
-        # {sender_addr: last_sequence_num}
-        self.sender_sequence = {}
-        
-        # Jitter calculation
-        self.arrival_times = deque(maxlen=100)
+        # Jitter calculation: exponentially weighted mean/variance of frame inter-arrival
+        # times (weight ~1/100, similar to averaging over the last 100 frames)
+        self.jitter_alpha = 0.01
+        self.last_arrival = None
+        self.arrival_count = 0
+        self.arrival_mean = 0.0
+        self.arrival_var = 0.0
         self.jitter = 0
         
         # Frame timing
@@ -53,17 +94,51 @@ class VideoReceiver:
         
         # Thread
         self.receive_thread = None
+        
+        # Packets already queued on the socket are drained in one go (up to this many)
+        # and only the newest frame per sender is decoded
+        self.max_batch_packets = 64
+        
+        # Senders silent for longer than this are forgotten (drops their last frame),
+        # checked every sender_sweep_interval seconds
+        self.sender_timeout = 30.0
+        self.sender_sweep_interval = 5.0
+        self.last_sender_sweep = 0
+        # recvmmsg-based receiver (Linux), None means drain with recvfrom
+        self.batch_receiver = None
+        # Fallback path receives into one reused buffer instead of allocating 64 KB per recvfrom
+        self.recv_scratch = bytearray(65535)
+        self.recv_scratch_view = memoryview(self.recv_scratch)
+        # H.264 frames allowed to queue per sender before the backlog is dropped
+        self.max_h264_backlog = 30
+        self.h264_warned = False
+        # Decodes run on this pool, off the receive thread, so a slow decode never
+        # holds up draining the socket. Different senders decode in parallel
+        # (the JPEG decoders release the GIL)
+        self.decode_pool = None
+        self.decode_lock = threading.Lock()
+        
+        # Socket tuning: large kernel receive buffer so bursts of full frames aren't
+        # dropped, and busy polling (microseconds) to cut wake-up latency where allowed
+        self.recv_buffer_size = 32 * 1024 * 1024
+        self.busy_poll_us = 50
     
     def start(self):
         """Start receiving video"""
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._tune_socket()
         self.socket.bind(('0.0.0.0', self.local_udp_port))
         
         # Get the actual port if 0 was specified (OS-assigned)
         if self.local_udp_port == 0:
             self.local_udp_port = self.socket.getsockname()[1]
         
+        if recvmmsg_available():
+            self.batch_receiver = BatchReceiver(self.socket, self.max_batch_packets)
+        
         self.running = True
+        self.decode_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                              thread_name_prefix='VideoDecode')
         self.receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
         self.receive_thread.start()
         
@@ -77,59 +152,138 @@ class VideoReceiver:
         if self.receive_thread:
             self.receive_thread.join(timeout=2)
         
+        if self.decode_pool:
+            self.decode_pool.shutdown(wait=False)
+        
         if self.socket:
             self.socket.close()
         
         print("[VideoReceiver] Stopped")
     
+    def _tune_socket(self):
+        """Apply receive buffer / busy-poll options; each one is best effort"""
+        # The kernel silently caps SO_RCVBUF at net.core.rmem_max
+        try:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer_size)
+        except OSError as e:
+            print(f"[VideoReceiver] Could not set receive buffer: {e}")
+        
+        # SO_BUSY_POLL is Linux only and not exported by the socket module
+        if sys.platform.startswith('linux') and self.busy_poll_us:
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, getattr(socket, 'SO_BUSY_POLL', 46), self.busy_poll_us)
+            except OSError:
+                pass  # Needs CAP_NET_ADMIN on most systems
+        
+        rcvbuf = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        print(f"[VideoReceiver] Socket receive buffer: {rcvbuf // 1024} KB")
+    
     def _receive_loop(self):
         """Main receiving loop"""
         self.socket.settimeout(0.1)
         
         received_count = 0
         while self.running:
-            try:
-                data, addr = self.socket.recvfrom(65535)
-                
-                # Simulate packet loss (Download)
-                if self.simulated_loss_rate > 0:
-                    import random
-                    if random.uniform(0, 100) < self.simulated_loss_rate:
-                        # Drop this packet
-                        continue
-                        
-                received_count += 1
-                if received_count % 100 == 0:  # Log every 100 packets
-                    print(f"[VideoReceiver] Received {received_count} packets, latest from {addr}")
-                self._process_packet(data, addr)
+            now = time.time()
+            if now - self.last_sender_sweep >= self.sender_sweep_interval:
+                self.last_sender_sweep = now
+                self._evict_stale_senders(now)
             
+            try:
+                packets = self._receive_batch()
             except socket.timeout:
-                if self.running:
-                    continue
-            except Exception as e:
                 continue
             except Exception as e:
                 if self.running:
                     print(f"[VideoReceiver] Error receiving: {e}")
+                continue
+            
+            # Simulate packet loss (Download): one draw per packet for the whole batch
+            if self.simulated_loss_rate > 0:
+                keep = self.loss_rng.random(len(packets)) * 100 >= self.simulated_loss_rate
+                packets = [packet for packet, kept in zip(packets, keep) if kept]
+            
+            # Newest frame per sender in this batch: {source_id: (header, payload)}
+            newest = {}
+            # Several fragments per frame, so this fires often: a debug trace, off by default
+            debug = logger.isEnabledFor(logging.DEBUG)
+            for data, addr in packets:
+                received_count += 1
+                if debug and received_count % 100 == 0:  # Log every 100 packets
+                    logger.debug("[VideoReceiver] Received %d packets, latest from %s", received_count, addr)
+                
+                parsed = self._process_packet(data, addr)
+                if parsed:
+                    header, payload = parsed
+                    if header['codec'] == CODEC_H264:
+                        # Each H.264 frame references earlier ones, none can be skipped
+                        self._queue_decode(header, payload)
+                    else:
+                        newest[header['source_id']] = (header, payload)
+            
+            # Older JPEG frames from the same sender are superseded; decode only the newest
+            for header, payload in newest.values():
+                if self.jpeg_callback:
+                    # Nothing to decode here, hand it straight over
+                    self._deliver_frame(header, payload)
+                else:
+                    self._queue_decode(header, payload)
+    
+    def _evict_stale_senders(self, now):
+        """Forget senders that stopped sending (left the meeting), freeing their last frame"""
+        stale = [source_id for source_id, state in self.senders.items()
+                 if now - state.last_seen > self.sender_timeout]
+        for source_id in stale:
+            del self.senders[source_id]
+            print(f"[VideoReceiver] Dropped state of silent sender {source_id}")
+    
+    def _receive_batch(self):
+        """Block for one packet, then drain whatever else is already queued on the socket"""
+        if self.batch_receiver:
+            # One syscall for the whole batch
+            return self.batch_receiver.recv(0.1)
+        
+        packets = [self._recv_packet()]
+        
+        self.socket.settimeout(0.0)
+        try:
+            while len(packets) < self.max_batch_packets:
+                packets.append(self._recv_packet())
+        except (BlockingIOError, socket.timeout):
+            pass
+        finally:
+            self.socket.settimeout(0.1)
+        
+        return packets
+    
+    def _recv_packet(self):
+        """recvfrom into the reused scratch buffer; returns (bytes of exactly the datagram, addr)"""
+        nbytes, addr = self.socket.recvfrom_into(self.recv_scratch)
+        return self.recv_scratch_view[:nbytes].tobytes(), addr
     
     def _process_packet(self, data, addr):
-        """Process received video packet"""
+        """Parse a received video packet and update stats: returns (header, payload) once a frame is complete, else None"""
         try:
             # Parse header
             if len(data) < VIDEO_HEADER_SIZE:
-                return
+                return None
             
             header = unpack_video_header(data)
-            payload = data[VIDEO_HEADER_SIZE:]
+            # View of the fragment, single-fragment frames are decoded without copying it
+            payload = memoryview(data)[VIDEO_HEADER_SIZE:]
             
             self.last_packet_time = time.time()
             
             # Check for lost frames - track per sender to avoid false positives
             # when receiving interleaved packets from multiple senders
+            # (keyed by source_id, the client name, rather than addr)
             source_id = header['source_id']
-            sender_key = source_id  # Use source_id (client name) as key instead of addr
+            state = self.senders.get(source_id)
+            if state is None:
+                state = self.senders[source_id] = SenderState()
+            state.last_seen = self.last_packet_time
             
-            last_seq = self.sender_sequence.get(sender_key, -1)
+            last_seq = state.last_seq
             
             if last_seq != -1:
                 expected_seq = (last_seq + 1) % (2**32)
@@ -137,60 +291,164 @@ class VideoReceiver:
                     # Only count as loss if sequence jumped forward (not backward/duplicate)
                     seq_diff = (header['sequence_num'] - expected_seq) % (2**32)
                     if seq_diff < 1000:  # Reasonable gap (not wraparound)
-                        self.frames_lost += seq_diff
+                        self.packets_lost += seq_diff
             
-            self.sender_sequence[sender_key] = header['sequence_num']
+            state.last_seq = header['sequence_num']
+            self.packets_received += 1
+            self.bytes_received += len(data)
             
-            # Record arrival time for jitter calculation
+            if header['fragment_count'] > 1:
+                payload = self._reassemble(state, header, payload)
+                if payload is None:
+                    return None
+            
+            # Update jitter with the new inter-arrival time (O(1) per frame)
             arrival_time = time.time()
-            self.arrival_times.append(arrival_time)
+            if self.last_arrival is not None:
+                diff = arrival_time - self.last_arrival
+                self.arrival_count += 1
+                # Plain running average until the window fills, EWMA afterwards
+                alpha = max(self.jitter_alpha, 1.0 / self.arrival_count)
+                delta = diff - self.arrival_mean
+                self.arrival_mean += alpha * delta
+                self.arrival_var = (1 - alpha) * (self.arrival_var + alpha * delta * delta)
+                self.jitter = self.arrival_var ** 0.5 * 1000  # Convert to ms
+            self.last_arrival = arrival_time
             
-            # Calculate jitter
-            if len(self.arrival_times) >= 2:
-                diffs = [self.arrival_times[i] - self.arrival_times[i-1] 
-                        for i in range(1, len(self.arrival_times))]
-                if diffs:
-                    mean_diff = sum(diffs) / len(diffs)
-                    variance = sum((d - mean_diff) ** 2 for d in diffs) / len(diffs)
-                    self.jitter = variance ** 0.5 * 1000  # Convert to ms
+            # Update stats (every frame that arrived counts, even if a newer one
+            # from the same sender supersedes it before decoding)
+            self.frames_received += 1
+            self.frame_timestamps.append(time.time())
             
-            # Decode JPEG frame
-            frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+            # Calculate received FPS
+            if len(self.frame_timestamps) >= 2:
+                time_span = self.frame_timestamps[-1] - self.frame_timestamps[0]
+                if time_span > 0:
+                    self.fps_received = (len(self.frame_timestamps) - 1) / time_span
             
-            if frame is not None:
-                # Update latest frame (backward compatibility)
-                with self.latest_frame_lock:
-                    self.latest_frame = frame
-                
-                # Store frame per sender
-                with self.sender_frames_lock:
-                    self.sender_frames[source_id] = frame
-                
-                # Update stats
-                self.frames_received += 1
-                self.bytes_received += len(data)
-                self.frame_timestamps.append(time.time())
-                
-                # Calculate received FPS
-                if len(self.frame_timestamps) >= 2:
-                    time_span = self.frame_timestamps[-1] - self.frame_timestamps[0]
-                    if time_span > 0:
-                        self.fps_received = (len(self.frame_timestamps) - 1) / time_span
+            return header, payload
         
         except Exception as e:
             print(f"[VideoReceiver] Error processing packet: {e}")
+            return None
+    
+    def _reassemble(self, state, header, fragment):
+        """Add a fragment to the sender's frame in progress: returns the whole payload once complete, else None"""
+        frame_id = header['frame_id']
+        fragment_count = header['fragment_count']
+        
+        if frame_id != state.assembly_frame_id:
+            if state.assembly_frame_id is not None and (frame_id - state.assembly_frame_id) % (2**32) >= 2**31:
+                return None  # Late fragment of a frame already completed or given up on
+            # A newer frame started; whatever is missing from the old one isn't coming in time
+            state.assembly_frame_id = frame_id
+            state.assembly_parts = [None] * fragment_count
+            state.assembly_missing = fragment_count
+        
+        parts = state.assembly_parts
+        index = header['fragment_index']
+        if parts is None or index >= len(parts) or parts[index] is not None:
+            return None  # Frame already delivered, or duplicate/malformed fragment
+        
+        parts[index] = fragment
+        state.assembly_missing -= 1
+        if state.assembly_missing:
+            return None
+        
+        state.assembly_parts = None
+        payload = b''.join(parts)
+        header['payload_size'] = len(payload)
+        return payload
+    
+    def _queue_decode(self, header, payload):
+        """Hand a frame to the decode pool without waiting for it"""
+        state = self.senders[header['source_id']]
+        with self.decode_lock:
+            if state.decoding:
+                # A decode for this sender is running; queue behind it
+                if header['codec'] != CODEC_H264 or len(state.decode_pending) >= self.max_h264_backlog:
+                    # JPEG: only the newest frame matters. H.264 too far behind: drop the
+                    # backlog, the decoder resyncs at the next keyframe
+                    state.decode_pending.clear()
+                state.decode_pending.append((header, payload))
+                return
+            state.decoding = True
+        
+        try:
+            self.decode_pool.submit(self._decode_worker, state, header, payload)
+        except RuntimeError:
+            # Pool already shut down (stopping)
+            with self.decode_lock:
+                state.decoding = False
+    
+    def _decode_worker(self, state, header, payload):
+        """Decode frames for one sender until nothing newer is waiting"""
+        while True:
+            if self.running:
+                self._deliver_frame(header, payload, state)
+            
+            with self.decode_lock:
+                if not state.decode_pending or not self.running:
+                    # Cleared under the same lock the receive thread checks it with,
+                    # so a frame queued right now can't be left behind
+                    state.decode_pending.clear()
+                    state.decoding = False
+                    return
+                header, payload = state.decode_pending.popleft()
+    
+    def _deliver_frame(self, header, payload, state=None):
+        """Decode a frame (unless the display side wants JPEG) and hand it on"""
+        try:
+            source_id = header['source_id']
+            
+            if header['codec'] == CODEC_H264:
+                # H.264 is always decoded here, whatever the display side takes
+                frame = self._decode_h264(state, payload)
+            elif self.jpeg_callback:
+                # Let the display side decode the JPEG itself
+                self.jpeg_callback(source_id, header['sequence_num'], bytes(payload))
+                return
+            else:
+                # Decode JPEG frame
+                frame = decode_jpeg(payload)
+            if frame is None:
+                return
+            
+            # Update latest frame (backward compatibility)
+            self.latest_frame = frame
+            
+            # Store frame per sender
+            state = self.senders.get(source_id)
+            if state is not None:  # Evicted meanwhile
+                state.latest = (header['sequence_num'], frame)
+            
+            if self.frame_callback:
+                self.frame_callback(source_id, header['sequence_num'], frame)
+        
+        except Exception as e:
+            print(f"[VideoReceiver] Error decoding frame: {e}")
+    
+    def _decode_h264(self, state, payload):
+        """Decode an H.264 frame with the sender's own decoder; returns a BGR frame or None"""
+        if not h264_decode_available():
+            if not self.h264_warned:
+                print("[VideoReceiver] Received H.264 video but PyAV is not installed, dropping it")
+                self.h264_warned = True
+            return None
+        
+        if state.h264_decoder is None:
+            state.h264_decoder = H264Decoder()
+        return state.h264_decoder.decode(payload)
     
     def get_latest_frame(self):
-        """Get the most recent frame (thread-safe)"""
-        with self.latest_frame_lock:
-            return self.latest_frame
+        """Get the most recent frame (thread-safe, treat as read-only)"""
+        return self.latest_frame
     
     def get_all_sender_frames(self):
-        """Get frames from all senders: returns {addr: frame}"""
-        with self.sender_frames_lock:
-            return dict(self.sender_frames)  # Return a copy
-        with self.latest_frame_lock:
-            return self.latest_frame.copy() if self.latest_frame is not None else None
+        """Get frames from all senders: returns [(source_id, (sequence_num, frame)), ...]"""
+        # Snapshot of the dict is built without releasing the GIL
+        return [(source_id, state.latest) for source_id, state in list(self.senders.items())
+                if state.latest is not None]
     
     def get_stats(self):
         """Get receiver statistics"""
@@ -204,28 +462,36 @@ class VideoReceiver:
             jitter_ms = 0
             fps_recvd = 0
         else:
-            total_expected = self.frames_received + self.frames_lost
-            packet_loss_pct = (self.frames_lost / total_expected * 100) if total_expected > 0 else 0
+            total_expected = self.packets_received + self.packets_lost
+            packet_loss_pct = (self.packets_lost / total_expected * 100) if total_expected > 0 else 0
             jitter_ms = self.jitter
             fps_recvd = self.fps_received
         
         return {
             'frames_received': self.frames_received,
+            'packets_received': self.packets_received,
             'bytes_received': self.bytes_received,
-            'frames_lost': self.frames_lost,
+            'packets_lost': self.packets_lost,
             'packet_loss_percent': packet_loss_pct,
             'jitter_ms': jitter_ms,
             'fps_received': fps_recvd
         }
     
-    def calculate_rtt(self, send_timestamp_us):
+    def calculate_rtt(self, source_id, send_timestamp_ns):
         """
-        Calculate RTT given sender's timestamp
-        Returns: RTT in milliseconds
+        Calculate transit delay of a packet relative to the sender's first packet
+        (sender and receiver monotonic clocks share no origin, so the first packet
+        pins the offset between them)
+        Returns: delay in milliseconds
         """
-        current_time_us = int(time.time() * 1000000)
-        rtt_us = current_time_us - send_timestamp_us
-        return rtt_us / 1000.0  # Convert to ms
+        now_ns = time.monotonic_ns()
+        state = self.senders.get(source_id)
+        if state is None:
+            state = self.senders[source_id] = SenderState()
+        if state.clock_origin is None:
+            state.clock_origin = now_ns - send_timestamp_ns
+        origin_ns = state.clock_origin
+        return (now_ns - origin_ns - send_timestamp_ns) / 1000000  # Convert to ms
 
 class MultiVideoReceiver:
     """Manages multiple video streams (one per participant)"""
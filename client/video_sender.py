@@ -6,40 +6,120 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import cv2
+import errno
+import logging
+import math
 import time
 import socket
+import struct
 import threading
 import mss
 import numpy as np
 from common.protocol import *
+from video_codec import create_encoder
+from frame_timer import FrameTimer
+from common.udp_batch import BatchSender, sendmmsg_available
+
+try:
+    # Windows DXGI Desktop Duplication: the compositor hands over its frame instead of a GDI BitBlt
+    import dxcam
+except (ImportError, OSError):
+    dxcam = None
+
+logger = logging.getLogger(__name__)
+
+# Linux path MTU discovery options (not exported on every platform)
+IP_MTU_DISCOVER = getattr(socket, 'IP_MTU_DISCOVER', 10)
+IP_PMTUDISC_DO = getattr(socket, 'IP_PMTUDISC_DO', 2)
+IP_MTU = getattr(socket, 'IP_MTU', 14)
+# IPv4 + UDP header bytes on top of each datagram
+UDP_IP_OVERHEAD = 28
+
+# Linux UDP generic segmentation offload (not exported by older socket modules)
+UDP_SEGMENT = getattr(socket, 'UDP_SEGMENT', 103)
+# The kernel segments at most 64 datagrams, and the whole send must fit one 64 KB UDP datagram
+UDP_MAX_SEGMENTS = 64
+
+# Position of each quality preset from lowest to highest
+QUALITY_RANK = {name: rank for rank, name in enumerate(VIDEO_QUALITIES)}
+
+# Target quality indexed by ceil(packet loss %): ceil(loss) > n exactly when loss > n,
+# so the table reproduces the > 15 / > 10 / > 2 thresholds
+LOSS_QUALITY_TABLE = ['144p' if i > 15 else '240p' if i > 10 else '360p' if i > 2 else '480p'
+                      for i in range(101)]
 
 class VideoSender:
     """Captures video and sends it to server via UDP"""
     
-    def __init__(self, server_host, server_udp_port, client_name="unknown", camera_index=0, simulated_loss_rate=0.0):
+    def __init__(self, server_host, server_udp_port, client_name="unknown", camera_index=0, simulated_loss_rate=0.0,
+                 video_codec='jpeg', client_handle=0):
         self.server_host = server_host
         self.server_udp_port = server_udp_port
+        self.client_handle = client_handle  # Tags every packet's sender field for the relay
         self.client_name = client_name
         self.camera_index = camera_index
         self.simulated_loss_rate = simulated_loss_rate
+        self.loss_rng = np.random.default_rng()
+        
+        # Frame encoder ('jpeg' or 'h264'), created by the encode thread for the
+        # current resolution and recreated when the quality changes
+        self.video_codec = video_codec
+        self.encoder = None
         
         # Video capture
         self.camera = None
         self.running = False
         self.enabled = True
         self.sct_instance = None
+        # dxcam capture of the primary output, created on first use (dxcam keeps one per output)
+        self.dxcam_instance = None
+        self.dxcam_failed = dxcam is None
+        # dxcam returns None while the screen is unchanged; the previous grab is resent
+        self.last_screen_grab = None
         
         # Screen capture
         self.is_screen_sharing = False
         
-        # UDP socket
+        # UDP socket. Non-blocking: if the send buffer is full, the rest of the frame
+        # is dropped instead of stalling the encode thread (a late frame is useless)
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        # Room for a few burst frames before sends start failing
+        self.send_buffer_size = 4 * 1024 * 1024
+        self._tune_socket()
+        
+        # Frames go out as MTU-sized fragments, all of a frame's fragments in
+        # one sendmmsg call where available (Linux)
+        self.max_batch_packets = 64
+        self.batch_sender = BatchSender(self.socket, self.max_batch_packets) if sendmmsg_available() else None
+        
+        # Better still, UDP_SEGMENT (Linux 4.18+): the fragments are handed over as one
+        # buffer and the kernel/NIC cuts it into max_datagram-sized datagrams
+        self.gso = self._probe_gso()
+        
+        # Datagram size: VIDEO_MAX_DATAGRAM unless the path MTU turns out smaller
+        self._set_max_datagram(VIDEO_MAX_DATAGRAM)
         
         # Current quality settings
         self.current_quality = '360p'
         self.quality_settings = VIDEO_QUALITIES[self.current_quality]
+        self._cache_quality()
         self.quality_callback = None # Callback for quality changes
         
+        # Adaptive quality hysteresis: a new target must be seen this many times in a
+        # row before switching (drops react faster than step-ups)
+        self.quality_down_samples = 2
+        self.quality_up_samples = 5
+        self.pending_quality = None
+        self.pending_quality_count = 0
+        self.frame_callback = None # Callback for new local frames: (seq, frame)
+        
+        # Fragment headers are packed into one reused buffer; the fixed source id is encoded once
+        self.source_id_bytes = encode_source_id(client_name)
+        self.header_buffer = bytearray(64 * VIDEO_HEADER_SIZE)
+        # Assembly area for one datagram when there's no scatter/gather send
+        self.datagram_buffer = bytearray(VIDEO_MAX_DATAGRAM)
+        
         # Frame tracking
         self.frame_id = 0
         self.sequence_num = 0
@@ -47,14 +127,23 @@ class VideoSender:
         # Stats
         self.frames_sent = 0
         self.bytes_sent = 0
+        self.frames_truncated = 0  # Frames cut short by a full socket send buffer
         self.last_frame_time = 0
         
-        # Latest frame for local display
-        self.latest_frame = None
-        self.frame_lock = threading.Lock()
+        # Latest frame for local display, published as one (frame_id, frame) tuple.
+        # Swapping the reference is atomic, so readers need no lock; published
+        # frames are never written to again
+        self.latest_frame = (-1, None)
+        
+        # Resized frame waiting for the encoder: (frame_id, frame, width, height, jpeg_quality, pooled)
+        self.pending_encode = None
+        # Free resize destinations shared by capture and encode threads (guarded by encode_cond)
+        self.resize_buffers = []
+        self.encode_cond = threading.Condition()
         
-        # Thread
+        # Threads
         self.send_thread = None
+        self.encode_thread = None
     
     def start(self):
         """Start video capture and sending"""
@@ -73,6 +162,8 @@ class VideoSender:
                 print(f"[VideoSender] Failed to open camera {self.camera_index} with any backend")
                 return False
         
+        self._request_mjpg()
+        
         # Test if we can actually read a frame
         ret, test_frame = self.camera.read()
         if not ret or test_frame is None:
@@ -84,18 +175,39 @@ class VideoSender:
         print(f"[VideoSender] Camera resolution: {int(self.camera.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT))}")
         
         self.running = True
+        self.pending_encode = None
+        self.encode_thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self.encode_thread.start()
         self.send_thread = threading.Thread(target=self._send_loop, daemon=True)
         self.send_thread.start()
         
         print(f"[VideoSender] Started with quality: {self.current_quality}")
         return True
     
+    def _request_mjpg(self):
+        """Ask the camera for MJPG instead of raw YUV: far less USB bandwidth per frame,
+        so cameras can deliver full frame rate at higher resolutions"""
+        mjpg = cv2.VideoWriter_fourcc(*'MJPG')
+        if not self.camera.set(cv2.CAP_PROP_FOURCC, mjpg):
+            print("[VideoSender] Camera did not accept MJPG capture format")
+            return
+        
+        # Some backends report 0 here even when the format was applied
+        fourcc = int(self.camera.get(cv2.CAP_PROP_FOURCC))
+        if fourcc:
+            name = ''.join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4))
+            print(f"[VideoSender] Camera capture format: {name}")
+    
     def stop(self):
         """Stop video capture"""
         self.running = False
+        with self.encode_cond:
+            self.encode_cond.notify()
         
         if self.send_thread:
             self.send_thread.join(timeout=2)
+        if self.encode_thread:
+            self.encode_thread.join(timeout=2)
         
         if self.camera:
             self.camera.release()
@@ -111,6 +223,7 @@ class VideoSender:
         if quality_name in VIDEO_QUALITIES:
             self.current_quality = quality_name
             self.quality_settings = VIDEO_QUALITIES[quality_name]
+            self._cache_quality()
             print(f"[VideoSender] Quality changed to {quality_name}")
             
             # Notify listener
@@ -120,6 +233,13 @@ class VideoSender:
                 except Exception as e:
                     print(f"[VideoSender] Error in quality callback: {e}")
 
+    def _cache_quality(self):
+        """Flatten quality_settings for the per-frame paths; call after any change to it"""
+        qs = self.quality_settings
+        # One tuple so the capture thread never sees width/height/quality from different settings
+        self.frame_format = (qs['width'], qs['height'], qs['jpeg_quality'])
+        self.frame_interval_ns = int(1e9 / qs['fps'])
+
     def set_screen_sharing(self, enabled):
         """Toggle screen sharing mode"""
         self.is_screen_sharing = enabled
@@ -127,59 +247,56 @@ class VideoSender:
     
     def _send_loop(self):
         """Main sending loop"""
-        target_fps = self.quality_settings['fps']
-        frame_interval = 1.0 / target_fps
+        # OS timer for the frame waits; time.sleep is ~15 ms coarse on Windows
+        timer = FrameTimer()
         
         # Initialize mss here (in the thread) for safety and performance
         with mss.mss() as sct:
             self.sct_instance = sct
             
+            # Pace against absolute deadlines on the monotonic clock so scheduling
+            # error doesn't accumulate and wall-clock adjustments don't disturb it
+            monotonic_ns = time.monotonic_ns
+            capture_and_send = self._capture_and_send_frame
+            sleep_until = timer.sleep_until
+            
+            next_deadline = monotonic_ns()
             while self.running:
-                loop_start = time.time()
-                
                 if self.enabled:
-                    self._capture_and_send_frame()
-                
-                # Maintain target FPS
-                elapsed = time.time() - loop_start
-                sleep_time = frame_interval - elapsed
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                    capture_and_send()
                 
-                # Update FPS dynamically
-                target_fps = self.quality_settings['fps']
-                frame_interval = 1.0 / target_fps
+                # Maintain target FPS (frame_interval_ns follows quality/FPS changes)
+                next_deadline += self.frame_interval_ns
+                if next_deadline > monotonic_ns():
+                    sleep_until(next_deadline)
+                else:
+                    # Overran the frame slot, resync instead of bursting to catch up
+                    next_deadline = monotonic_ns()
                 
         self.sct_instance = None # Cleanup
+        timer.close()
 
     def _capture_and_send_frame(self):
-        """Capture and send a single frame"""
+        """Capture a single frame and hand it to the encode thread"""
         try:
             frame = None
+            width, height, jpeg_quality = self.frame_format
             
             if self.is_screen_sharing:
-                # Capture screen using the thread-local instance
+                # Capture screen (DXGI, or the send thread's mss instance)
                 try:
-                    sct = self.sct_instance
-                    if not sct:
-                         # Should not happen given the context manager in loop
-                         return
-
-                    # monitor 1 is usually the main monitor
-                    if len(sct.monitors) > 1:
-                        monitor = sct.monitors[1]
-                    else:
-                         monitor = sct.monitors[0] # Fallback
-                    
-                    screenshot = sct.grab(monitor)
+                    frame = self._grab_screen()
+                    if frame is None:
+                        return
                     
-                    # Convert to numpy array (BGRA)
-                    frame = np.array(screenshot)
+                    if self.frames_sent % 30 == 0:
+                        logger.debug("[VideoSender] Screen capture size: %s", frame.shape)
                     
-                    if self.frames_sent % 30 == 0: # Log more often for debug
-                        print(f"[VideoSender] Screen capture size: {frame.shape}")
-                        
-                    # Drop alpha channel (BGRA -> BGR)
+                    # Scale first while still BGRA, so alpha is dropped (BGRA -> BGR) on the
+                    # small target-size image rather than the full screen
+                    if frame.shape[1] != width or frame.shape[0] != height:
+                        interpolation = cv2.INTER_AREA if frame.shape[1] > width else cv2.INTER_LINEAR
+                        frame = cv2.resize(frame, (width, height), interpolation=interpolation)
                     frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
                 except Exception as sct_e:
                     print(f"[VideoSender] Screen share error: {sct_e}")
@@ -202,8 +319,10 @@ class VideoSender:
             # Debug: Log first frame capture and check if frame is black
             if self.frames_sent == 0:
                 print(f"[VideoSender] First frame captured: {frame.shape}")
-                # Check if frame is completely black or nearly black
-                mean_brightness = frame.mean()
+                # Check if frame is completely black or nearly black. A strided 1/64 sample
+                # with cv2.mean (per channel) is plenty for a brightness estimate; use the
+                # same pattern for any periodic frame-health check
+                mean_brightness = sum(cv2.mean(frame[::8, ::8])[:3]) / 3
                 print(f"[VideoSender] Frame brightness: {mean_brightness:.2f} (0=black, 255=white)")
                 if mean_brightness < 5:
                     print(f"[VideoSender] WARNING: Camera is capturing BLACK frames! Check:")
@@ -212,74 +331,297 @@ class VideoSender:
                     print(f"  3. Phone camera is not covered")
                     print(f"  4. Try closing/reopening iVCam app")
             
-            # Store original frame for local display
-            with self.frame_lock:
-                self.latest_frame = frame.copy()
+            # Store original frame for local display. Capture hands out a fresh
+            # array every time and nothing below writes into it, so keep a reference
+            self.latest_frame = (self.frame_id, frame)
+            
+            # Push the frame to the local preview
+            if self.frame_callback:
+                self.frame_callback(self.frame_id, frame)
+            
+            # Resize according to quality settings (screen frames already are)
+            if frame.shape[1] == width and frame.shape[0] == height:
+                # Already at the target size, encode the captured frame directly
+                resized_frame = frame
+                pooled = False
+            else:
+                # INTER_AREA when shrinking: no aliasing, which also leaves less
+                # high-frequency detail for the JPEG encoder to spend bits on
+                interpolation = cv2.INTER_AREA if frame.shape[1] > width else cv2.INTER_LINEAR
+                resized_frame = cv2.resize(frame, (width, height), dst=self._get_resize_buffer(width, height),
+                                           interpolation=interpolation)
+                pooled = True
+            
+            # Hand off to the encode thread so JPEG encode overlaps the next capture.
+            # A frame the encoder hasn't picked up yet is stale, so just replace it
+            with self.encode_cond:
+                stale = self.pending_encode
+                if stale is not None and stale[5]:
+                    self.resize_buffers.append(stale[1])
+                self.pending_encode = (self.frame_id, resized_frame, width, height, jpeg_quality, pooled)
+                self.encode_cond.notify()
+            
+            self.frame_id = (self.frame_id + 1) % (2**32)
+        
+        except Exception as e:
+            print(f"[VideoSender] Error capturing frame: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    def _grab_screen(self):
+        """Grab the main monitor as a BGRA array (read-only): DXGI via dxcam where available, else mss"""
+        if not self.dxcam_failed:
+            try:
+                if self.dxcam_instance is None:
+                    self.dxcam_instance = dxcam.create(output_color='BGRA')
+                grab = self.dxcam_instance.grab()
+                if grab is not None:
+                    self.last_screen_grab = grab
+                return self.last_screen_grab
+            except Exception as e:
+                print(f"[VideoSender] DXGI screen capture not available, using mss: {e}")
+                self.dxcam_failed = True
+                self.dxcam_instance = None
+        
+        sct = self.sct_instance
+        if not sct:
+            # Should not happen given the context manager in loop
+            return None
+        
+        # monitor 1 is usually the main monitor
+        if len(sct.monitors) > 1:
+            monitor = sct.monitors[1]
+        else:
+            monitor = sct.monitors[0] # Fallback
+        
+        # View the grabbed BGRA pixels as an array without copying them
+        return np.asarray(sct.grab(monitor))
+    
+    def _encode_loop(self):
+        """Encode and send frames handed over by the capture thread"""
+        while self.running:
+            with self.encode_cond:
+                while self.running and self.pending_encode is None:
+                    self.encode_cond.wait(timeout=0.5)
+                job = self.pending_encode
+                self.pending_encode = None
+            
+            if job is not None:
+                self._encode_and_send_frame(*job[:5])
+                if job[5]:
+                    with self.encode_cond:
+                        self.resize_buffers.append(job[1])
+    
+    def _get_resize_buffer(self, width, height):
+        """Take a free resize destination of the given size, allocating one if none is free"""
+        with self.encode_cond:
+            while self.resize_buffers:
+                buffer = self.resize_buffers.pop()
+                if buffer.shape[0] == height and buffer.shape[1] == width:
+                    return buffer
+                # Quality changed since this buffer was allocated, let it go
+        return np.empty((height, width, 3), dtype=np.uint8)
+    
+    def _encode_and_send_frame(self, frame_id, frame, width, height, jpeg_quality):
+        """Compress a resized frame and send it"""
+        try:
+            encoder = self.encoder
+            if encoder is None or encoder.width != width or encoder.height != height:
+                if encoder:
+                    encoder.close()
+                encoder = self.encoder = create_encoder(self.video_codec, width, height, self.quality_settings['fps'])
             
-            # Resize according to quality settings
-            width = self.quality_settings['width']
-            height = self.quality_settings['height']
-            resized_frame = cv2.resize(frame, (width, height))
+            payload = encoder.encode(frame, jpeg_quality)
+            if payload is None:
+                return  # Encoder is still buffering
             
-            # Compress to JPEG
-            jpeg_quality = self.quality_settings['jpeg_quality']
-            encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
-            _, encoded_frame = cv2.imencode('.jpg', resized_frame, encode_params)
-            payload = encoded_frame.tobytes()
+            # Split into fragments; every one carries the full header
+            timestamp = time.monotonic_ns()
+            payload_len = len(payload)
+            fragment_size = self.fragment_size
+            fragment_count = max(1, -(-payload_len // fragment_size))
+            sequence_num = self.sequence_num
             
-            # Create packet header
-            timestamp = int(time.time() * 1000000)  # microseconds
-            header = pack_video_header(
-                self.frame_id,
-                timestamp,
-                self.sequence_num,
-                width,
-                height,
-                len(payload),
-                self.client_name
-            )
+            # The previous frame's headers are already sent, so the buffer can be rewritten
+            if len(self.header_buffer) < fragment_count * VIDEO_HEADER_SIZE:
+                self.header_buffer = bytearray(fragment_count * VIDEO_HEADER_SIZE)
+            header_buffer = self.header_buffer
+            header_view = memoryview(header_buffer)
+            packets = []
+            for fragment_index in range(fragment_count):
+                offset = fragment_index * fragment_size
+                length = min(fragment_size, payload_len - offset)
+                header_offset = fragment_index * VIDEO_HEADER_SIZE
+                pack_video_header_into(
+                    header_buffer,
+                    header_offset,
+                    frame_id,
+                    timestamp,
+                    sequence_num,
+                    width,
+                    height,
+                    length,
+                    self.source_id_bytes,
+                    encoder.codec,
+                    fragment_index,
+                    fragment_count,
+                    self.client_handle
+                )
+                packets.append((header_view[header_offset:header_offset + VIDEO_HEADER_SIZE], offset, length))
+                sequence_num = (sequence_num + 1) % (2**32)
             
-            # Send packet
-            packet = header + payload
+            packet_size = payload_len + fragment_count * VIDEO_HEADER_SIZE
             if self.frames_sent == 0:  # Log first packet
-                print(f"[VideoSender] Sending first packet to {self.server_host}:{self.server_udp_port}, size={len(packet)} bytes")
+                print(f"[VideoSender] Sending first frame to {self.server_host}:{self.server_udp_port}, "
+                      f"size={packet_size} bytes in {fragment_count} packets")
             
-            # Simulate packet loss
-            should_send = True
+            # Simulate packet loss: one draw per fragment for the whole frame
             if self.simulated_loss_rate > 0:
-                import random
-                if random.uniform(0, 100) < self.simulated_loss_rate:
-                    should_send = False
+                keep = self.loss_rng.random(fragment_count) * 100 >= self.simulated_loss_rate
+                packets = [packet for packet, kept in zip(packets, keep) if kept]
             
-            if should_send:
-                self.socket.sendto(packet, (self.server_host, self.server_udp_port))
+            if packets:
+                try:
+                    self._send_fragments(packets, payload)
+                except BlockingIOError:
+                    self.frames_truncated += 1
+                except OSError as e:
+                    if e.errno != errno.EMSGSIZE:
+                        raise
+                    # Datagrams don't fit the path MTU (sent with DF); this frame is lost
+                    self._shrink_to_path_mtu()
             
             # Update counters
-            self.frame_id = (self.frame_id + 1) % (2**32)
-            self.sequence_num = (self.sequence_num + 1) % (2**32)
+            self.sequence_num = sequence_num
             self.frames_sent += 1
-            self.bytes_sent += len(packet)
+            self.bytes_sent += packet_size
             self.last_frame_time = time.time()
             
-            # Debug: Log every 100 frames
             if self.frames_sent % 100 == 0:
-                print(f"[VideoSender] {self.frames_sent} frames sent")
+                logger.debug("[VideoSender] %d frames sent", self.frames_sent)
         
         except Exception as e:
-            print(f"[VideoSender] Error capturing/sending frame: {e}")
+            print(f"[VideoSender] Error encoding/sending frame: {e}")
             import traceback
             traceback.print_exc()
     
+    def _tune_socket(self):
+        """Apply send buffer / path MTU options; each one is best effort"""
+        # The kernel silently caps SO_SNDBUF at net.core.wmem_max
+        try:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer_size)
+        except OSError as e:
+            print(f"[VideoSender] Could not set send buffer: {e}")
+        
+        # Set DF on every datagram: never fragmented by IP, too-big sends fail with EMSGSIZE instead
+        if sys.platform.startswith('linux'):
+            try:
+                self.socket.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+            except OSError as e:
+                print(f"[VideoSender] Could not enable path MTU discovery: {e}")
+        
+        sndbuf = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+        print(f"[VideoSender] Socket send buffer: {sndbuf // 1024} KB")
+    
+    def _set_max_datagram(self, max_datagram):
+        """Size datagrams (header + fragment) at max_datagram bytes"""
+        self.max_datagram = max_datagram
+        self.fragment_size = max_datagram - VIDEO_HEADER_SIZE
+        self.gso_max_packets = min(UDP_MAX_SEGMENTS, 65507 // max_datagram)
+        self.gso_cmsg = [(socket.IPPROTO_UDP, UDP_SEGMENT, struct.pack('=H', max_datagram))]
+    
+    def _path_mtu(self):
+        """Path MTU to the server as currently known to the kernel, or None"""
+        # IP_MTU needs a connected socket; the route cache is shared, so a probe socket sees it
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            probe.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+            probe.connect((self.server_host, self.server_udp_port))
+            return probe.getsockopt(socket.IPPROTO_IP, IP_MTU)
+        except OSError:
+            return None
+        finally:
+            probe.close()
+    
+    def _shrink_to_path_mtu(self):
+        """Cut the datagram size down to the path MTU after an EMSGSIZE"""
+        mtu = self._path_mtu()
+        max_datagram = mtu - UDP_IP_OVERHEAD if mtu else 0
+        if not 0 < max_datagram < self.max_datagram:
+            # Path MTU unknown (or not what's limiting us): step down instead
+            max_datagram = self.max_datagram - 100
+        max_datagram = max(VIDEO_HEADER_SIZE + 256, max_datagram)
+        print(f"[VideoSender] Datagram too big for the path (MTU {mtu}), sending {max_datagram}-byte datagrams")
+        self._set_max_datagram(max_datagram)
+    
+    def _probe_gso(self):
+        """Check once whether the socket accepts UDP_SEGMENT"""
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            self.socket.setsockopt(socket.IPPROTO_UDP, UDP_SEGMENT, VIDEO_MAX_DATAGRAM)
+            return True
+        except OSError as e:
+            print(f"[VideoSender] UDP segmentation offload not available: {e}")
+            return False
+    
+    def _send_fragments(self, packets, payload):
+        """Send [(header, offset, length), ...] fragments of payload, batched where possible;
+        raises BlockingIOError if the socket send buffer fills part way, EMSGSIZE if a
+        datagram exceeds the path MTU"""
+        addr = (self.server_host, self.server_udp_port)
+        
+        if self.gso:
+            try:
+                self._send_gso(packets, payload, addr)
+                return
+            except OSError as e:
+                if isinstance(e, BlockingIOError) or e.errno == errno.EMSGSIZE:
+                    raise
+                # e.g. EIO from a device that can't checksum-offload: stop trying
+                print(f"[VideoSender] UDP segmentation offload failed, disabling it: {e}")
+                self.gso = False
+        
+        if self.batch_sender:
+            self.batch_sender.send(packets, payload, addr)
+            return
+        
+        # No sendmmsg on this platform (Windows/macOS): one datagram per call,
+        # assembled in a reused buffer
+        view = memoryview(payload)
+        datagram = self.datagram_buffer
+        datagram_view = memoryview(datagram)
+        for header, offset, length in packets:
+            datagram[:VIDEO_HEADER_SIZE] = header
+            datagram[VIDEO_HEADER_SIZE:VIDEO_HEADER_SIZE + length] = view[offset:offset + length]
+            self.socket.sendto(datagram_view[:VIDEO_HEADER_SIZE + length], addr)
+    
+    def _send_gso(self, packets, payload, addr):
+        """Send fragments as segmented super-datagrams (one sendmsg per up to gso_max_packets)"""
+        # Every fragment but the frame's last is exactly max_datagram bytes, as GSO requires
+        view = memoryview(payload)
+        step = self.gso_max_packets
+        for start in range(0, len(packets), step):
+            buffers = []
+            for header, offset, length in packets[start:start + step]:
+                buffers.append(header)
+                buffers.append(view[offset:offset + length])
+            self.socket.sendmsg(buffers, self.gso_cmsg, 0, addr)
+    
     def get_latest_frame(self):
-        """Get the latest captured frame for local display"""
-        with self.frame_lock:
-            return self.latest_frame.copy() if self.latest_frame is not None else None
+        """Get the latest captured frame for local display (shared, treat as read-only)"""
+        return self.latest_frame[1]
+    
+    def get_latest_frame_with_seq(self):
+        """Get the latest captured frame and its frame_id: returns (seq, frame), frame is read-only"""
+        return self.latest_frame
     
     def get_stats(self):
         """Get sender statistics"""
         return {
             'frames_sent': self.frames_sent,
             'bytes_sent': self.bytes_sent,
+            'frames_truncated': self.frames_truncated,
             'current_quality': self.current_quality,
             'fps': self.quality_settings['fps'],
             'resolution': f"{self.quality_settings['width']}x{self.quality_settings['height']}"
@@ -295,27 +637,33 @@ class VideoSender:
         <= 2% loss -> 480p
         """
         # Determine target quality based on strict thresholds
-        target_quality = '480p' # Default best
+        target_quality = LOSS_QUALITY_TABLE[min(100, max(0, math.ceil(packet_loss)))]
         
-        if packet_loss > 15:
-            target_quality = '144p'
-        elif packet_loss > 10:
-            target_quality = '240p'
-        elif packet_loss > 2:
+        # Loss is low (<= 2%), but if ping is extremely high (>400ms), don't force 480p
+        if target_quality == '480p' and rtt > 400:
             target_quality = '360p'
+        
+        # Apply change once the same target has persisted, so loss hovering around
+        # a threshold doesn't flip the quality back and forth
+        if self.current_quality == target_quality:
+            self.pending_quality = None
+            self.pending_quality_count = 0
         else:
-            # Loss is low (<= 2%), but check Latency
-            # If ping is extremely high (>400ms), don't force 480p
-            if rtt > 400:
-                target_quality = '360p'
+            if self.pending_quality == target_quality:
+                self.pending_quality_count += 1
             else:
-                target_quality = '480p'
-        
-        # Apply change if different
-        if self.current_quality != target_quality:
-            print(f"[VideoSender] Adapting quality: {self.current_quality} -> {target_quality} (Loss={packet_loss:.1f}%, RTT={rtt:.0f}ms)")
-            self.set_quality(target_quality)
+                self.pending_quality = target_quality
+                self.pending_quality_count = 1
+            
+            stepping_down = QUALITY_RANK[target_quality] < QUALITY_RANK[self.current_quality]
+            required = self.quality_down_samples if stepping_down else self.quality_up_samples
+            if self.pending_quality_count >= required:
+                print(f"[VideoSender] Adapting quality: {self.current_quality} -> {target_quality} (Loss={packet_loss:.1f}%, RTT={rtt:.0f}ms)")
+                self.pending_quality = None
+                self.pending_quality_count = 0
+                self.set_quality(target_quality)
     
         # Adjust FPS if specified
         if target_fps:
             self.quality_settings['fps'] = max(5, min(target_fps, 30))
+            self._cache_quality()
@@ -1,7 +1,12 @@
 """
 Protocol definitions for the Multi-Client Real-Time Communication System
 """
+import logging
 import struct
+import threading
+import msgpack
+
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # TCP Control Channel Message Types
@@ -40,29 +45,70 @@ MSG_NEW_JOIN_REQUEST = "NEW_JOIN_REQUEST"
 MSG_HEARTBEAT_ACK = "HEARTBEAT_ACK"
 MSG_CAMERA_STATUS_BROADCAST = "CAMERA_STATUS_BROADCAST"  # Broadcast camera status to all
 
+# ============================================================================
+# UDP Packet Types
+# ============================================================================
+# Every UDP packet starts with a 1-byte type tag so the relay can dispatch on
+# data[0] without parsing either header, then the sender's client handle
+# (from MEETING_CREATED / JOIN_ACCEPTED; 0 if it has none) so the relay can
+# tell who sent it without reading the rest
+PKT_VIDEO = 0x01
+PKT_AUDIO = 0x02
+PKT_SENDER_STRUCT = struct.Struct('!I')  # At offset 1 in both headers
+
+def packet_sender(data):
+    """Client handle a video or audio packet was sent with (0 = unknown)"""
+    return PKT_SENDER_STRUCT.unpack_from(data, 1)[0]
+
 # ============================================================================
 # Video Packet Format (UDP)
 # ============================================================================
-# Header: [frame_id (4 bytes)][timestamp (8 bytes)][sequence_num (4 bytes)]
+# Header: [type (1 byte)][sender (4 bytes)][frame_id (4 bytes)][timestamp (8 bytes)][sequence_num (4 bytes)]
 #         [width (2 bytes)][height (2 bytes)][payload_size (4 bytes)]
+#         [codec (1 byte)][fragment_index (2 bytes)][fragment_count (2 bytes)]
 #         [source_id (16 bytes)][payload]
+# timestamp is the sender's time.monotonic_ns(): only differences between
+# packets of the same sender are meaningful
+# A frame is split into fragment_count datagrams sharing frame_id; each carries
+# payload_size bytes of the frame, and sequence_num counts datagrams, not frames
 
-VIDEO_HEADER_SIZE = 40  # 4 + 8 + 4 + 2 + 2 + 4 + 16
+VIDEO_HEADER_SIZE = 50  # 1 + 4 + 4 + 8 + 4 + 2 + 2 + 4 + 1 + 2 + 2 + 16
+VIDEO_HEADER_STRUCT = struct.Struct('!BIIQIHHiBHH16s')  # Compiled once, used for every packet
 
-def pack_video_header(frame_id, timestamp, sequence_num, width, height, payload_size, source_id):
-    """Pack video header into bytes"""
-    # Ensure source_id is exactly 16 bytes
+# Keep every datagram under a typical 1500-byte path MTU so IP never fragments it
+VIDEO_MAX_DATAGRAM = 1400
+VIDEO_FRAGMENT_SIZE = VIDEO_MAX_DATAGRAM - VIDEO_HEADER_SIZE
+
+# Video payload codecs
+CODEC_JPEG = 0  # Standalone JPEG per frame
+CODEC_H264 = 1  # H.264 Annex-B access unit, decode in order per sender
+
+def encode_source_id(source_id):
+    """Encode a source id as the header's fixed 16-byte field"""
     if isinstance(source_id, str):
         source_id = source_id.encode('utf-8')
-    source_id = source_id[:16].ljust(16, b'\x00')
-    
-    return struct.pack('!IQIHHi16s', frame_id, timestamp, sequence_num, width, height, payload_size, source_id)
+    return source_id[:16].ljust(16, b'\x00')
+
+def pack_video_header(frame_id, timestamp, sequence_num, width, height, payload_size, source_id, codec=CODEC_JPEG,
+                      fragment_index=0, fragment_count=1, sender=0):
+    """Pack video header into bytes"""
+    return VIDEO_HEADER_STRUCT.pack(PKT_VIDEO, sender, frame_id, timestamp, sequence_num, width, height, payload_size, codec,
+                                    fragment_index, fragment_count, encode_source_id(source_id))
+
+def pack_video_header_into(buffer, offset, frame_id, timestamp, sequence_num, width, height, payload_size,
+                           source_id_bytes, codec, fragment_index, fragment_count, sender=0):
+    """Pack a video header into buffer at offset; source_id_bytes comes from encode_source_id"""
+    VIDEO_HEADER_STRUCT.pack_into(buffer, offset, PKT_VIDEO, sender, frame_id, timestamp, sequence_num, width, height, payload_size,
+                                  codec, fragment_index, fragment_count, source_id_bytes)
 
 def unpack_video_header(data):
     """Unpack video header from bytes"""
     if len(data) < VIDEO_HEADER_SIZE:
         raise ValueError(f"Invalid video header size: {len(data)}")
-    frame_id, timestamp, sequence_num, width, height, payload_size, source_id_bytes = struct.unpack('!IQIHHi16s', data[:VIDEO_HEADER_SIZE])
+    (packet_type, sender, frame_id, timestamp, sequence_num, width, height, payload_size, codec,
+     fragment_index, fragment_count, source_id_bytes) = VIDEO_HEADER_STRUCT.unpack_from(data)
+    if packet_type != PKT_VIDEO:
+        raise ValueError(f"Not a video packet: type {packet_type}")
     
     # Decode source_id
     try:
@@ -77,99 +123,211 @@ def unpack_video_header(data):
         'width': width,
         'height': height,
         'payload_size': payload_size,
-        'source_id': source_id
+        'codec': codec,
+        'fragment_index': fragment_index,
+        'fragment_count': fragment_count,
+        'source_id': source_id,
+        'sender': sender
     }
 
 # ============================================================================
 # Audio Packet Format (UDP)
 # ============================================================================
-# Header: [audio_id (4 bytes)][timestamp (8 bytes)][sample_rate (2 bytes)]
+# Header: [type (1 byte)][sender (4 bytes)][audio_id (4 bytes)][timestamp (8 bytes)][sample_rate (2 bytes)]
 #         [channels (1 byte)][payload_size (4 bytes)][payload]
+# timestamp is the sender's time.monotonic_ns(), as for video
 
-AUDIO_HEADER_SIZE = 19  # 4 + 8 + 2 + 1 + 4
+AUDIO_HEADER_SIZE = 24  # 1 + 4 + 4 + 8 + 2 + 1 + 4
+AUDIO_HEADER_STRUCT = struct.Struct('!BIIQHBi')
 
-def pack_audio_header(audio_id, timestamp, sample_rate, channels, payload_size):
+def pack_audio_header(audio_id, timestamp, sample_rate, channels, payload_size, sender=0):
     """Pack audio header into bytes"""
-    return struct.pack('!IQHBi', audio_id, timestamp, sample_rate, channels, payload_size)
+    return AUDIO_HEADER_STRUCT.pack(PKT_AUDIO, sender, audio_id, timestamp, sample_rate, channels, payload_size)
 
 def unpack_audio_header(data):
     """Unpack audio header from bytes"""
     if len(data) < AUDIO_HEADER_SIZE:
         raise ValueError(f"Invalid audio header size: {len(data)}")
-    audio_id, timestamp, sample_rate, channels, payload_size = struct.unpack('!IQHBi', data[:AUDIO_HEADER_SIZE])
+    packet_type, sender, audio_id, timestamp, sample_rate, channels, payload_size = AUDIO_HEADER_STRUCT.unpack_from(data)
+    if packet_type != PKT_AUDIO:
+        raise ValueError(f"Not an audio packet: type {packet_type}")
     return {
         'audio_id': audio_id,
         'timestamp': timestamp,
         'sample_rate': sample_rate,
         'channels': channels,
-        'payload_size': payload_size
+        'payload_size': payload_size,
+        'sender': sender
     }
 
 # ============================================================================
 # TCP Message Format
 # ============================================================================
-# All TCP messages are JSON encoded with a length prefix:
-# [length (4 bytes)][json_payload]
+# All TCP messages are MessagePack-encoded maps with a length prefix:
+# [length (4 bytes)][msgpack_payload]
+# bytes values travel as raw msgpack bin, strings as str; file chunks use the
+# binary frame below instead
+
+TCP_LENGTH_STRUCT = struct.Struct('!I')
+
+# File chunks are most of the channel's bytes, so they skip msgpack for a fixed layout:
+# [length (4 bytes)][tag (1 byte)][kind (1 byte)][chunk_id (4 bytes)]
+# [sender_len (1 byte)][target_len (1 byte)][sender_name][target_name][data]
+# tag is 0xc1, a byte msgpack never emits, so the two formats can't be confused
+FILE_CHUNK_TAG = 0xc1
+FILE_CHUNK_STRUCT = struct.Struct('!BBIBB')
+FILE_CHUNK_KINDS = (MSG_FILE_CHUNK, MSG_FILE_CHUNK_FORWARD)  # kind byte -> message type
+
+def pack_file_chunk_parts(msg_type, chunk_id=0, data=b'', sender_name=None, target_name=None, **extra):
+    """
+    Pack a file chunk as a binary frame split in two: everything up to the data, and
+    the data object itself, so it can be written (or relayed) without copying it
+    Returns: (header bytes, data), or None if the message doesn't fit the fixed layout
+    """
+    if extra or not isinstance(data, (bytes, bytearray, memoryview)):
+        return None
+    sender = (sender_name or '').encode('utf-8')
+    target = (target_name or '').encode('utf-8')
+    try:
+        header = FILE_CHUNK_STRUCT.pack(FILE_CHUNK_TAG, FILE_CHUNK_KINDS.index(msg_type), chunk_id,
+                                        len(sender), len(target))
+    except struct.error:
+        return None
+    length = len(header) + len(sender) + len(target) + len(data)
+    return b''.join((TCP_LENGTH_STRUCT.pack(length), header, sender, target)), data
+
+def pack_file_chunk(msg_type, **kwargs):
+    """
+    Pack a file chunk as a binary frame with length prefix
+    Returns: bytes, or None if the message doesn't fit the fixed layout
+    """
+    parts = pack_file_chunk_parts(msg_type, **kwargs)
+    return b''.join(parts) if parts else None
+
+def unpack_file_chunk(payload):
+    """Unpack a binary file chunk payload (without its length prefix) into a message dict"""
+    _, kind, chunk_id, sender_len, target_len = FILE_CHUNK_STRUCT.unpack_from(payload)
+    offset = FILE_CHUNK_STRUCT.size
+    sender = bytes(payload[offset:offset + sender_len]).decode('utf-8')
+    offset += sender_len
+    target = bytes(payload[offset:offset + target_len]).decode('utf-8')
+    offset += target_len
+    
+    msg = {'type': FILE_CHUNK_KINDS[kind], 'chunk_id': chunk_id, 'data': bytes(payload[offset:])}
+    if sender:
+        msg['sender_name'] = sender
+    if target:
+        msg['target_name'] = target
+    return msg
+
+def decode_tcp_payload(payload):
+    """Decode one message payload (without its length prefix), binary file chunk or msgpack"""
+    if len(payload) and payload[0] == FILE_CHUNK_TAG:
+        return unpack_file_chunk(payload)
+    return msgpack.unpackb(payload, raw=False)
+
+_packers = threading.local()
+
+def _packer():
+    """This thread's msgpack Packer; packb builds a new one (and its output buffer) per call"""
+    packer = getattr(_packers, 'packer', None)
+    if packer is None:
+        packer = _packers.packer = msgpack.Packer(use_bin_type=True)
+    return packer
 
 def pack_tcp_message(msg_type, **kwargs):
     """
     Pack a TCP message with length prefix
     Returns: bytes
     """
-    import json
+    if msg_type in FILE_CHUNK_KINDS:
+        message = pack_file_chunk(msg_type, **kwargs)
+        if message is not None:
+            return message
+    
     msg_dict = {'type': msg_type}
     msg_dict.update(kwargs)
-    json_str = json.dumps(msg_dict)
-    json_bytes = json_str.encode('utf-8')
-    length = len(json_bytes)
-    return struct.pack('!I', length) + json_bytes
+    payload = _packer().pack(msg_dict)
+    return TCP_LENGTH_STRUCT.pack(len(payload)) + payload
 
 def unpack_tcp_message(sock):
     """
     Unpack a TCP message from socket
     Returns: dict or None if connection closed
     """
-    import json
-    
     # Read length prefix
     length_data = recv_exact(sock, 4)
     if not length_data:
         return None
     
-    length = struct.unpack('!I', length_data)[0]
-    print(f"[Protocol] unpack_tcp_message: length={length}")
+    length, = TCP_LENGTH_STRUCT.unpack(length_data)
     
-    # Read JSON payload
-    json_data = recv_exact(sock, length)
-    if not json_data:
+    # Read payload
+    payload = recv_exact(sock, length)
+    if not payload:
         return None
     
-    print(f"[Protocol] unpack_tcp_message: json_data={json_data[:100]}")
-    result = json.loads(json_data.decode('utf-8'))
-    print(f"[Protocol] unpack_tcp_message: msg_type={result.get('type')}")
+    result = decode_tcp_payload(payload)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[Protocol] unpack_tcp_message: length=%d type=%s payload=%r",
+                     length, result.get('type'), payload[:100])
     return result
 
+def parse_tcp_messages(data):
+    """
+    Unpack every complete message at the front of data (any bytes-like object),
+    reading in place without copying it
+    Returns: (list of dicts, number of bytes consumed)
+    """
+    header_size = TCP_LENGTH_STRUCT.size
+    messages = []
+    offset = 0
+    with memoryview(data) as view:
+        size = len(view)
+        while size - offset >= header_size:
+            length, = TCP_LENGTH_STRUCT.unpack_from(view, offset)
+            end = offset + header_size + length
+            if size < end:
+                break
+            messages.append(decode_tcp_payload(view[offset + header_size:end]))
+            offset = end
+    return messages, offset
+
+def unpack_tcp_messages(buffer):
+    """
+    Unpack every complete message at the front of buffer (a bytearray of received
+    bytes) and remove them from it; a trailing partial message is left in place
+    Returns: list of dicts
+    """
+    messages, consumed = parse_tcp_messages(buffer)
+    if consumed:
+        del buffer[:consumed]
+    return messages
+
 def recv_exact(sock, n):
-    """Receive exactly n bytes from socket"""
-    data = b''
-    while len(data) < n:
+    """Receive exactly n bytes from socket into a bytearray; None if the connection closed"""
+    # Fill one preallocated buffer in place instead of concatenating chunks
+    buffer = bytearray(n)
+    view = memoryview(buffer)
+    received = 0
+    while received < n:
         try:
-            chunk = sock.recv(n - len(data))
-            if not chunk:
+            count = sock.recv_into(view[received:], n - received)
+            if not count:
                 # Connection closed
                 return None
-            data += chunk
+            received += count
         except (ConnectionResetError, ConnectionAbortedError, OSError) as e:
             # Connection error
-            print(f"[Protocol] recv_exact error: {e}")
+            logger.debug("[Protocol] recv_exact error: %s", e)
             return None
-    return data
+    return buffer
 
 # ============================================================================
 # File Transfer Protocol
 # ============================================================================
 # FILE_START: {filename, filesize, chunk_size}
-# FILE_CHUNK: {chunk_id, data (base64)}
+# FILE_CHUNK: {chunk_id, data (raw bytes), target_name} - binary frame, see FILE_CHUNK_TAG
 # FILE_ACK: {chunk_id, cwnd}
 # FILE_END: {checksum}
 
@@ -0,0 +1,264 @@
+"""
+UDP Batch - Receive/send many datagrams with one recvmmsg(2)/sendmmsg(2) call
+Linux only (via ctypes); callers fall back to plain recvfrom/sendto elsewhere
+"""
+import ctypes
+import ctypes.util
+import errno
+import select
+import socket
+import sys
+
+MSG_DONTWAIT = 0x40
+MSG_TRUNC = 0x20  # In recvmmsg flags: report a datagram's full length even when cut short
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_IoVec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr),
+                ('msg_len', ctypes.c_uint)]
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [('sin_family', ctypes.c_ushort),
+                ('sin_port', ctypes.c_uint16),
+                ('sin_addr', ctypes.c_uint8 * 4),
+                ('sin_zero', ctypes.c_uint8 * 8)]
+
+def _load_libc_func(name, argtypes):
+    """Look up a libc function, or None if this platform doesn't have it"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        func = getattr(libc, name)
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = argtypes
+    func.restype = ctypes.c_int
+    return func
+
+_recvmmsg = _load_libc_func('recvmmsg', [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p])
+_sendmmsg = _load_libc_func('sendmmsg', [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int])
+
+def _buffer_address(buf):
+    """Address of the first byte of bytes or a writable buffer; the kernel reads it in place"""
+    if isinstance(buf, bytes):
+        # Python bytes never move
+        return ctypes.cast(ctypes.c_char_p(buf), ctypes.c_void_p).value
+    return ctypes.addressof(ctypes.c_char.from_buffer(buf))
+
+def recvmmsg_available():
+    """True if batch receive is supported here"""
+    return _recvmmsg is not None
+
+def sendmmsg_available():
+    """True if batch send is supported here"""
+    return _sendmmsg is not None
+
+class BatchReceiver:
+    """Pulls up to max_packets queued datagrams off an AF_INET UDP socket per syscall"""
+
+    def __init__(self, sock, max_packets=64, buffer_size=65535):
+        self.sock = sock
+        self.max_packets = max_packets
+
+        # Buffers and headers are allocated once and reused for every call
+        # (buffer_size=0: no buffers of its own, the caller always uses recv_into)
+        self.buffers = [ctypes.create_string_buffer(buffer_size) for _ in range(max_packets)] if buffer_size else []
+        self.iovecs = (_IoVec * max_packets)()
+        self.addrs = (_SockAddrIn * max_packets)()
+        self.msgs = (_MMsgHdr * max_packets)()
+
+        for i in range(max_packets):
+            if self.buffers:
+                self.iovecs[i].iov_base = ctypes.addressof(self.buffers[i])
+                self.iovecs[i].iov_len = buffer_size
+            hdr = self.msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self.iovecs[i])
+            hdr.msg_iovlen = 1
+            hdr.msg_name = ctypes.addressof(self.addrs[i])
+
+        # Waits for the socket only once it has been drained
+        self.poller = select.poll()
+        self.poller.register(sock, select.POLLIN)
+
+    def recv(self, timeout):
+        """Wait up to timeout seconds, then return [(data, addr), ...]; raises socket.timeout if nothing arrived"""
+        count = self._receive(self.max_packets, MSG_DONTWAIT, timeout)
+
+        packets = []
+        for i in range(count):
+            addr = self.addrs[i]
+            host = '.'.join(str(b) for b in addr.sin_addr)
+            port = socket.ntohs(addr.sin_port)
+            packets.append((ctypes.string_at(self.buffers[i], self.msgs[i].msg_len), (host, port)))
+        return packets
+
+    def recv_into(self, buffers, timeout):
+        """Like recv, but the kernel writes straight into buffers (writable, at most max_packets of them)
+        Returns: [(nbytes, addr), ...] for buffers[0], buffers[1], ...; nbytes > len(buffer) means truncated"""
+        for i, buf in enumerate(buffers):
+            self.iovecs[i].iov_base = _buffer_address(buf)
+            self.iovecs[i].iov_len = len(buf)
+
+        count = self._receive(len(buffers), MSG_DONTWAIT | MSG_TRUNC, timeout)
+
+        packets = []
+        for i in range(count):
+            addr = self.addrs[i]
+            packets.append((self.msgs[i].msg_len, (socket.inet_ntoa(bytes(addr.sin_addr)), socket.ntohs(addr.sin_port))))
+        return packets
+
+    def _receive(self, count, flags, timeout):
+        """recvmmsg up to count datagrams; only waits (up to timeout seconds) when none are queued"""
+        fd = self.sock.fileno()
+        # Under load something is nearly always queued already, so try before polling
+        result = self._recvmmsg(fd, count, flags)
+        if result < 0:
+            if not self.poller.poll(timeout * 1000):
+                raise socket.timeout()
+            result = self._recvmmsg(fd, count, flags)
+            if result < 0:
+                # Woken without data (another reader got it, or a signal)
+                raise socket.timeout()
+        return result
+
+    def _recvmmsg(self, fd, count, flags):
+        """One recvmmsg call; -1 if nothing was queued, OSError on a real failure"""
+        # msg_namelen is in/out, so reset it before every call
+        for i in range(count):
+            self.msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+
+        result = _recvmmsg(fd, self.msgs, count, flags, None)
+        if result < 0:
+            err = ctypes.get_errno()
+            if err not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                raise OSError(err, 'recvmmsg failed')
+        return result
+
+class BatchSender:
+    """Sends a list of datagrams to one AF_INET address with as few sendmmsg calls as possible"""
+
+    def __init__(self, sock, max_packets=64):
+        self.sock = sock
+        self.max_packets = max_packets
+
+        # Every datagram is [header][payload slice]: two iovecs, no concatenation
+        self.iovecs = (_IoVec * (2 * max_packets))()
+        self.msgs = (_MMsgHdr * max_packets)()
+        self.addr = _SockAddrIn()
+        self.addr_key = None
+
+        for i in range(max_packets):
+            hdr = self.msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self.iovecs[2 * i])
+            hdr.msg_iovlen = 2
+            hdr.msg_name = ctypes.addressof(self.addr)
+            hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+
+    def _set_addr(self, addr):
+        """Fill in the destination sockaddr, resolving the host only when it changes"""
+        if addr == self.addr_key:
+            return
+        host, port = addr
+        self.addr.sin_family = socket.AF_INET
+        self.addr.sin_port = socket.htons(port)
+        self.addr.sin_addr[:] = socket.inet_aton(socket.gethostbyname(host))
+        self.addr_key = addr
+
+    def send(self, packets, payload, addr):
+        """Send [(header, offset, length), ...] where each datagram is header + payload[offset:offset+length]
+        headers and payload are bytes or writable buffers"""
+        self._set_addr(addr)
+
+        payload_base = _buffer_address(payload)
+        msgs_base = ctypes.addressof(self.msgs)
+        fd = self.sock.fileno()
+
+        for start in range(0, len(packets), self.max_packets):
+            batch = packets[start:start + self.max_packets]
+            for i, (header, offset, length) in enumerate(batch):
+                head_iov = self.iovecs[2 * i]
+                head_iov.iov_base = _buffer_address(header)
+                head_iov.iov_len = len(header)
+                body_iov = self.iovecs[2 * i + 1]
+                body_iov.iov_base = payload_base + offset
+                body_iov.iov_len = length
+
+            # A blocking socket can still return a short count; resend the rest
+            sent = 0
+            while sent < len(batch):
+                count = _sendmmsg(fd, msgs_base + sent * ctypes.sizeof(_MMsgHdr), len(batch) - sent, 0)
+                if count < 0:
+                    err = ctypes.get_errno()
+                    if err == errno.EINTR:
+                        continue
+                    raise OSError(err, 'sendmmsg failed')
+                sent += count
+
+class FanoutSender:
+    """Sends one datagram to many AF_INET addresses with as few sendmmsg calls as possible"""
+
+    def __init__(self, sock, max_packets=64):
+        self.sock = sock
+        self.max_packets = max_packets
+
+        # Every message shares the one payload iovec and differs only in destination
+        self.iovec = _IoVec()
+        self.addrs = (_SockAddrIn * max_packets)()
+        self.msgs = (_MMsgHdr * max_packets)()
+
+        for i in range(max_packets):
+            hdr = self.msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self.iovec)
+            hdr.msg_iovlen = 1
+            hdr.msg_name = ctypes.addressof(self.addrs[i])
+            hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+
+        # The addrs sequence the sockaddrs were last filled from (held, so its identity can't be reused)
+        self.filled_addrs = None
+
+    def send(self, data, addrs):
+        """Send data (bytes or a writable buffer) to every (ip, port) in addrs
+        Passing the same addrs tuple again (e.g. a cached one) skips rebuilding the sockaddrs
+        Returns: [(addr, OSError), ...] for destinations that failed; the rest are still sent"""
+        self.iovec.iov_base = _buffer_address(data)
+        self.iovec.iov_len = len(data)
+
+        msgs_base = ctypes.addressof(self.msgs)
+        fd = self.sock.fileno()
+        failed = []
+
+        for start in range(0, len(addrs), self.max_packets):
+            batch = addrs[start:start + self.max_packets]
+            if addrs is not self.filled_addrs or len(addrs) > self.max_packets:
+                for i, (host, port) in enumerate(batch):
+                    addr = self.addrs[i]
+                    addr.sin_family = socket.AF_INET
+                    addr.sin_port = socket.htons(port)
+                    addr.sin_addr[:] = socket.inet_aton(host)
+                self.filled_addrs = addrs
+
+            sent = 0
+            while sent < len(batch):
+                count = _sendmmsg(fd, msgs_base + sent * ctypes.sizeof(_MMsgHdr), len(batch) - sent, 0)
+                if count < 0:
+                    err = ctypes.get_errno()
+                    if err == errno.EINTR:
+                        continue
+                    # sendmmsg stops at the first failing message: note it and carry on after it
+                    failed.append((batch[sent], OSError(err, 'sendmmsg failed')))
+                    count = 1
+                sent += count
+        return failed
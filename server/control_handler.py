@@ -1,143 +1,425 @@
 """
 Control Handler - Handles TCP control channel messages from clients
+All client connections are served by one thread with a selector: sockets are
+non-blocking, and every write goes through a per-connection outbox, so a slow
+client never holds up the others
 """
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from common.protocol import *
-import threading
+import errno
+import logging
+import selectors
 import socket
+import struct
+from collections import deque
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+# Linux only: ACK immediately instead of waiting on the delayed-ACK timer
+TCP_QUICKACK = getattr(socket, 'TCP_QUICKACK', None)
+
+RECV_SIZE = 65536
+# Buffers handed to one sendmsg (writev) call; Windows has no sendmsg and sends one at a time
+SEND_BATCH = 64
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+# Small messages are held until the end of the event loop pass and written together;
+# a connection with this many bytes queued is written straight away
+FLUSH_THRESHOLD = 16 * 1024
+MAX_CLIENTS = 512  # Connections served at once; more are turned away at accept
+
+# Linux (4.14+) MSG_ZEROCOPY: the kernel sends large buffers straight from our pages
+# instead of copying them, and reports on the socket's error queue when it is done
+# with them. Python doesn't export the constants, so these are the Linux values
+ZEROCOPY_SUPPORTED = sys.platform.startswith('linux') and HAS_SENDMSG
+SO_ZEROCOPY = getattr(socket, 'SO_ZEROCOPY', 60)
+MSG_ZEROCOPY = getattr(socket, 'MSG_ZEROCOPY', 0x4000000)
+SO_EE_ORIGIN_ZEROCOPY = 5
+SO_EE_CODE_ZEROCOPY_COPIED = 1
+SOCK_EXTENDED_ERR = struct.Struct('=IBBBBII')  # errno, origin, type, code, pad, info (first seq), data (last seq)
+ZEROCOPY_MIN = 16 * 1024  # Below this, pinning pages costs more than the copy it saves
+
+class Connection:
+    """Event loop state for one client's control socket"""
+    __slots__ = ('socket', 'addr', 'inbox', 'outbox', 'queued', 'events', 'closed',
+                 'zerocopy', 'zc_seq', 'zc_inflight')
+    
+    def __init__(self, client_socket, client_addr):
+        self.socket = client_socket
+        self.addr = client_addr
+        self.inbox = bytearray()  # Received bytes not yet parsed into messages
+        # Packed messages the kernel hasn't taken yet, as views: a broadcast queues the
+        # same bytes for every participant instead of copying them per connection
+        self.outbox = deque()
+        self.queued = 0  # Bytes queued since the last write attempt
+        self.events = selectors.EVENT_READ
+        self.closed = False
+        self.zerocopy = False  # MSG_ZEROCOPY enabled (and not yet found to fall back to copying)
+        self.zc_seq = 0  # Kernel's number for our next zerocopy send
+        self.zc_inflight = deque()  # (seq, buffers) the kernel may still be reading
 
 class ControlHandler:
     """Handles TCP control messages from clients"""
     
-    def __init__(self, meeting_manager, file_manager):
+    def __init__(self, meeting_manager, file_manager, max_clients=MAX_CLIENTS):
         self.meeting_manager = meeting_manager
         self.file_manager = file_manager
+        self.max_clients = max_clients
         self.running = True
+        
+        # Event loop state, owned by the thread running serve()
+        self.selector = None
+        self.connections = {}  # client socket -> Connection
+        self.failed = []  # Connections whose send failed, closed once the current event is handled
+        self.pending = {}  # Connections with messages held for the end of this pass (ordered set)
+        
+        # Message type -> handler(client_socket, msg, client_info); busiest types first
+        self.handlers = {
+            MSG_FILE_CHUNK: self.handle_file_chunk,
+            MSG_FILE_ACK: self.handle_file_ack,
+            MSG_HEARTBEAT: self.handle_heartbeat,
+            MSG_VIDEO_STATS: self.handle_video_stats,
+            MSG_CHAT: self.handle_chat,
+            MSG_FILE_START: self.handle_file_start,
+            MSG_FILE_END: self.handle_file_end,
+            MSG_CAMERA_STATUS: self.handle_camera_status,
+            MSG_CREATE_MEETING: self.handle_create_meeting,
+            MSG_REQUEST_JOIN: self.handle_request_join,
+            MSG_ALLOW_JOIN: self.handle_allow_join,
+            MSG_DENY_JOIN: self.handle_deny_join,
+            MSG_REGISTER_UDP: self.handle_register_udp,
+            MSG_LEAVE: self.handle_leave,
+        }
+        self.configure_socket = None
+        # One receive buffer for every connection (they are all read on this thread);
+        # complete messages are parsed straight out of it
+        self.recv_buffer = bytearray(RECV_SIZE)
+        self.recv_view = memoryview(self.recv_buffer)
     
-    def handle_client(self, client_socket, client_addr):
-        """Handle a single client connection"""
-        print(f"[ControlHandler] Client connected from {client_addr}")
+    def _quickack(self, client_socket):
+        """Turn on TCP_QUICKACK where supported (best effort)"""
+        if TCP_QUICKACK is not None:
+            try:
+                client_socket.setsockopt(socket.IPPROTO_TCP, TCP_QUICKACK, 1)
+            except OSError:
+                pass
+    
+    def serve(self, listen_socket, configure_socket=None):
+        """
+        Accept and serve every client on the calling thread until stop()
+        configure_socket(sock) is called on each accepted socket first
+        """
+        self.configure_socket = configure_socket
+        self.selector = selectors.DefaultSelector()
+        listen_socket.setblocking(False)
+        self.selector.register(listen_socket, selectors.EVENT_READ, None)
         
         try:
-            # Configure socket
-            client_socket.settimeout(None)  # No timeout for long-lived connections
-            client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)  # Enable keepalive
-            
             while self.running:
-                try:
-                    msg = unpack_tcp_message(client_socket)
-                    if msg is None:
-                        print(f"[ControlHandler] Client {client_addr} connection closed (msg is None)")
-                        break
-                    
-                    msg_type = msg.get('type')
-                    
-                    # Log ALL messages, not just some
-                    if msg_type != "VIDEO_STATS":  # Don't spam with video stats
-                        print(f"[ControlHandler] Received message from {client_addr}: {msg_type}")
-                        print(f"[ControlHandler] Full message: {msg}")
-                    else:
-                        print(f"[ControlHandler] Received message from {client_addr}: {msg_type}")
+                for key, events in self.selector.select(timeout=0.5):
+                    if key.data is None:
+                        self._accept(listen_socket)
+                        continue
                     
-                    self.process_message(client_socket, msg)
-                except socket.timeout:
-                    continue  # Continue on timeout
-                except (ConnectionResetError, ConnectionAbortedError, OSError) as e:
-                    print(f"[ControlHandler] Connection error with client {client_addr}: {e}")
-                    break
-        
-        except Exception as e:
-            print(f"[ControlHandler] Error handling client {client_addr}: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        finally:
-            # Broadcast that participant left (if they were in a meeting)
-            # This ensures others are notified even if the client crashed/disconnected abruptly
-            client_info = self.meeting_manager.get_client_info(client_socket)
-            if client_info:
-                meeting_code = client_info.get('meeting')
-                participant_name = client_info.get('name')
+                    connection = key.data
+                    if connection.zc_inflight:
+                        self._reap_zerocopy(connection)
+                    if events & selectors.EVENT_WRITE and not connection.closed:
+                        self._flush(connection)
+                    if events & selectors.EVENT_READ and not connection.closed:
+                        self._read(connection)
+                    self._close_failed()
                 
-                if meeting_code and participant_name:
-                    self.broadcast_to_meeting(
-                        meeting_code,
-                        MSG_PARTICIPANT_LEFT,
-                        participant_name=participant_name,
-                        exclude_socket=client_socket
-                    )
-
-            # Clean up when client disconnects
-            self.meeting_manager.leave_meeting(client_socket)
-            try:
-                client_socket.close()
-            except:
-                pass
-            print(f"[ControlHandler] Client {client_addr} disconnected")
+                # Everything queued while handling this pass's events goes out now,
+                # one writev per client instead of one TCP segment per message
+                self._flush_pending()
+                self._close_failed()
+        finally:
+            for connection in list(self.connections.values()):
+                self._close(connection)
+            self.selector.close()
     
-    def process_message(self, client_socket, msg):
-        """Process incoming message from client"""
-        msg_type = msg.get('type')
-        
-        if msg_type == MSG_CREATE_MEETING:
-            self.handle_create_meeting(client_socket, msg)
-        
-        elif msg_type == MSG_REQUEST_JOIN:
-            self.handle_request_join(client_socket, msg)
-        
-        elif msg_type == MSG_ALLOW_JOIN:
-            self.handle_allow_join(client_socket, msg)
-        
-        elif msg_type == MSG_DENY_JOIN:
-            self.handle_deny_join(client_socket, msg)
+    def _accept(self, listen_socket):
+        """Accept one pending client"""
+        try:
+            client_socket, client_addr = listen_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            if self.running:
+                print(f"[ControlHandler] Error accepting connection: {e}")
+            return
         
-        elif msg_type == MSG_CHAT:
-            self.handle_chat(client_socket, msg)
+        if len(self.connections) >= self.max_clients:
+            self._reject(client_socket, client_addr)
+            return
         
-        elif msg_type == MSG_FILE_START:
-            self.handle_file_start(client_socket, msg)
+        if self.configure_socket:
+            self.configure_socket(client_socket)
+        self.handle_client(client_socket, client_addr)
+    
+    def _reject(self, client_socket, client_addr):
+        """Turn away a client because the server is at max_clients"""
+        print(f"[ControlHandler] Rejecting {client_addr}: {self.max_clients} clients connected")
+        try:
+            # Best effort and never blocking: a flood of connections mustn't stall the loop
+            client_socket.setblocking(False)
+            client_socket.send(pack_tcp_message(MSG_JOIN_REJECTED, reason="Server is full"))
+        except OSError:
+            pass
+        client_socket.close()
+    
+    def handle_client(self, client_socket, client_addr):
+        """Start serving a newly connected client"""
+        print(f"[ControlHandler] Client connected from {client_addr}")
         
-        elif msg_type == MSG_FILE_CHUNK:
-            self.handle_file_chunk(client_socket, msg)
+        # Configure socket
+        client_socket.setblocking(False)
+        client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)  # Enable keepalive
+        if hasattr(socket, 'TCP_NODELAY'):
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Small messages go out immediately
+        self._quickack(client_socket)
         
-        elif msg_type == MSG_FILE_ACK:
-            self.handle_file_ack(client_socket, msg)
+        connection = Connection(client_socket, client_addr)
+        if ZEROCOPY_SUPPORTED:
+            try:
+                client_socket.setsockopt(socket.SOL_SOCKET, SO_ZEROCOPY, 1)
+                connection.zerocopy = True
+            except OSError:
+                pass  # Kernel older than 4.14
+        self.connections[client_socket] = connection
+        self.selector.register(client_socket, selectors.EVENT_READ, connection)
+    
+    def _read(self, connection):
+        """Read what the client sent and process every complete message"""
+        client_socket = connection.socket
+        client_addr = connection.addr
+        try:
+            count = client_socket.recv_into(self.recv_view)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print(f"[ControlHandler] Connection error with client {client_addr}: {e}")
+            self._close(connection)
+            return
         
-        elif msg_type == MSG_FILE_END:
-            self.handle_file_end(client_socket, msg)
+        if not count:
+            print(f"[ControlHandler] Client {client_addr} connection closed")
+            self._close(connection)
+            return
         
-        elif msg_type == MSG_VIDEO_STATS:
-            self.handle_video_stats(client_socket, msg)
+        # The kernel drops back to delayed ACKs after a receive, so re-arm
+        self._quickack(client_socket)
         
-        elif msg_type == MSG_LEAVE:
-            self.handle_leave(client_socket, msg)
+        data = self.recv_view[:count]
+        try:
+            if connection.inbox:
+                # Finish the partial message left over from the last read
+                connection.inbox += data
+                messages = unpack_tcp_messages(connection.inbox)
+            else:
+                messages, consumed = parse_tcp_messages(data)
+                connection.inbox += data[consumed:]
+        except Exception as e:
+            print(f"[ControlHandler] Malformed message from {client_addr}: {e}")
+            self._close(connection)
+            return
         
-        elif msg_type == MSG_HEARTBEAT:
-            self.handle_heartbeat(client_socket, msg)
+        for msg in messages:
+            msg_type = msg.get('type')
+            
+            # Per-message logging is debug only (server --verbose); the check keeps the
+            # formatting off the relay path otherwise
+            if logger.isEnabledFor(logging.DEBUG):
+                if msg_type in (MSG_VIDEO_STATS, MSG_FILE_CHUNK):  # Frequent or bulky
+                    logger.debug("[ControlHandler] Received message from %s: %s", client_addr, msg_type)
+                else:
+                    logger.debug("[ControlHandler] Received message from %s: %s", client_addr, msg)
+            
+            try:
+                self.process_message(client_socket, msg)
+            except Exception as e:
+                print(f"[ControlHandler] Error handling client {client_addr}: {e}")
+                import traceback
+                traceback.print_exc()
+                self._close(connection)
+            
+            if connection.closed:
+                break
+    
+    def send(self, client_socket, message, flush_now=False):
+        """
+        Queue a packed message for a client; it is written at the end of the current
+        event loop pass, or immediately with flush_now (latency-sensitive replies)
+        """
+        self.send_buffers(client_socket, (message,), flush_now)
+    
+    def send_buffers(self, client_socket, buffers, flush_now=False):
+        """Queue one message given as consecutive buffers; they go out in one writev, uncopied"""
+        connection = self.connections.get(client_socket)
+        if connection is None or connection.closed:
+            return
+        for buffer in buffers:
+            connection.outbox.append(memoryview(buffer))
+            connection.queued += len(buffer)
+        if flush_now or connection.queued >= FLUSH_THRESHOLD:
+            self._flush(connection)
+        else:
+            self.pending[connection] = None
+    
+    def _flush_pending(self):
+        """Write out every connection with held messages"""
+        while self.pending:
+            connection, _ = self.pending.popitem()
+            if not connection.closed:
+                self._flush(connection)
+    
+    def _flush(self, connection):
+        """Write queued bytes without blocking; wait for EVENT_WRITE if some are left over"""
+        self.pending.pop(connection, None)
+        connection.queued = 0
+        outbox = connection.outbox
+        while outbox:
+            # Gather queued messages into one writev instead of one send each
+            buffers = list(islice(outbox, SEND_BATCH)) if HAS_SENDMSG else [outbox[0]]
+            try:
+                if HAS_SENDMSG:
+                    sent = self._sendmsg(connection, buffers)
+                else:
+                    sent = connection.socket.send(buffers[0])
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                print(f"[ControlHandler] Failed to send to {connection.addr}: {e}")
+                # Closing here could recurse through the leave broadcast; defer it
+                outbox.clear()
+                self.failed.append(connection)
+                return
+            
+            # Drop what went out; a partly sent message keeps its unsent tail
+            offered = sum(len(buffer) for buffer in buffers)
+            while sent:
+                head = outbox[0]
+                if sent < len(head):
+                    outbox[0] = head[sent:]
+                    break
+                sent -= len(head)
+                outbox.popleft()
+            if sent < offered:
+                break  # Socket buffer is full
+        
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if connection.outbox else selectors.EVENT_READ
+        if events != connection.events:
+            connection.events = events
+            self.selector.modify(connection.socket, events, connection)
+    
+    def _sendmsg(self, connection, buffers):
+        """One sendmsg of buffers, zero-copy when one of them is large enough to be worth it"""
+        if not (connection.zerocopy and any(len(buffer) >= ZEROCOPY_MIN for buffer in buffers)):
+            return connection.socket.sendmsg(buffers)
         
-        elif msg_type == MSG_REGISTER_UDP:
-            self.handle_register_udp(client_socket, msg)
+        try:
+            sent = connection.socket.sendmsg(buffers, (), MSG_ZEROCOPY)
+        except OSError as e:
+            if e.errno != errno.ENOBUFS:
+                raise
+            # Too many pages pinned already (optmem limit); copy this one
+            return connection.socket.sendmsg(buffers)
+        
+        # The kernel reads these pages after sendmsg returns: keep them alive until it
+        # reports the send complete
+        connection.zc_inflight.append((connection.zc_seq, buffers))
+        connection.zc_seq = (connection.zc_seq + 1) & 0xffffffff
+        return sent
+    
+    def _reap_zerocopy(self, connection):
+        """Release buffers of zero-copy sends the kernel has finished with"""
+        inflight = connection.zc_inflight
+        while inflight:
+            try:
+                _, ancdata, _, _ = connection.socket.recvmsg(0, socket.CMSG_SPACE(SOCK_EXTENDED_ERR.size),
+                                                             socket.MSG_ERRQUEUE)
+            except OSError:
+                return  # Error queue empty (EAGAIN) or socket gone
+            
+            for _, _, data in ancdata:
+                if len(data) < SOCK_EXTENDED_ERR.size:
+                    continue
+                _, origin, _, code, _, first, last = SOCK_EXTENDED_ERR.unpack_from(data)
+                if origin != SO_EE_ORIGIN_ZEROCOPY:
+                    continue
+                # Completions cover sends first..last, oldest first (sequence numbers wrap at 2^32)
+                while inflight and (last - inflight[0][0]) & 0xffffffff < 0x80000000:
+                    inflight.popleft()
+                if code & SO_EE_CODE_ZEROCOPY_COPIED:
+                    # The kernel copied anyway (e.g. loopback or no NIC support): stop paying for pinning
+                    connection.zerocopy = False
+    
+    def _close_failed(self):
+        """Close connections whose sends failed"""
+        while self.failed:
+            self._close(self.failed.pop())
+    
+    def _close(self, connection):
+        """Tear down a client connection and tell its meeting"""
+        if connection.closed:
+            return
+        connection.closed = True
+        client_socket = connection.socket
         
-        elif msg_type == MSG_CAMERA_STATUS:
-            print(f"[ControlHandler] ===== CAMERA_STATUS MESSAGE RECEIVED =====")
-            self.handle_camera_status(client_socket, msg)
-            print(f"[ControlHandler] ===== CAMERA_STATUS HANDLER COMPLETED =====")
+        # Broadcast that participant left (if they were in a meeting)
+        # This ensures others are notified even if the client crashed/disconnected abruptly
+        client_info = self.meeting_manager.get_client_info(client_socket)
+        if client_info:
+            meeting_code = client_info.get('meeting')
+            participant_name = client_info.get('name')
+            
+            if meeting_code and participant_name:
+                self.broadcast_to_meeting(
+                    meeting_code,
+                    MSG_PARTICIPANT_LEFT,
+                    participant_name=participant_name,
+                    exclude_socket=client_socket
+                )
         
-        else:
+        # Clean up when client disconnects
+        self.meeting_manager.leave_meeting(client_socket)
+        self.connections.pop(client_socket, None)
+        try:
+            self.selector.unregister(client_socket)
+        except (KeyError, ValueError):
+            pass
+        try:
+            client_socket.close()
+        except:
+            pass
+        print(f"[ControlHandler] Client {connection.addr} disconnected")
+    
+    def process_message(self, client_socket, msg):
+        """Process incoming message from client"""
+        msg_type = msg.get('type')
+        handler = self.handlers.get(msg_type)
+        if handler is None:
             print(f"[ControlHandler] Unknown message type: {msg_type}")
+            return
+        
+        # Looked up once here and handed to every handler
+        handler(client_socket, msg, self.meeting_manager.get_client_info(client_socket))
     
-    def handle_create_meeting(self, client_socket, msg):
+    def handle_create_meeting(self, client_socket, msg, client_info):
         """Handle CREATE_MEETING request"""
         host_name = msg.get('name', 'Unknown')
         meeting_code = self.meeting_manager.create_meeting(client_socket, host_name)
         
-        response = pack_tcp_message(MSG_MEETING_CREATED, meeting_code=meeting_code)
-        client_socket.sendall(response)
+        # The handle tags the client's UDP packets so the relay knows who sent them
+        response = pack_tcp_message(MSG_MEETING_CREATED, meeting_code=meeting_code,
+                                    client_handle=self.meeting_manager.get_client_info(client_socket)['handle'])
+        self.send(client_socket, response)
     
-    def handle_request_join(self, client_socket, msg):
+    def handle_request_join(self, client_socket, msg, client_info):
         """Handle REQUEST_JOIN request"""
         meeting_code = msg.get('meeting_code')
         client_name = msg.get('name', 'Unknown')
@@ -151,34 +433,27 @@ class ControlHandler:
                 notify_msg = pack_tcp_message(
                     MSG_NEW_JOIN_REQUEST,
                     client_name=client_name,
-                    client_socket_id=id(client_socket)
+                    client_handle=self.meeting_manager.get_client_info(client_socket)['handle']
                 )
-                try:
-                    host_socket.sendall(notify_msg)
-                except:
-                    pass
+                self.send(host_socket, notify_msg)
             
             # Send pending response to requester
             response = pack_tcp_message(MSG_JOIN_PENDING, message=message)
-            client_socket.sendall(response)
+            self.send(client_socket, response)
         else:
             response = pack_tcp_message(MSG_JOIN_REJECTED, reason=message)
-            client_socket.sendall(response)
+            self.send(client_socket, response)
+    
+    def _find_waiting(self, meeting_code, msg):
+        """Socket of the waiting client an ALLOW/DENY_JOIN names: by client_handle, else by client_name"""
+        client_handle = msg.get('client_handle')
+        if client_handle is not None:
+            return self.meeting_manager.find_waiting_by_handle(meeting_code, client_handle)
+        return self.meeting_manager.find_waiting_by_name(meeting_code, msg.get('client_name'))
     
-    def handle_allow_join(self, client_socket, msg):
+    def handle_allow_join(self, client_socket, msg, client_info):
         """Handle ALLOW_JOIN request from host"""
-        # Find the waiting client socket by ID (simplified, in production use better identifier)
-        waiting_clients = self.meeting_manager.get_waiting_list(
-            self.meeting_manager.get_client_info(client_socket)['meeting']
-        )
-        
-        allowed_client_name = msg.get('client_name')
-        allowed_socket = None
-        
-        for waiting_client in waiting_clients:
-            if waiting_client['name'] == allowed_client_name:
-                allowed_socket = waiting_client['socket']
-                break
+        allowed_socket = self._find_waiting(client_info['meeting'], msg)
         
         if allowed_socket:
             success = self.meeting_manager.allow_join(allowed_socket)
@@ -187,15 +462,12 @@ class ControlHandler:
                 meeting_code = client_info['meeting']
                 
                 # Send JOIN_ACCEPTED to the new participant
-                response = pack_tcp_message(MSG_JOIN_ACCEPTED)
-                try:
-                    allowed_socket.sendall(response)
-                except:
-                    pass
+                response = pack_tcp_message(MSG_JOIN_ACCEPTED, client_handle=client_info['handle'])
+                self.send(allowed_socket, response, flush_now=True)
                 
                 # Send list of EXISTING participants to the new joiner
                 # Send list of EXISTING participants to the new joiner
-                participants = self.meeting_manager.get_meeting_participants(meeting_code)
+                participants = self.meeting_manager.snapshot_participants(meeting_code)
                 for participant_socket in participants:
                     if participant_socket != allowed_socket:  # Don't send their own name
                         participant_info = self.meeting_manager.get_client_info(participant_socket)
@@ -205,10 +477,7 @@ class ControlHandler:
                                 participant_name=participant_info['name'],
                                 is_host=participant_info.get('is_host', False)
                             )
-                            try:
-                                allowed_socket.sendall(existing_msg)
-                            except:
-                                pass
+                            self.send(allowed_socket, existing_msg)
                 
                 # Broadcast to ALL participants (including new joiner) that someone joined
                 self.broadcast_to_meeting(
@@ -218,29 +487,17 @@ class ControlHandler:
                     is_host=client_info.get('is_host', False)
                 )
     
-    def handle_deny_join(self, client_socket, msg):
+    def handle_deny_join(self, client_socket, msg, client_info):
         """Handle DENY_JOIN request from host"""
-        denied_client_name = msg.get('client_name')
-        meeting_code = self.meeting_manager.get_client_info(client_socket)['meeting']
-        waiting_clients = self.meeting_manager.get_waiting_list(meeting_code)
-        
-        denied_socket = None
-        for waiting_client in waiting_clients:
-            if waiting_client['name'] == denied_client_name:
-                denied_socket = waiting_client['socket']
-                break
+        denied_socket = self._find_waiting(client_info['meeting'], msg)
         
         if denied_socket:
             self.meeting_manager.deny_join(denied_socket)
             response = pack_tcp_message(MSG_JOIN_REJECTED, reason="Host denied your request")
-            try:
-                denied_socket.sendall(response)
-            except:
-                pass
+            self.send(denied_socket, response)
     
-    def handle_chat(self, client_socket, msg):
+    def handle_chat(self, client_socket, msg, client_info):
         """Handle CHAT message"""
-        client_info = self.meeting_manager.get_client_info(client_socket)
         if not client_info:
             return
         
@@ -252,7 +509,7 @@ class ControlHandler:
         
         if target_name and target_name != "Everyone":
             # Private message
-            participants = self.meeting_manager.get_meeting_participants(meeting_code)
+            participants = self.meeting_manager.snapshot_participants(meeting_code)
             target_socket = None
             
             # Find target socket
@@ -271,18 +528,12 @@ class ControlHandler:
                     is_private=True,
                     recipient=target_name 
                 )
-                try:
-                    target_socket.sendall(msg_to_target)
-                except:
-                    pass
+                self.send(target_socket, msg_to_target)
                 
                 # Send back to sender (so they see it too)
                 # We format it slightly differently or let client handle it
                 # For simplicity, let's send same msg to sender but client knows they sent it
-                try:
-                    client_socket.sendall(msg_to_target)
-                except:
-                    pass
+                self.send(client_socket, msg_to_target)
         else:
             # Broadcast to all participants in the meeting
             self.broadcast_to_meeting(
@@ -293,18 +544,25 @@ class ControlHandler:
                 is_private=False
             )
     
-    def forward_file_message(self, client_socket, msg, msg_type_out):
+    def forward_file_message(self, client_socket, msg, client_info, msg_type_out):
         """Helper to forward file messages to target or broadcast"""
-        client_info = self.meeting_manager.get_client_info(client_socket)
         if not client_info:
             return
             
         meeting_code = client_info['meeting']
         target_name = msg.get('target_name')
         
+        fields = {k: v for k, v in msg.items() if k != 'type'}
+        fields['sender_name'] = client_info['name']
+        # A file chunk's data is relayed as received: only a new header is packed,
+        # and every recipient is queued that header plus the same data object
+        parts = pack_file_chunk_parts(msg_type_out, **fields) if msg_type_out in FILE_CHUNK_KINDS else None
+        if parts is None:
+            parts = (pack_tcp_message(msg_type_out, **fields),)
+        
         if target_name and target_name != "Everyone":
             # Private forwarding
-            participants = self.meeting_manager.get_meeting_participants(meeting_code)
+            participants = self.meeting_manager.snapshot_participants(meeting_code)
             target_socket = None
             for p_socket in participants:
                 p_info = self.meeting_manager.get_client_info(p_socket)
@@ -313,60 +571,44 @@ class ControlHandler:
                     break
             
             if target_socket:
-                start_msg = pack_tcp_message(
-                    msg_type_out,
-                    sender_name=client_info['name'],
-                    **{k:v for k,v in msg.items() if k != 'type'}
-                )
-                try:
-                    target_socket.sendall(start_msg)
-                except:
-                    pass
+                self.send_buffers(target_socket, parts)
         else:
             # Broadcast
-            self.broadcast_to_meeting(
-                meeting_code,
-                msg_type_out,
-                sender_name=client_info['name'],
-                exclude_socket=client_socket,
-                **{k:v for k,v in msg.items() if k != 'type'}
-            )
+            self.broadcast_buffers(meeting_code, parts, exclude_socket=client_socket)
 
-    def handle_file_start(self, client_socket, msg):
+    def handle_file_start(self, client_socket, msg, client_info):
         """Handle FILE_START message"""
-        self.forward_file_message(client_socket, msg, MSG_FILE_START_NOTIFY)
+        self.forward_file_message(client_socket, msg, client_info, MSG_FILE_START_NOTIFY)
     
-    def handle_file_chunk(self, client_socket, msg):
+    def handle_file_chunk(self, client_socket, msg, client_info):
         """Handle FILE_CHUNK message"""
         chunk_id = msg.get('chunk_id')
         # print(f"[ControlHandler] Forwarding chunk {chunk_id} from {client_socket.getpeername()}") 
-        self.forward_file_message(client_socket, msg, MSG_FILE_CHUNK_FORWARD)
+        self.forward_file_message(client_socket, msg, client_info, MSG_FILE_CHUNK_FORWARD)
     
-    def handle_file_end(self, client_socket, msg):
+    def handle_file_end(self, client_socket, msg, client_info):
         """Handle FILE_END message"""
-        self.forward_file_message(client_socket, msg, MSG_FILE_END_NOTIFY)
+        self.forward_file_message(client_socket, msg, client_info, MSG_FILE_END_NOTIFY)
     
-    def handle_file_ack(self, client_socket, msg):
+    def handle_file_ack(self, client_socket, msg, client_info):
         """Handle FILE_ACK message"""
         # Forward ACK back to the sender
-        self.forward_file_message(client_socket, msg, MSG_FILE_ACK)
+        self.forward_file_message(client_socket, msg, client_info, MSG_FILE_ACK)
     
-    def handle_video_stats(self, client_socket, msg):
+    def handle_video_stats(self, client_socket, msg, client_info):
         """Handle VIDEO_STATS from receiver"""
         # Stats from receiver about video quality
         # Can be forwarded to sender for adaptive streaming
-        client_info = self.meeting_manager.get_client_info(client_socket)
         if not client_info:
             return
         
         # Forward stats update (implementation depends on architecture)
         # For now, just log
-        print(f"[ControlHandler] Video stats from {client_info['name']}: "
-              f"loss={msg.get('loss')}%, rtt={msg.get('rtt')}ms")
+        logger.debug("[ControlHandler] Video stats from %s: loss=%s%%, rtt=%sms",
+                     client_info['name'], msg.get('loss'), msg.get('rtt'))
     
-    def handle_leave(self, client_socket, msg):
+    def handle_leave(self, client_socket, msg, client_info):
         """Handle LEAVE message"""
-        client_info = self.meeting_manager.get_client_info(client_socket)
         if client_info:
             meeting_code = client_info['meeting']
             participant_name = client_info['name']
@@ -381,24 +623,19 @@ class ControlHandler:
         
         self.meeting_manager.leave_meeting(client_socket)
     
-    def handle_heartbeat(self, client_socket, msg):
+    def handle_heartbeat(self, client_socket, msg, client_info):
         """Handle HEARTBEAT message - echo back timestamp for RTT calculation"""
         timestamp = msg.get('timestamp', 0)
         # print(f"[ControlHandler] Received message from {client_socket.getpeername()}: HEARTBEAT")
         response = pack_tcp_message(MSG_HEARTBEAT_ACK, timestamp=timestamp)
-        try:
-            client_socket.sendall(response)
-        except:
-            pass
+        # Sent right away: the client measures RTT from it
+        self.send(client_socket, response, flush_now=True)
     
-    def handle_register_udp(self, client_socket, msg):
+    def handle_register_udp(self, client_socket, msg, client_info):
         """Handle REGISTER_UDP - register client's UDP receiving ports"""
-        print(f"[ControlHandler] handle_register_udp called")
         video_port = msg.get('video_port')
         audio_port = msg.get('audio_port')
-        print(f"[ControlHandler] Received UDP registration - video_port: {video_port}, audio_port: {audio_port}")
         
-        client_info = self.meeting_manager.get_client_info(client_socket)
         if client_info:
             # Get client's IP from TCP socket
             client_ip = client_socket.getpeername()[0]
@@ -411,16 +648,15 @@ class ControlHandler:
         else:
             print(f"[ControlHandler] No client info found for socket")
     
-    def handle_camera_status(self, client_socket, msg):
+    def handle_camera_status(self, client_socket, msg, client_info):
         """Handle CAMERA_STATUS - broadcast camera on/off status to other participants"""
         enabled = msg.get('enabled', True)
         
-        client_info = self.meeting_manager.get_client_info(client_socket)
         if client_info:
             client_name = client_info.get('name', 'Unknown')
             meeting_code = client_info.get('meeting')  # Fixed: changed 'meeting_code' to 'meeting'
             
-            print(f"[ControlHandler] Camera status from {client_name}: {'ON' if enabled else 'OFF'}")
+            logger.debug("[ControlHandler] Camera status from %s: %s", client_name, 'ON' if enabled else 'OFF')
             
             # Broadcast to all other participants in the meeting
             if meeting_code:
@@ -431,21 +667,20 @@ class ControlHandler:
                     participant_name=client_name,
                     enabled=enabled
                 )
-                print(f"[ControlHandler] Camera status broadcast to meeting {meeting_code}")
         else:
             print(f"[ControlHandler] Camera status received but no client info found")
     
     def broadcast_to_meeting(self, meeting_code, msg_type, exclude_socket=None, **kwargs):
         """Broadcast a message to all participants in a meeting"""
-        participants = self.meeting_manager.get_meeting_participants(meeting_code)
-        message = pack_tcp_message(msg_type, **kwargs)
+        self.broadcast_buffers(meeting_code, (pack_tcp_message(msg_type, **kwargs),), exclude_socket)
+    
+    def broadcast_buffers(self, meeting_code, buffers, exclude_socket=None):
+        """Queue an already packed message (see send_buffers) for every participant in a meeting"""
+        participants = self.meeting_manager.snapshot_participants(meeting_code)
         
         for participant_socket in participants:
             if participant_socket != exclude_socket:
-                try:
-                    participant_socket.sendall(message)
-                except Exception as e:
-                    print(f"[ControlHandler] Failed to send to participant: {e}")
+                self.send_buffers(participant_socket, buffers)
     
     def stop(self):
         """Stop the control handler"""
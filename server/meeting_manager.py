@@ -1,22 +1,34 @@
 """
 Meeting Manager - Handles meeting state and participant management
 """
+import itertools
 import random
 import string
 import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 
 class MeetingManager:
     """Manages all meetings, participants, and join requests"""
     
     def __init__(self):
+        # Coarse lock, held only for compound changes that add or remove meetings
+        # (create_meeting, leave_meeting); each meeting's own lists are guarded by its
+        # 'lock', so meetings never wait on each other.
+        # Read-only lookups (get_client_info, get_host_socket, get_meeting_info, is_host)
+        # take no lock: a single-key dict get or set is atomic under the GIL, and every
+        # compound update either builds a new object or holds a lock. A free-threaded
+        # (no-GIL) build would need those reads to take self.lock too
         self.lock = threading.Lock()
         
         # meetings = {
         #     "<meeting_code>": {
         #         "host": <client_socket>,
         #         "participants": [<client_socket>, ...],
-        #         "waiting": [<client_socket>, ...]
+        #         "snapshot": (<client_socket>, ...),  # immutable copy, replaced on every change
+        #         "waiting": OrderedDict(<client_socket>: "name", ...),  # arrival order
+        #         "waiting_names": {"name": [<client_socket>, ...], ...},  # same requests by name
+        #         "lock": <RLock>  # guards this meeting's lists
         #     }
         # }
         self.meetings: Dict[str, Dict] = {}
@@ -26,44 +38,56 @@ class MeetingManager:
         #         "name": "Jony",
         #         "meeting": "482913",
         #         "is_host": True/False,
+        #         "handle": 7,
         #         "udp_addr": (ip, port)
         #     }
         # }
         self.client_info: Dict = {}
         
+        # Small integer handles naming clients on the wire (join requests, UDP packet
+        # senders); unlike id(socket) they are never reused while the server runs
+        self.next_handle = itertools.count(1)
+        self.handle_sockets: Dict[int, object] = {}  # handle -> client_socket
+        
+        # UDP relay lookup: (kind, sender_socket) -> (addr, ...) the relay sends a packet to,
+        # built on first use; replaced by an empty dict whenever a client or registration changes
+        self.relay_targets_cache: Dict = {}
+        
         # Socket to address mapping for reverse lookup
         self.socket_to_addr: Dict = {}
     
     def generate_meeting_code(self) -> str:
-        """Generate a random 6-digit meeting code"""
+        """Generate an unused random 6-digit meeting code (caller holds the lock)"""
         while True:
             code = ''.join(random.choices(string.digits, k=6))
-            with self.lock:
-                if code not in self.meetings:
-                    return code
+            if code not in self.meetings:
+                return code
     
     def create_meeting(self, host_socket, host_name: str) -> str:
         """
         Create a new meeting with the given host
         Returns: meeting_code
         """
-        meeting_code = self.generate_meeting_code()
-        
         with self.lock:
+            # Picked and claimed under one hold, so two hosts can't get the same code
+            meeting_code = self.generate_meeting_code()
             self.meetings[meeting_code] = {
                 'host': host_socket,
                 'participants': [host_socket],
-                'waiting': []
+                'snapshot': (host_socket,),
+                'waiting': OrderedDict(),
+                'waiting_names': {},
+                'lock': threading.RLock()
             }
             
-            self.client_info[host_socket] = {
+            self._set_client_info(host_socket, {
                 'name': host_name,
                 'meeting': meeting_code,
                 'is_host': True,
                 'is_host': True,
                 'video_addr': None,
                 'audio_addr': None
-            }
+            })
         
         print(f"[MeetingManager] Meeting {meeting_code} created by {host_name}")
         return meeting_code
@@ -73,25 +97,27 @@ class MeetingManager:
         Request to join a meeting
         Returns: (success, message)
         """
-        with self.lock:
-            if meeting_code not in self.meetings:
+        meeting = self.meetings.get(meeting_code)
+        if not meeting:
+            return False, "Meeting not found"
+        
+        with meeting['lock']:
+            # The host may have closed it while we waited for the lock
+            if self.meetings.get(meeting_code) is not meeting:
                 return False, "Meeting not found"
             
-            meeting = self.meetings[meeting_code]
-            
             # Add to waiting list
-            if client_socket not in meeting['waiting']:
-                meeting['waiting'].append(client_socket)
+            self._add_waiting(meeting, client_socket, client_name)
             
             # Store client info
-            self.client_info[client_socket] = {
+            self._set_client_info(client_socket, {
                 'name': client_name,
                 'meeting': meeting_code,
                 'is_host': False,
                 'is_host': False,
                 'video_addr': None,
                 'audio_addr': None
-            }
+            })
         
         print(f"[MeetingManager] {client_name} requested to join {meeting_code}")
         return True, "Join request sent to host"
@@ -101,23 +127,23 @@ class MeetingManager:
         Host allows a waiting client to join
         Returns: success
         """
-        with self.lock:
-            client_data = self.client_info.get(client_socket)
-            if not client_data:
-                return False
-            
-            meeting_code = client_data['meeting']
-            meeting = self.meetings.get(meeting_code)
-            
-            if not meeting:
-                return False
-            
+        client_data = self.client_info.get(client_socket)
+        if not client_data:
+            return False
+        
+        meeting_code = client_data['meeting']
+        meeting = self.meetings.get(meeting_code)
+        
+        if not meeting:
+            return False
+        
+        with meeting['lock']:
             # Move from waiting to participants
-            if client_socket in meeting['waiting']:
-                meeting['waiting'].remove(client_socket)
+            self._remove_waiting(meeting, client_socket)
             
             if client_socket not in meeting['participants']:
                 meeting['participants'].append(client_socket)
+                meeting['snapshot'] = tuple(meeting['participants'])
             
         print(f"[MeetingManager] {client_data['name']} joined meeting {meeting_code}")
         return True
@@ -127,23 +153,22 @@ class MeetingManager:
         Host denies a waiting client
         Returns: success
         """
-        with self.lock:
-            client_data = self.client_info.get(client_socket)
-            if not client_data:
-                return False
-            
-            meeting_code = client_data['meeting']
-            meeting = self.meetings.get(meeting_code)
-            
-            if not meeting:
-                return False
-            
+        client_data = self.client_info.get(client_socket)
+        if not client_data:
+            return False
+        
+        meeting_code = client_data['meeting']
+        meeting = self.meetings.get(meeting_code)
+        
+        if not meeting:
+            return False
+        
+        with meeting['lock']:
             # Remove from waiting list
-            if client_socket in meeting['waiting']:
-                meeting['waiting'].remove(client_socket)
+            self._remove_waiting(meeting, client_socket)
             
             # Remove client info
-            del self.client_info[client_socket]
+            self._drop_client(client_socket)
         
         print(f"[MeetingManager] Join request denied for meeting {meeting_code}")
         return True
@@ -159,89 +184,157 @@ class MeetingManager:
             meeting = self.meetings.get(meeting_code)
             
             if meeting:
-                # Remove from participants or waiting
-                if client_socket in meeting['participants']:
-                    meeting['participants'].remove(client_socket)
-                if client_socket in meeting['waiting']:
-                    meeting['waiting'].remove(client_socket)
-                
-                # If host left, close the meeting
-                if meeting['host'] == client_socket:
-                    print(f"[MeetingManager] Host left, closing meeting {meeting_code}")
-                    del self.meetings[meeting_code]
-                    # Clean up all clients in this meeting
-                    clients_to_remove = [sock for sock, info in self.client_info.items() 
-                                        if info['meeting'] == meeting_code]
-                    for sock in clients_to_remove:
-                        if sock in self.client_info:
-                            del self.client_info[sock]
-                elif len(meeting['participants']) == 0:
-                    # No participants left, clean up
-                    del self.meetings[meeting_code]
+                with meeting['lock']:
+                    # Remove from participants or waiting
+                    if client_socket in meeting['participants']:
+                        meeting['participants'].remove(client_socket)
+                        meeting['snapshot'] = tuple(meeting['participants'])
+                    self._remove_waiting(meeting, client_socket)
+                    
+                    # If host left, close the meeting
+                    if meeting['host'] == client_socket:
+                        print(f"[MeetingManager] Host left, closing meeting {meeting_code}")
+                        del self.meetings[meeting_code]
+                        # Clean up all clients in this meeting
+                        for sock in meeting['participants'] + list(meeting['waiting']):
+                            self._drop_client(sock)
+                    elif len(meeting['participants']) == 0:
+                        # No participants left, clean up
+                        del self.meetings[meeting_code]
             
             # Remove client info
-            if client_socket in self.client_info:
-                del self.client_info[client_socket]
+            self._drop_client(client_socket)
         
         print(f"[MeetingManager] Client left meeting {meeting_code}")
     
+    def _set_client_info(self, client_socket, client_data: Dict):
+        """Store a client's info under a fresh handle, retiring any earlier one"""
+        self._drop_client(client_socket)
+        client_data['handle'] = next(self.next_handle)
+        self.handle_sockets[client_data['handle']] = client_socket
+        self.client_info[client_socket] = client_data
+    
+    def _drop_client(self, client_socket):
+        """Forget a client's info and handle"""
+        client_data = self.client_info.pop(client_socket, None)
+        if client_data:
+            self.handle_sockets.pop(client_data['handle'], None)
+            # Also drops any cached targets keyed by this client as a sender
+            self.relay_targets_cache = {}
+    
+    def _add_waiting(self, meeting: Dict, client_socket, client_name: str):
+        """Queue a join request (caller holds the meeting's lock)"""
+        if client_socket in meeting['waiting']:
+            return
+        meeting['waiting'][client_socket] = client_name
+        meeting['waiting_names'].setdefault(client_name, []).append(client_socket)
+    
+    def _remove_waiting(self, meeting: Dict, client_socket):
+        """Drop a join request if there is one (caller holds the meeting's lock)"""
+        client_name = meeting['waiting'].pop(client_socket, None)
+        if client_name is None:
+            return
+        sockets = meeting['waiting_names'][client_name]
+        sockets.remove(client_socket)
+        if not sockets:
+            del meeting['waiting_names'][client_name]
+    
     def set_udp_addr(self, client_socket, udp_addr: Tuple[str, int]):
         """Set the UDP address for a client"""
-        with self.lock:
-            if client_socket in self.client_info:
-                self.client_info[client_socket]['udp_addr'] = udp_addr
+        client_data = self.client_info.get(client_socket)
+        if client_data:
+            client_data['udp_addr'] = udp_addr
     
     def get_meeting_info(self, meeting_code: str) -> Optional[Dict]:
         """Get meeting information"""
-        with self.lock:
-            return self.meetings.get(meeting_code)
+        return self.meetings.get(meeting_code)
     
     def get_client_info(self, client_socket) -> Optional[Dict]:
-        """Get client information"""
-        with self.lock:
-            return self.client_info.get(client_socket)
+        """Get client information (lock-free single-key read)"""
+        return self.client_info.get(client_socket)
     
     def update_udp_address(self, client_socket, video_addr, audio_addr):
         """Update client's UDP addresses for stream relay"""
-        with self.lock:
-            if client_socket in self.client_info:
-                self.client_info[client_socket]['video_addr'] = video_addr
-                self.client_info[client_socket]['audio_addr'] = audio_addr
-                print(f"[MeetingManager] Updated UDP addresses for client: video={video_addr}, audio={audio_addr}")
+        client_data = self.client_info.get(client_socket)
+        if client_data:
+            client_data['video_addr'] = video_addr
+            client_data['audio_addr'] = audio_addr
+            # After the new addresses are in place, so a rebuild can't pick up the old ones
+            self.relay_targets_cache = {}
+            print(f"[MeetingManager] Updated UDP addresses for client: video={video_addr}, audio={audio_addr}")
+    
+    def relay_targets(self, kind: str, sender_socket=None) -> Tuple:
+        """
+        Registered '<kind>_addr' ('video' or 'audio') addresses of every client except
+        sender_socket; cached until a registration changes
+        """
+        cache = self.relay_targets_cache
+        key = (kind, sender_socket)
+        targets = cache.get(key)
+        if targets is None:
+            field = kind + '_addr'
+            # list() copies the items in one step, so a concurrent change can't break the loop
+            targets = tuple(client_data[field] for client_socket, client_data in list(self.client_info.items())
+                            if client_data.get(field) and client_socket is not sender_socket)
+            cache[key] = targets
+        return targets
     
     def get_meeting_participants(self, meeting_code: str) -> List:
         """Get list of participant sockets in a meeting"""
-        with self.lock:
-            meeting = self.meetings.get(meeting_code)
-            if meeting:
+        meeting = self.meetings.get(meeting_code)
+        if meeting:
+            with meeting['lock']:
                 return meeting['participants'].copy()
-            return []
+        return []
+    
+    def snapshot_participants(self, meeting_code: str) -> Tuple:
+        """
+        Get the participant sockets of a meeting as a shared tuple, without locking or
+        copying; it may be a moment stale, and sends to a departed socket are dropped
+        """
+        meeting = self.meetings.get(meeting_code)
+        return meeting['snapshot'] if meeting else ()
     
     def get_waiting_list(self, meeting_code: str) -> List[Dict]:
         """Get list of waiting clients with their info"""
-        with self.lock:
-            meeting = self.meetings.get(meeting_code)
-            if not meeting:
-                return []
-            
-            waiting_info = []
-            for client_socket in meeting['waiting']:
-                client_data = self.client_info.get(client_socket)
-                if client_data:
-                    waiting_info.append({
-                        'socket': client_socket,
-                        'name': client_data['name']
-                    })
-            return waiting_info
+        meeting = self.meetings.get(meeting_code)
+        if not meeting:
+            return []
+        
+        with meeting['lock']:
+            return [{'socket': client_socket, 'name': client_name}
+                    for client_socket, client_name in meeting['waiting'].items()]
+    
+    def find_waiting_by_name(self, meeting_code: str, client_name: str):
+        """Get the socket of the earliest waiting client with this name, or None"""
+        meeting = self.meetings.get(meeting_code)
+        if not meeting:
+            return None
+        
+        with meeting['lock']:
+            sockets = meeting['waiting_names'].get(client_name)
+            return sockets[0] if sockets else None
+    
+    def get_socket_by_handle(self, handle: int):
+        """Get the client socket a handle names, or None"""
+        return self.handle_sockets.get(handle)
+    
+    def find_waiting_by_handle(self, meeting_code: str, handle: int):
+        """Get the socket of the client with this handle if it is waiting to join the meeting, or None"""
+        client_socket = self.handle_sockets.get(handle)
+        meeting = self.meetings.get(meeting_code)
+        if client_socket is None or not meeting:
+            return None
+        
+        with meeting['lock']:
+            return client_socket if client_socket in meeting['waiting'] else None
     
     def is_host(self, client_socket) -> bool:
         """Check if client is a host"""
-        with self.lock:
-            client_data = self.client_info.get(client_socket)
-            return client_data.get('is_host', False) if client_data else False
+        client_data = self.client_info.get(client_socket)
+        return client_data.get('is_host', False) if client_data else False
     
     def get_host_socket(self, meeting_code: str):
         """Get the host socket for a meeting"""
-        with self.lock:
-            meeting = self.meetings.get(meeting_code)
-            return meeting['host'] if meeting else None
+        meeting = self.meetings.get(meeting_code)
+        return meeting['host'] if meeting else None
@@ -6,25 +6,58 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import logging
 import socket
 import threading
 from meeting_manager import MeetingManager
-from control_handler import ControlHandler
+from control_handler import ControlHandler, MAX_CLIENTS
 from stream_relay_udp import StreamRelayUDP
 from congestion_control import FileManager
 
+NOTSENT_LOWAT = 128 * 1024  # bytes
+LISTEN_BACKLOG = 1024  # Pending connections the kernel queues while the event loop catches up
+
+def default_socket_options():
+    """Default setsockopt tuples for control sockets, each where the platform has it"""
+    # Nagle off: the channel is mostly small request/response messages
+    options = []
+    if hasattr(socket, 'TCP_NODELAY'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1))
+    if hasattr(socket, 'TCP_QUICKACK'):
+        # Linux only; not sticky, ControlHandler re-arms it after every message
+        options.append((socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1))
+    if hasattr(socket, 'TCP_NOTSENT_LOWAT'):
+        # Bound bytes queued but not yet sent, so control messages don't wait behind a
+        # file-chunk backlog; buffer autotuning keeps working, unlike a fixed SO_SNDBUF
+        options.append((socket.IPPROTO_TCP, socket.TCP_NOTSENT_LOWAT, NOTSENT_LOWAT))
+    return options
+
+def buffer_socket_options(sndbuf=0, rcvbuf=0):
+    """Fixed SO_SNDBUF/SO_RCVBUF tuples (0 = leave to kernel autotuning). Setting a size
+    turns autotuning off for that socket, so size it to the path's bandwidth-delay product"""
+    options = []
+    if sndbuf:
+        options.append((socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf))
+    if rcvbuf:
+        options.append((socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf))
+    return options
+
 class Server:
     """Main server class"""
     
-    def __init__(self, tcp_host='0.0.0.0', tcp_port=5000, udp_port=5001):
+    def __init__(self, tcp_host='0.0.0.0', tcp_port=5000, udp_port=5001, socket_options=None,
+                 max_clients=MAX_CLIENTS):
         self.tcp_host = tcp_host
         self.tcp_port = tcp_port
         self.udp_port = udp_port
+        # (level, option, value) tuples set on the listener (before listen, so accepted
+        # sockets inherit them) and again on every accepted control socket
+        self.socket_options = default_socket_options() if socket_options is None else list(socket_options)
         
         # Core components
         self.meeting_manager = MeetingManager()
         self.file_manager = FileManager()
-        self.control_handler = ControlHandler(self.meeting_manager, self.file_manager)
+        self.control_handler = ControlHandler(self.meeting_manager, self.file_manager, max_clients)
         self.stream_relay = StreamRelayUDP(self.meeting_manager, udp_port)
         
         # Sockets
@@ -45,8 +78,9 @@ class Server:
         # Start TCP control server
         self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._apply_socket_options(self.tcp_socket)
         self.tcp_socket.bind((self.tcp_host, self.tcp_port))
-        self.tcp_socket.listen(10)
+        self.tcp_socket.listen(LISTEN_BACKLOG)
         
         print(f"[Server] TCP control server listening on {self.tcp_host}:{self.tcp_port}")
         print(f"[Server] Server is ready! Waiting for clients...")
@@ -55,21 +89,8 @@ class Server:
         self.running = True
         
         try:
-            while self.running:
-                try:
-                    client_socket, client_addr = self.tcp_socket.accept()
-                    
-                    # Handle each client in a separate thread
-                    client_thread = threading.Thread(
-                        target=self.control_handler.handle_client,
-                        args=(client_socket, client_addr),
-                        daemon=True
-                    )
-                    client_thread.start()
-                
-                except Exception as e:
-                    if self.running:
-                        print(f"[Server] Error accepting connection: {e}")
+            # Every client is served from this thread by the control handler's event loop
+            self.control_handler.serve(self.tcp_socket, configure_socket=self._apply_socket_options)
         
         except KeyboardInterrupt:
             print("\n[Server] Shutting down...")
@@ -77,6 +98,14 @@ class Server:
         finally:
             self.stop()
     
+    def _apply_socket_options(self, sock):
+        """Set the configured socket options; each one is best effort"""
+        for level, option, value in self.socket_options:
+            try:
+                sock.setsockopt(level, option, value)
+            except OSError as e:
+                print(f"[Server] Could not set socket option {option}: {e}")
+    
     def stop(self):
         """Stop the server"""
         self.running = False
@@ -99,10 +128,21 @@ def main():
     parser.add_argument('--host', default='0.0.0.0', help='TCP host address (default: 0.0.0.0)')
     parser.add_argument('--tcp-port', type=int, default=5000, help='TCP control port (default: 5000)')
     parser.add_argument('--udp-port', type=int, default=5001, help='UDP streaming port (default: 5001)')
+    parser.add_argument('--sndbuf', type=int, default=0,
+                        help='Fixed TCP send buffer in bytes, e.g. the bandwidth-delay product; disables autotuning (default: autotune)')
+    parser.add_argument('--rcvbuf', type=int, default=0,
+                        help='Fixed TCP receive buffer in bytes; disables autotuning (default: autotune)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Log every control message and relay packet counts (slow under file transfers)')
+    parser.add_argument('--max-clients', type=int, default=MAX_CLIENTS,
+                        help=f'Control connections served at once; extra clients are rejected (default: {MAX_CLIENTS})')
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format='%(message)s')
     
-    server = Server(tcp_host=args.host, tcp_port=args.tcp_port, udp_port=args.udp_port)
+    socket_options = default_socket_options() + buffer_socket_options(args.sndbuf, args.rcvbuf)
+    server = Server(tcp_host=args.host, tcp_port=args.tcp_port, udp_port=args.udp_port,
+                    socket_options=socket_options, max_clients=args.max_clients)
     server.start()
 
 if __name__ == '__main__':
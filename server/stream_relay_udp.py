@@ -5,9 +5,24 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import itertools
+import logging
+import queue
+import select
 import socket
 import threading
+import time
 from common.protocol import *
+from common.udp_batch import BatchReceiver, FanoutSender, recvmmsg_available, sendmmsg_available
+
+logger = logging.getLogger(__name__)
+
+RECV_BUFFER_SIZE = 4 * 1024 * 1024  # Kernel receive buffer, absorbs bursts while workers catch up
+RECV_BATCH = 32  # Datagrams taken off the socket per recvmmsg call
+BATCH_QUEUE_SIZE = 128  # Received batches waiting for a worker; beyond this they are dropped, as UDP would
+ACTIVE_SAMPLE_EVERY = 100  # Sender liveness is recorded for one packet in this many
+WARNING_INTERVAL = 1.0  # Seconds between repeats of a per-packet warning
+PACKET_SLOT_SIZE = 4096  # Receive buffer per datagram; fits a video fragment or an audio chunk with its header
 
 class StreamRelayUDP:
     """Relays video and audio UDP packets between clients"""
@@ -15,282 +30,233 @@ class StreamRelayUDP:
     def __init__(self, meeting_manager, udp_port):
         self.meeting_manager = meeting_manager
         self.udp_port = udp_port
-        self.socket = None
+        self.socket = None  # Send socket, the first of self.sockets
+        self.sockets = []
         self.running = False
         
-        # Track UDP sending addresses: {sender_addr: last_seen_time}
+        # Several sockets bound to the port with SO_REUSEPORT, each with its own receive
+        # thread: the kernel spreads senders across them by source address
+        self.recv_socket_count = (os.cpu_count() or 1) if hasattr(socket, 'SO_REUSEPORT') else 1
+        
+        # Track UDP sending addresses: {sender_addr: last_seen_time (time.monotonic)}
+        # Workers write it without a lock (a single dict store is atomic); readers should
+        # iterate over list(self.active_udp_addresses.items())
         self.active_udp_addresses = {}
-        self.udp_lock = threading.Lock()
+        self.active_counter = itertools.count()
+        self.last_no_recipients_warning = 0.0
+        
+        # The receive loop only queues what each receive returned, as one batch (a single
+        # queue handoff and worker wakeup for up to RECV_BATCH datagrams); a fixed set of
+        # workers relays them
+        self.pkt_queue = queue.Queue(maxsize=BATCH_QUEUE_SIZE)
+        self.workers = [threading.Thread(target=self._worker, daemon=True)
+                        for _ in range(os.cpu_count() or 4)]
+        self.dropped_packets = 0
+        
+        # Datagrams are received into pooled slots instead of a new bytes object each; a slot
+        # goes back on free_slots once its packet is relayed. There are enough for every place
+        # a batch can wait (receive loops, queue, workers), so taking one never blocks for long
+        self.slot_pool = [bytearray(PACKET_SLOT_SIZE)
+                          for _ in range(RECV_BATCH * (self.recv_socket_count + BATCH_QUEUE_SIZE + len(self.workers)))]
+        self.free_slots = queue.SimpleQueue()
+        for slot in self.slot_pool:
+            self.free_slots.put(slot)
+        self.fanout = threading.local()  # Per-worker FanoutSender (its ctypes buffers aren't shareable)
     
     def start(self):
         """Start the UDP relay server"""
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(('0.0.0.0', self.udp_port))
+        self.sockets = [self._open_socket(self.recv_socket_count > 1)]
+        if self.recv_socket_count > 1:
+            try:
+                for _ in range(self.recv_socket_count - 1):
+                    self.sockets.append(self._open_socket(True))
+            except OSError as e:
+                print(f"[StreamRelay] SO_REUSEPORT unavailable, receiving on one socket: {e}")
+        # Relayed packets all go out through the first socket
+        self.socket = self.sockets[0]
         self.running = True
         
+        for worker in self.workers:
+            worker.start()
+        for sock in self.sockets[1:]:
+            threading.Thread(target=self._receive_loop, args=(sock,), daemon=True).start()
+        
         print(f"[StreamRelay] UDP relay listening on port {self.udp_port}")
-        print(f"[StreamRelay] Socket bound to {self.socket.getsockname()}")
+        print(f"[StreamRelay] Socket bound to {self.socket.getsockname()} ({len(self.sockets)} receive sockets)")
+        
+        self._receive_loop(self.socket)
+    
+    def _open_socket(self, reuse_port):
+        """Create a UDP socket bound to the relay port; reuse_port lets siblings share the port"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            if reuse_port:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_SIZE)
+            except OSError as e:
+                print(f"[StreamRelay] Could not set receive buffer: {e}")
+            sock.bind(('0.0.0.0', self.udp_port))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    
+    def _receive_loop(self, sock):
+        """Receive on sock and queue batches for the workers until the relay stops"""
+        # One recvmmsg drains up to RECV_BATCH queued datagrams; recvfrom_into where it's missing
+        receiver = BatchReceiver(sock, RECV_BATCH, buffer_size=0) if recvmmsg_available() else None
+        if receiver is None:
+            sock.setblocking(False)
+        slots = []  # Free slots the next receive writes into
         
         packet_count = 0
         while self.running:
+            while len(slots) < RECV_BATCH:
+                slots.append(self.free_slots.get())
             try:
-                data, addr = self.socket.recvfrom(65535)  # Max UDP packet size
-                packet_count += 1
-                
-                if packet_count % 100 == 0:  # Log every 100 packets
-                    print(f"[StreamRelay] Received {packet_count} UDP packets")
-                
-                # Handle packet in separate thread to avoid blocking
-                threading.Thread(
-                    target=self.handle_packet,
-                    args=(data, addr),
-                    daemon=True
-                ).start()
-            
+                if receiver is not None:
+                    received = receiver.recv_into(slots, timeout=0.5)
+                else:
+                    received = self._recv_fallback(sock, slots, timeout=0.5)
+            except socket.timeout:
+                continue
             except Exception as e:
                 if self.running:
-                    print(f"[StreamRelay] Error receiving packet: {e}")
+                    logger.warning("[StreamRelay] Error receiving packet: %s", e)
+                continue
+            
+            previous_count = packet_count
+            packet_count += len(received)
+            if packet_count // 100 != previous_count // 100:  # Log every 100 packets
+                logger.debug("[StreamRelay] Received %d UDP packets (%d dropped)", packet_count, self.dropped_packets)
+            
+            # Hand the filled slots off to the workers so the receive loop never blocks
+            batch = []
+            for slot, (nbytes, addr) in zip(slots, received):
+                if nbytes > PACKET_SLOT_SIZE:
+                    # Larger than any packet we send: truncated, not worth relaying
+                    self.dropped_packets += 1
+                    self.free_slots.put(slot)
+                else:
+                    batch.append((slot, nbytes, addr))
+            del slots[:len(received)]
+            if not batch:
+                continue
+            try:
+                self.pkt_queue.put_nowait(batch)
+            except queue.Full:
+                self.dropped_packets += len(batch)
+                for slot, _, _ in batch:
+                    self.free_slots.put(slot)
+    
+    def _recv_fallback(self, sock, slots, timeout):
+        """Wait up to timeout seconds for sock (non-blocking), then recvfrom_into slots until it is drained"""
+        readable, _, _ = select.select([sock], [], [], timeout)
+        if not readable:
+            raise socket.timeout()
+        
+        received = []
+        for slot in slots:
+            try:
+                received.append(sock.recvfrom_into(slot))
+            except BlockingIOError:
+                break
+        if not received:
+            raise socket.timeout()
+        return received
+    
+    def _worker(self):
+        """Relay queued batches until the relay stops"""
+        while self.running:
+            try:
+                batch = self.pkt_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            for slot, nbytes, addr in batch:
+                try:
+                    self.handle_packet(memoryview(slot)[:nbytes], addr)
+                finally:
+                    self.free_slots.put(slot)
     
     def handle_packet(self, data, sender_addr):
         """Handle incoming UDP packet and relay to appropriate recipients"""
         try:
-            # Determine packet type (video or audio) by header parsing and validation
-            
-            # 1. Try Video
-            if len(data) >= VIDEO_HEADER_SIZE:
-                try:
-                    header = unpack_video_header(data)
-                    # VALIDATION: Check if payload size matches actual data length
-                    expected_payload_size = header['payload_size']
-                    actual_payload_size = len(data) - VIDEO_HEADER_SIZE
-                    
-                    
-                    if expected_payload_size == actual_payload_size:
-                        self.relay_video_packet(data, sender_addr)
-                        return
-                    # Else: Not a video packet (or corrupted), fall through to check audio
-                except:
-                    pass
-            
-            # 2. Try Audio
-            if len(data) >= AUDIO_HEADER_SIZE:
-                try:
-                    header = unpack_audio_header(data)
-                    # VALIDATION: Check if payload size matches actual data length
-                    expected_payload_size = header['payload_size']
-                    actual_payload_size = len(data) - AUDIO_HEADER_SIZE
-                    
-                    if expected_payload_size == actual_payload_size:
-                        self.relay_audio_packet(data, sender_addr)
-                        return
-                except:
-                    pass
-            
-            # Unknown packet type
-            # Only print occasionally to avoid spam if it's just noise
-            # print(f"[StreamRelay] Unknown packet type from {sender_addr}, len={len(data)}")
+            # The first byte tags the packet type; anything else is noise
+            packet_type = data[0] if data else None
+            if packet_type == PKT_VIDEO:
+                if len(data) >= VIDEO_HEADER_SIZE:
+                    self.relay_video_packet(data, sender_addr)
+            elif packet_type == PKT_AUDIO:
+                if len(data) >= AUDIO_HEADER_SIZE:
+                    self.relay_audio_packet(data, sender_addr)
         
         except Exception as e:
-            print(f"[StreamRelay] Error handling packet from {sender_addr}: {e}")
+            logger.warning("[StreamRelay] Error handling packet from %s: %s", sender_addr, e)
     
     def relay_video_packet(self, data, sender_addr):
         """Relay video packet to ALL other clients' REGISTERED receiver addresses"""
-        import time
-        
-        # Track sender as active
-        with self.udp_lock:
-            self.active_udp_addresses[sender_addr] = time.time()
-        
-        # Find which client is sending (by matching IP)
-        sender_ip = sender_addr[0]
-        sender_client_socket = None
-        
-        for client_socket, client_info in self.meeting_manager.client_info.items():
-            udp_addr = client_info.get('video_addr')
-            # Use video port to identify sender (since they send form random port, but we can match IP and be close)
-            # Actually, we should check against both or just IP if that's easier, but let's stick to existing logic
-            # targeting video port
-            if udp_addr and udp_addr[0] == sender_ip:
-                # Check if sender port is close to registered port (within 10 ports)
-                port_diff = abs(udp_addr[1] - sender_addr[1])
-                if port_diff < 10:  # Same client (sender/receiver ports are close)
-                    sender_client_socket = client_socket
-                    break
-        
-        # Get ALL registered UDP addresses EXCEPT the sender
-        recipient_addrs = []
-        for client_socket, client_info in self.meeting_manager.client_info.items():
-            if client_socket == sender_client_socket:
-                continue  # Skip sender
-            
-            # Use VIDEO address for video packets
-            video_addr = client_info.get('video_addr')
-            if video_addr:
-                recipient_addrs.append((video_addr, client_info.get('name', 'unknown')))
-        
-        # Debug: Show registered clients
-        # print(f"[StreamRelay] Video from {sender_addr}, relaying to {len(recipient_addrs)} registered receivers (excluding sender)")
-        if len(recipient_addrs) == 0:
-            print(f"[StreamRelay] WARNING: No registered recipients to relay video to!")
-            print(f"[StreamRelay] DEBUG: Registered clients:")
-            for client_socket, client_info in self.meeting_manager.client_info.items():
-                print(f"  - {client_info.get('name', 'unknown')}: video_addr={client_info.get('video_addr', 'NOT SET')}")
-        
-        # Relay to registered receiver addresses
-        for udp_addr, name in recipient_addrs:
-            try:
-                self.socket.sendto(data, udp_addr)
-            except Exception as e:
-                print(f"[StreamRelay] Failed to relay video to {name} at {udp_addr}: {e}")
-        
-        if len(recipient_addrs) == 0:
-            print(f"[StreamRelay] WARNING: No registered recipients to relay video to!")
+        self._relay(data, sender_addr, 'video', self._sender_socket(data))
     
     def relay_audio_packet(self, data, sender_addr):
         """Relay audio packet to ALL other clients' REGISTERED receiver addresses"""
-        import time
-        
-        # Track sender as active
-        with self.udp_lock:
-            self.active_udp_addresses[sender_addr] = time.time()
-        
-        # Get ALL registered UDP addresses from meeting_manager
-        recipient_addrs = []
-        for client_socket, client_info in self.meeting_manager.client_info.items():
-            # Use AUDIO address for audio packets
-            audio_addr = client_info.get('audio_addr')
-            
-            # For audio, we check if the audio address is the sender. 
-            # Note: sender_addr is the address the packet came FROM.
-            # Client sends audio from a random ephemeral port, but registers a specific LISTENING port.
-            # So we can't directly compare sender_addr with audio_addr.
-            
-            # Simple logic: don't send to self (check IP if possible, or just send to all since client filters own?)
-            # The client audio receiver probably doesn't filter, so we should try to avoid echo.
-            # But since we don't know the sender's identity easily for audio (unless we do the IP/Port matching like video),
-            # let's just do IP matching or similar.
-            
-            # Better approach: We know who sent it because we tracked active_udp_addresses or we can do same lookup as video
-            
-            # Let's find sender first (reuse logic from video or make a helper?)
-            # For now, let's just send to everyone who has an audio addr designated, 
-            # except if the IP matches and port is "close"? 
-            
-            # Actually, `sender_addr` is where it came FROM. 
-            # `audio_addr` is where we send TO.
-            
-            if audio_addr and audio_addr != sender_addr: # This check is likely useless if ports different
-                 # Proper check: is this the sender?
-                 is_sender = False
-                 if sender_addr[0] == audio_addr[0]: # Same IP
-                     # Check if ports are close? Or just assume same IP = same user?
-                     # In local testing (localhost), everyone has same IP. So we can't rely on IP only.
-                     pass 
-                 
-                 recipient_addrs.append(audio_addr)
-        
-        # Improvement: Filter out sender properly.
-        # Find sender client_socket
-        sender_client_socket = None
-        sender_ip = sender_addr[0]
-        
-        for client_socket, client_info in self.meeting_manager.client_info.items():
-             # Check IP
-             c_video = client_info.get('video_addr')
-             c_audio = client_info.get('audio_addr')
-             
-             # If we can match the sender to a client... 
-             # For now, let's assume we relay to everyone and let client discard own if needed,
-             # OR we reuse the sender finding logic
-             pass
-        
-        # Current naive logic was: `if udp_addr != sender_addr`. 
-        # Since `udp_addr` (now `audio_addr`) is the LISTENING port, and `sender_addr` is the SENDING port, they will never be equal.
-        # So we were sending back to sender.
-        
-        # Let's start by just fixing the dest port.
-        recipient_addrs = []
-        for client_socket, client_info in self.meeting_manager.client_info.items():
-             audio_addr = client_info.get('audio_addr')
-             if audio_addr:
-                 recipient_addrs.append(audio_addr)
-                 
-        # TODO: We really should filter sender to avoid echo.
-        # But for this specific bug (wrong port), let's just fix the port first.
-        # The client side AudioReceiver doesn't seem to have echo cancellation or self-filtering of packets.
-        # But `AudioSender` sends, `AudioReceiver` receives.
-        # If I hear myself, that's an echo.
-        
-        # Let's try to identify sender by IP (if not localhost) or... 
-        # For localhost testing, IP is always 127.0.0.1.
-        # We need to rely on the fact that we know registered ports.
-        
-        # Updated logic: Send to all valid audio_addrs. The client *should* filter? 
-        # Looking at `audio_receiver.py`: it just plays whatever it gets.
-        # Looking at `audio_sender.py`: it just sends.
-        
-        # If we reflect audio back to sender, they will hear themselves with latency (bad).
-        # We MUST filter.
-        
-        # Let's copy the sender identification logic from video
-        sender_ip = sender_addr[0]
-        sender_socket = None
-        
-        for client_socket, client_info in self.meeting_manager.client_info.items():
-            # Check video addr first as it's more reliable? Or just iterate.
-            # We don't know the audio sending port.
-            if client_info.get('video_addr') and client_info.get('video_addr')[0] == sender_ip:
-                 # Potentially multiple clients on same IP (localhost).
-                 # We can't distinguish purely by IP on localhost.
-                 # But we can't distinguish by port either because sending port is random.
-                 pass
-        
-        # WAIT, `relay_video_packet` used `abs(udp_addr[1] - sender_addr[1]) < 10`.
-        # This assumes the sending port is close to the listening port. 
-        # `AudioSender` creates a socket: `self.socket = socket.socket(...)`. It doesn't bind.
-        # `AudioReceiver` binds to `local_udp_port`.
-        # They are completely different sockets. The ports won't necessarily be close.
-        # The OS assigns ephemeral ports (usually high, 50000+), while listening ports are low (5000+).
-        
-        # So the video logic `port_diff < 10` is actually FLAKY if the sender doesn't bind or if they are far apart.
-        # But `VideoSender` might be binding?
-        # `video_sender.py`: `self.socket = socket.socket(...)`. No bind.
-        
-        # So identifying sender by port proximity is dangerous unless we forced it.
-        
-        # However, for this task, the goal is "why audio doesnt work".
-        # The PRIMARY reason is sending to video port.
-        # Let's fix that. The echo issue is secondary (though annoying).
-        
-        # I will implement the port fix. I will intentionally NOT try to perfectly solve the echo/sender-identification 
-        # if it risks breaking the relay entirely, but I will try to use the `exclude_socket` if I can find it.
+        self._relay(data, sender_addr, 'audio', self._sender_socket(data))
+    
+    def _sender_socket(self, data):
+        """Control socket of the client the packet names as its sender, or None (relayed to everyone)"""
+        sender = packet_sender(data)
+        return self.meeting_manager.get_socket_by_handle(sender) if sender else None
+    
+    def _relay(self, data, sender_addr, kind, sender_socket=None):
+        """Send a kind ('video'/'audio') packet to every registered address except sender_socket's"""
+        self._mark_active(sender_addr)
         
-        # Actually, since I can't reliably identify the sender of the audio packet (ephemeral port), 
-        # I will relay to ALL.
-        # But wait, `relay_video_packet` logic:
-        # `sender_client_socket = client_socket` ... `recipient_addrs.append` ... `if client_socket == sender_client_socket: continue`
+        # Prebuilt until registrations change
+        recipient_addrs = self.meeting_manager.relay_targets(kind, sender_socket)
+        if not recipient_addrs:
+            # Every packet lands here while a client is alone, so warn at most once a WARNING_INTERVAL
+            now = time.monotonic()
+            if now - self.last_no_recipients_warning >= WARNING_INTERVAL:
+                self.last_no_recipients_warning = now
+                logger.warning("[StreamRelay] WARNING: No registered recipients to relay %s to!", kind)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("[StreamRelay] DEBUG: Registered clients:")
+                    for client_info in list(self.meeting_manager.client_info.values()):
+                        logger.debug("  - %s: %s_addr=%s", client_info.get('name', 'unknown'), kind,
+                                     client_info.get(kind + '_addr', 'NOT SET'))
+            return
         
-        # I will reproduce the `audio_addr` fetch.
-        recipient_addrs = []
-        for client_socket, client_info in self.meeting_manager.client_info.items():
-            udp_addr = client_info.get('audio_addr')
-            # Don't check against sender_addr because they are different ports (sending vs listening)
-            if udp_addr: 
-                recipient_addrs.append(udp_addr)
+        self._send_to_all(data, recipient_addrs, kind)
+    
+    def _mark_active(self, sender_addr):
+        """Record that sender_addr is still sending; sampled, liveness doesn't need every packet"""
+        if next(self.active_counter) % ACTIVE_SAMPLE_EVERY == 0:
+            self.active_udp_addresses[sender_addr] = time.monotonic()
+    
+    def _send_to_all(self, data, addrs, kind):
+        """Send one packet to every address: a single sendmmsg where available, else a sendto each"""
+        if sendmmsg_available():
+            sender = getattr(self.fanout, 'sender', None)
+            if sender is None:
+                sender = self.fanout.sender = FanoutSender(self.socket)
+            failures = sender.send(data, addrs)
+        else:
+            failures = []
+            for udp_addr in addrs:
+                try:
+                    self.socket.sendto(data, udp_addr)
+                except OSError as e:
+                    failures.append((udp_addr, e))
         
-        # Relay to registered receiver addresses
-        for udp_addr in recipient_addrs:
-            try:
-                self.socket.sendto(data, udp_addr)
-            except Exception as e:
-                print(f"[StreamRelay] Failed to relay audio to {udp_addr}: {e}")
+        for udp_addr, e in failures:
+            logger.warning("[StreamRelay] Failed to relay %s to %s: %s", kind, udp_addr, e)
     
     def stop(self):
         """Stop the UDP relay"""
         self.running = False
-        if self.socket:
+        for sock in self.sockets:
             try:
-                self.socket.close()
+                sock.close()
             except:
                 pass
         print("[StreamRelay] UDP relay stopped")
@@ -1,6 +1,22 @@
 import cv2
 
-for i in range(5):
+try:
+    # Lists DirectShow capture devices without opening them
+    from pygrabber.dshow_graph import FilterGraph
+except ImportError:
+    FilterGraph = None
+
+if FilterGraph is not None:
+    devices = FilterGraph().get_input_devices()
+    # DirectShow device order is the CAP_DSHOW index order, so only these are worth opening
+    indexes = range(len(devices))
+    for i, name in enumerate(devices):
+        print(f"Camera {i}: {name}")
+else:
+    devices = None
+    indexes = range(5)
+
+for i in indexes:
     cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
     if not cap.isOpened():
         print(f"Camera {i}: Not available")
@@ -13,3 +29,6 @@ for i in range(5):
         print(f"Camera {i}: Opened but NOT producing frames")
 
     cap.release()
+
+if devices == []:
+    print("No cameras found")
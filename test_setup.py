@@ -1,190 +1,369 @@
 """
 Test Script - Verify project setup and dependencies
 """
+import argparse
+import importlib.util
+import io
+import json
+import os
 import sys
+import threading
 
-def test_imports():
+# (label, module to find, distributions it may be installed as); found with
+# find_spec and versioned from package metadata, so nothing is imported here
+DEPENDENCIES = [
+    ('PyQt5', 'PyQt5.QtWidgets', ('PyQt5',)),
+    ('OpenCV', 'cv2', ('opencv-python', 'opencv-python-headless', 'opencv-contrib-python')),
+    ('PyAudio', 'pyaudio', ('PyAudio',)),
+    ('Matplotlib', 'matplotlib', ('matplotlib',)),
+    ('NumPy', 'numpy', ('numpy',)),
+    ('msgpack', 'msgpack', ('msgpack',)),
+]
+
+# Checked by test_file_structure and part of the cached verdict
+REQUIRED_FILES = frozenset((
+    'common/protocol.py',
+    'server/server_main.py',
+    'server/meeting_manager.py',
+    'server/control_handler.py',
+    'server/stream_relay_udp.py',
+    'server/congestion_control.py',
+    'client/main.py',
+    'client/tcp_control.py',
+    'client/video_sender.py',
+    'client/video_receiver.py',
+    'client/audio_sender.py',
+    'client/audio_receiver.py',
+    'client/stats_collector.py',
+    'client/stats_window.py',
+    'client/tcp_file_transfer.py',
+    'client/ui_home.py',
+    'client/ui_waiting_room.py',
+    'client/ui_meeting.py',
+))
+
+# Last successful run: if nothing it depends on has changed, the checks are skipped
+CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'netcomm', 'setup_ok.json')
+
+_installed = None  # {normalized distribution name: version}, from one scan of the install paths
+
+def installed_version(distributions):
+    """Version of the first of distributions that is installed, or None"""
+    global _installed
+    if _installed is None:
+        import importlib.metadata  # Pulls in email/zipfile parsing; only needed once versions are printed
+        
+        # One pass over every installed distribution instead of a path search per name
+        _installed = {}
+        for dist in importlib.metadata.distributions():
+            name = dist.metadata['Name']
+            if name:
+                _installed.setdefault(name.lower().replace('_', '-'), dist.version)
+    
+    for name in distributions:
+        version = _installed.get(name.lower().replace('_', '-'))
+        if version:
+            return version
+    return None
+
+def module_found(module):
+    """True if module can be imported; found without importing it (ImportError if a parent package is broken)"""
+    return importlib.util.find_spec(module) is not None
+
+def test_imports(out=sys.stdout):
     """Test if all required libraries are installed"""
-    print("Testing imports...")
+    print("Testing imports...", file=out)
     errors = []
     
-    # Test PyQt5
-    try:
-        from PyQt5.QtWidgets import QApplication
-        from PyQt5.QtCore import Qt
-        from PyQt5.QtGui import QFont
-        print("✓ PyQt5 installed")
-    except ImportError as e:
-        errors.append(f"✗ PyQt5 not found: {e}")
-    
-    # Test OpenCV
-    try:
-        import cv2
-        print(f"✓ OpenCV installed (version {cv2.__version__})")
-    except ImportError as e:
-        errors.append(f"✗ OpenCV not found: {e}")
-    
-    # Test PyAudio
-    try:
-        import pyaudio
-        print("✓ PyAudio installed")
-    except ImportError as e:
-        errors.append(f"✗ PyAudio not found: {e}")
-    
-    # Test Matplotlib
-    try:
-        import matplotlib
-        print(f"✓ Matplotlib installed (version {matplotlib.__version__})")
-    except ImportError as e:
-        errors.append(f"✗ Matplotlib not found: {e}")
-    
-    # Test NumPy
-    try:
-        import numpy
-        print(f"✓ NumPy installed (version {numpy.__version__})")
-    except ImportError as e:
-        errors.append(f"✗ NumPy not found: {e}")
+    for label, module, distributions in DEPENDENCIES:
+        try:
+            found = module_found(module)
+        except ImportError as e:  # Parent package missing or broken
+            errors.append(f"✗ {label} not found: {e}")
+            continue
+        if not found:
+            errors.append(f"✗ {label} not found: No module named '{module}'")
+            continue
+        
+        version = installed_version(distributions)
+        if version:
+            print(f"✓ {label} installed (version {version})", file=out)
+        else:
+            print(f"✓ {label} installed", file=out)
     
     return errors
 
-def test_camera():
+# Seconds to wait for the camera probe; a hung driver can't stall the whole test
+CAMERA_TIMEOUT = 3.0
+
+def camera_backend(cv2):
+    """The platform's native capture backend, skipping the slow default (MSMF on Windows)"""
+    if sys.platform == 'win32':
+        return cv2.CAP_DSHOW  # As client/video_sender.py uses
+    if sys.platform.startswith('linux'):
+        return cv2.CAP_V4L2
+    if sys.platform == 'darwin':
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
+
+def test_camera(out=sys.stdout):
     """Test camera availability"""
-    print("\nTesting camera...")
+    print("\nTesting camera...", file=out)
     try:
         import cv2
-        cap = cv2.VideoCapture(0)
-        if cap.isOpened():
-            ret, frame = cap.read()
-            cap.release()
-            if ret:
-                print("✓ Camera working")
-                return True
-            else:
-                print("✗ Camera opened but cannot read frames")
-                return False
-        else:
-            print("✗ Cannot open camera (check permissions)")
-            return False
     except Exception as e:
-        print(f"✗ Camera test failed: {e}")
+        print(f"✗ Camera test failed: {e}", file=out)
         return False
+    
+    result = {}
+    def probe():
+        try:
+            cap = cv2.VideoCapture(0, camera_backend(cv2))
+            result['opened'] = cap.isOpened()
+            # grab() fetches a frame without decoding it; enough to show frames arrive
+            result['grabbed'] = result['opened'] and cap.grab()
+            cap.release()
+        except Exception as e:
+            result['error'] = e
+    
+    # Daemon thread: if the driver never returns, the test still finishes
+    thread = threading.Thread(target=probe, daemon=True)
+    thread.start()
+    thread.join(CAMERA_TIMEOUT)
+    
+    if thread.is_alive():
+        print(f"✗ Camera did not respond within {CAMERA_TIMEOUT:.0f}s", file=out)
+        return False
+    if 'error' in result:
+        print(f"✗ Camera test failed: {result['error']}", file=out)
+        return False
+    if not result['opened']:
+        print("✗ Cannot open camera (check permissions)", file=out)
+        return False
+    if not result['grabbed']:
+        print("✗ Camera opened but cannot read frames", file=out)
+        return False
+    print("✓ Camera working", file=out)
+    return True
 
-def test_audio():
+def test_audio(out=sys.stdout):
     """Test audio device availability"""
-    print("\nTesting audio...")
+    print("\nTesting audio...", file=out)
     try:
         import pyaudio
         p = pyaudio.PyAudio()
+    except Exception as e:
+        print(f"✗ Audio test failed: {e}", file=out)
+        return False
+    
+    try:
         device_count = p.get_device_count()
-        print(f"✓ Found {device_count} audio devices")
+        print(f"✓ Found {device_count} audio devices", file=out)
+        
+        # Host API names are looked up once, not per device
+        host_apis = [p.get_host_api_info_by_index(i)['name'] for i in range(p.get_host_api_count())]
         
-        # List audio devices
-        print("\nAvailable audio devices:")
+        # One pass over the devices, keeping only what gets printed. A host API can
+        # advertise devices that then fail with "Invalid device"; skip those rather
+        # than failing the whole check
+        inputs = []
+        skipped = 0
         for i in range(device_count):
-            info = p.get_device_info_by_index(i)
+            try:
+                info = p.get_device_info_by_index(i)
+            except OSError:
+                skipped += 1
+                continue
             if info['maxInputChannels'] > 0:
-                print(f"  [{i}] {info['name']} (Input)")
-        
-        p.terminate()
-        return True
+                inputs.append((i, info['name'], host_apis[info['hostApi']]))
     except Exception as e:
-        print(f"✗ Audio test failed: {e}")
+        print(f"✗ Audio test failed: {e}", file=out)
         return False
-
-def test_file_structure():
-    """Test if all required files exist"""
-    print("\nTesting file structure...")
-    import os
-    
-    required_files = [
-        'common/protocol.py',
-        'server/server_main.py',
-        'server/meeting_manager.py',
-        'server/control_handler.py',
-        'server/stream_relay_udp.py',
-        'server/congestion_control.py',
-        'client/main.py',
-        'client/tcp_control.py',
-        'client/video_sender.py',
-        'client/video_receiver.py',
-        'client/audio_sender.py',
-        'client/audio_receiver.py',
-        'client/stats_collector.py',
-        'client/stats_window.py',
-        'client/tcp_file_transfer.py',
-        'client/ui_home.py',
-        'client/ui_waiting_room.py',
-        'client/ui_meeting.py'
-    ]
-    
-    missing = []
-    for filepath in required_files:
-        if os.path.exists(filepath):
-            print(f"✓ {filepath}")
-        else:
-            print(f"✗ {filepath} MISSING")
-            missing.append(filepath)
+    finally:
+        p.terminate()
     
-    return missing
+    # List audio devices
+    print("\nAvailable audio devices:", file=out)
+    for i, name, host_api in inputs:
+        print(f"  [{i}] {name} (Input, {host_api})", file=out)
+    if skipped:
+        print(f"  ({skipped} devices could not be queried)", file=out)
+    if not inputs:
+        print("✗ No input devices found", file=out)
+    return bool(inputs)
 
-def main():
-    """Run all tests"""
-    print("=" * 60)
-    print("Multi-Client Real-Time Communication System")
-    print("Setup Verification Test")
-    print("=" * 60)
-    
-    # Test imports
-    import_errors = test_imports()
+def test_file_structure(out=sys.stdout):
+    """Test if all required files exist"""
+    print("\nTesting file structure...", file=out)
     
-    # Test file structure
-    missing_files = test_file_structure()
+    # One directory listing per folder instead of a stat per file. is_file() answers from
+    # the entry's cached type; only a symlink costs a stat, to see what it points at
+    present = set()
+    for directory in {os.path.dirname(filepath) for filepath in REQUIRED_FILES}:
+        try:
+            with os.scandir(directory) as entries:
+                present.update(f"{directory}/{entry.name}" for entry in entries if entry.is_file())
+        except (FileNotFoundError, NotADirectoryError):
+            pass  # Every file in it is missing
     
-    # Test hardware
-    camera_ok = test_camera()
-    audio_ok = test_audio()
+    missing = REQUIRED_FILES - present
+    # Formatted as one block, one write
+    print("\n".join(f"✗ {filepath} MISSING" if filepath in missing else f"✓ {filepath}"
+                    for filepath in sorted(REQUIRED_FILES)), file=out)
     
-    # Summary
-    print("\n" + "=" * 60)
-    print("SUMMARY")
-    print("=" * 60)
+    return sorted(missing)
+
+def summarize(import_errors, missing_files, camera_ok, audio_ok, out=sys.stdout):
+    """Print the summary and final verdict"""
+    print("\n" + "=" * 60, file=out)
+    print("SUMMARY", file=out)
+    print("=" * 60, file=out)
     
     if import_errors:
-        print("\n❌ MISSING DEPENDENCIES:")
+        print("\n❌ MISSING DEPENDENCIES:", file=out)
         for error in import_errors:
-            print(f"  {error}")
-        print("\nRun: pip install -r requirements.txt")
+            print(f"  {error}", file=out)
+        print("\nRun: pip install -r requirements.txt", file=out)
     else:
-        print("✓ All dependencies installed")
+        print("✓ All dependencies installed", file=out)
     
     if missing_files:
-        print("\n❌ MISSING FILES:")
+        print("\n❌ MISSING FILES:", file=out)
         for filepath in missing_files:
-            print(f"  {filepath}")
+            print(f"  {filepath}", file=out)
     else:
-        print("✓ All files present")
+        print("✓ All files present", file=out)
     
-    if not camera_ok:
-        print("\n⚠ Camera not available (may need permissions)")
+    # None: not checked (--quick, or its library is missing)
+    if camera_ok is None:
+        print("- Camera not checked", file=out)
+    elif not camera_ok:
+        print("\n⚠ Camera not available (may need permissions)", file=out)
     else:
-        print("✓ Camera working")
+        print("✓ Camera working", file=out)
     
-    if not audio_ok:
-        print("\n⚠ Audio device issue")
+    if audio_ok is None:
+        print("- Audio not checked", file=out)
+    elif not audio_ok:
+        print("\n⚠ Audio device issue", file=out)
     else:
-        print("✓ Audio devices found")
+        print("✓ Audio devices found", file=out)
     
     # Final verdict
-    print("\n" + "=" * 60)
+    print("\n" + "=" * 60, file=out)
     if not import_errors and not missing_files:
-        print("✅ READY TO RUN!")
-        print("\nNext steps:")
-        print("  1. cd server && python server_main.py")
-        print("  2. cd client && python main.py")
+        print("✅ READY TO RUN!", file=out)
+        print("\nNext steps:", file=out)
+        print("  1. cd server && python server_main.py", file=out)
+        print("  2. cd client && python main.py", file=out)
     else:
-        print("❌ SETUP INCOMPLETE")
-        print("\nFix the issues above and run this test again")
-    print("=" * 60)
+        print("❌ SETUP INCOMPLETE", file=out)
+        print("\nFix the issues above and run this test again", file=out)
+    print("=" * 60, file=out)
+
+def setup_fingerprint():
+    """What a READY verdict depends on: Python, the dependency versions and the project files"""
+    mtimes = {}
+    for filepath in REQUIRED_FILES:
+        try:
+            mtimes[filepath] = os.stat(filepath).st_mtime_ns
+        except OSError:
+            mtimes[filepath] = None
+    return {
+        'python': sys.version,
+        'directory': os.getcwd(),
+        'versions': {label: installed_version(distributions) for label, _, distributions in DEPENDENCIES},
+        'files': mtimes,
+    }
+
+def cached_verdict_matches(fingerprint):
+    """True if the last successful run saw exactly this fingerprint"""
+    try:
+        with open(CACHE_FILE, encoding='utf-8') as f:
+            return json.load(f) == fingerprint
+    except (OSError, ValueError):
+        return False
+
+def save_verdict(fingerprint):
+    """Remember a successful run; best effort"""
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(fingerprint, f)
+    except OSError:
+        pass
+
+def hardware_test(test, device, label, module):
+    """test, or a stand-in that reports it skipped if module isn't installed"""
+    try:
+        if module_found(module):
+            return test
+    except ImportError:
+        pass
+    
+    def skipped(out=sys.stdout):
+        print(f"\nTesting {device}...", file=out)
+        print(f"- Skipped: {label} is not installed", file=out)
+        return None  # Not checked, rather than a device fault
+    return skipped
+
+def run_buffered(test):
+    """Run test with its output captured; returns (result, output)"""
+    out = io.StringIO()
+    return test(out), out.getvalue()
+
+def main():
+    """Run all tests"""
+    parser = argparse.ArgumentParser(description='Verify project setup and dependencies')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Run every check even if nothing changed since the last successful run')
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Don't read or write the saved result")
+    parser.add_argument('--quick', action='store_true',
+                        help='Only check dependencies and files, not the camera and audio devices')
+    args = parser.parse_args()
+    
+    sys.stdout.write("=" * 60 + "\nMulti-Client Real-Time Communication System\nSetup Verification Test\n"
+                     + "=" * 60 + "\n")
+    sys.stdout.flush()  # Shown while the checks run
+    
+    fingerprint = None if args.no_cache else setup_fingerprint()
+    if fingerprint is not None and not args.refresh and cached_verdict_matches(fingerprint):
+        sys.stdout.write("✅ READY TO RUN! (nothing changed since the last successful check)\n"
+                         "Camera and audio were not rechecked; run with --refresh to check everything\n"
+                         "\nNext steps:\n"
+                         "  1. cd server && python server_main.py\n"
+                         "  2. cd client && python main.py\n" + "=" * 60 + "\n")
+        return
+    
+    from concurrent.futures import ThreadPoolExecutor
+    
+    # The checks are independent, so they run side by side (cv2 and PortAudio release
+    # the GIL while probing devices); each writes to its own buffer, shown in order.
+    # A device check whose library is missing isn't run: test_imports reports that
+    tests = [test_imports, test_file_structure]
+    if not args.quick:
+        tests += [hardware_test(test_camera, 'camera', 'OpenCV', 'cv2'),
+                  hardware_test(test_audio, 'audio', 'PyAudio', 'pyaudio')]
+    with ThreadPoolExecutor(max_workers=len(tests)) as pool:
+        futures = [pool.submit(run_buffered, test) for test in tests]
+        results = []
+        for future in futures:
+            result, output = future.result()
+            sys.stdout.write(output)
+            results.append(result)
+    if args.quick:
+        sys.stdout.write("\nSkipping camera and audio (--quick)\n")
+        results += [None, None]
+    import_errors, missing_files, camera_ok, audio_ok = results
+    
+    # Summary, written in one go like each test's output
+    out = io.StringIO()
+    summarize(import_errors, missing_files, camera_ok, audio_ok, out)
+    sys.stdout.write(out.getvalue())
+    
+    if fingerprint is not None and not import_errors and not missing_files:
+        save_verdict(fingerprint)
 
 if __name__ == '__main__':
     main()